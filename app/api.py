@@ -0,0 +1,309 @@
+"""Headless HTTP API over the shared RagEngine (no Streamlit).
+
+Several front-ends (Streamlit pages, iframes, scripts) can share one process holding
+the models and the corpus instead of each Streamlit process loading its own:
+
+    python -m app.api --port 8000
+    python -m app.api --port 8000 --workers 4 --no-ingest   # read-only workers
+
+Ingest jobs and their status live in the worker that accepted the upload, so /ingest
+needs a single worker. With several workers (``--no-ingest``, or API_ENABLE_INGEST=0
+when starting ``uvicorn app.api:app --workers N`` directly) build the corpus with
+``python -m app.ingest``: every worker picks up the new artifact within
+ENGINE_RELOAD_CHECK_S and they share its memory-mapped pages.
+
+Routes:
+    GET    /health              liveness, corpus size, limiter load
+    POST   /ingest              multipart PDFs ("files") -> 202 {"job_id"}; replaces the corpus
+                                (403 when ingest is disabled)
+    GET    /jobs/{id}           job status (result once done)
+    DELETE /jobs/{id}           cancel a job
+    POST   /search              {"queries" | "query", "top_k", "sources", "pages"}
+    POST   /answer              {"question", "top_k", "sources", "pages"}
+    GET    /stats               engine, cache and limiter statistics
+
+Each route class has a concurrency limit: excess requests wait in a bounded queue
+for up to API_QUEUE_TIMEOUT_S and are then refused with 503 + Retry-After, so a
+burst degrades into fast rejections instead of unbounded latency.
+"""
+from typing import Optional
+from contextlib import asynccontextmanager
+import argparse
+import asyncio
+import os
+import time
+
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.utils.answer_cache import get_answer_cache
+from app.utils.engine import ENGINE_TOP_K, RagEngine
+from app.utils.logger import get_logger
+from app.utils.openai_pool import get_client_pool
+
+API_MAX_CONCURRENT_SEARCH = int(os.getenv("API_MAX_CONCURRENT_SEARCH", "8"))
+API_MAX_CONCURRENT_ANSWER = int(os.getenv("API_MAX_CONCURRENT_ANSWER", "16"))
+API_MAX_QUEUE = int(os.getenv("API_MAX_QUEUE", "64"))  # waiting requests per route class
+API_QUEUE_TIMEOUT_S = float(os.getenv("API_QUEUE_TIMEOUT_S", "10"))
+API_MAX_QUERIES = int(os.getenv("API_MAX_QUERIES", "256"))  # queries per /search request
+API_MAX_TOP_K = int(os.getenv("API_MAX_TOP_K", "50"))
+API_MAX_UPLOAD_MB = float(os.getenv("API_MAX_UPLOAD_MB", "200"))
+API_MAX_ACTIVE_INGESTS = int(os.getenv("API_MAX_ACTIVE_INGESTS", "1"))
+# /ingest keeps jobs in this process: disable it whenever more than one worker serves the app.
+API_ENABLE_INGEST = os.getenv("API_ENABLE_INGEST", "1").lower() in ("1", "true", "yes")
+
+logger = get_logger(__name__)
+
+
+class Overloaded(Exception):
+    pass
+
+
+class ConcurrencyLimiter:
+    """At most ``limit`` requests run at once; up to ``max_waiting`` more queue for a
+    slot (each for at most ``timeout_s``) and any beyond that are refused at once."""
+
+    def __init__(self, name: str, limit: int, max_waiting: int = API_MAX_QUEUE,
+                 timeout_s: float = API_QUEUE_TIMEOUT_S):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_waiting = max_waiting
+        self.timeout_s = timeout_s
+        self._sem = asyncio.Semaphore(self.limit)
+        self.active = 0
+        self.waiting = 0
+        self.peak_active = 0
+        self.served = 0
+        self.rejected = 0
+        self.wait_s = 0.0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._sem.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise Overloaded(f"{self.name}: {self.waiting} requests already queued")
+        t0 = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self.timeout_s)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded(f"{self.name}: no slot within {self.timeout_s:g}s")
+        finally:
+            self.waiting -= 1
+        self.wait_s += time.perf_counter() - t0
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.served += 1
+            self._sem.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "peak_active": self.peak_active,
+            "served": self.served,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_s / self.served * 1000, 2) if self.served else 0.0,
+        }
+
+
+def _error(status: int, message: str, headers: Optional[dict] = None) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status, headers=headers)
+
+
+def _filters(body: dict) -> Optional[dict]:
+    sources, pages = body.get("sources"), body.get("pages")
+    if sources is not None and (not isinstance(sources, list) or not all(isinstance(s, str) for s in sources)):
+        raise ValueError("'sources' must be a list of document names")
+    if pages is not None:
+        if not isinstance(pages, list) or len(pages) != 2 or not all(isinstance(p, int) for p in pages):
+            raise ValueError("'pages' must be [first, last]")
+        pages = tuple(pages)
+    return None if sources is None and pages is None else {"sources": sources, "pages": pages}
+
+
+def _top_k(body: dict, default: int) -> int:
+    k = body.get("top_k", default)
+    if not isinstance(k, int) or not 1 <= k <= API_MAX_TOP_K:
+        raise ValueError(f"'top_k' must be an integer in [1, {API_MAX_TOP_K}]")
+    return k
+
+
+async def _json_body(request: Request) -> dict:
+    try:
+        body = await request.json()
+    except Exception:
+        raise ValueError("request body must be JSON")
+    if not isinstance(body, dict):
+        raise ValueError("request body must be a JSON object")
+    return body
+
+
+def create_app(engine: Optional[RagEngine] = None, load_saved: bool = True,
+               search_limit: int = API_MAX_CONCURRENT_SEARCH, answer_limit: int = API_MAX_CONCURRENT_ANSWER,
+               max_queue: int = API_MAX_QUEUE, queue_timeout_s: float = API_QUEUE_TIMEOUT_S,
+               enable_ingest: bool = API_ENABLE_INGEST) -> Starlette:
+    engine = engine or RagEngine()
+    limiters = {
+        "search": ConcurrencyLimiter("search", search_limit, max_queue, queue_timeout_s),
+        "answer": ConcurrencyLimiter("answer", answer_limit, max_queue, queue_timeout_s),
+    }
+    ingest_jobs = []
+
+    async def limited(kind: str, fn):
+        try:
+            async with limiters[kind].slot():
+                return await fn()
+        except Overloaded as e:
+            return _error(503, f"overloaded ({e})", headers={"Retry-After": "1"})
+
+    async def health(request: Request):
+        return JSONResponse({"status": "ok", "chunks": engine.stats()["chunks"],
+                             "active": {k: lim.active for k, lim in limiters.items()}})
+
+    async def stats(request: Request):
+        cache = get_answer_cache()
+        return JSONResponse({
+            "engine": engine.stats(),
+            "limits": {k: lim.stats() for k, lim in limiters.items()},
+            "answer_cache": cache.stats_dict() if cache is not None else None,
+            "openai_clients": get_client_pool().stats(),
+        })
+
+    async def search(request: Request):
+        try:
+            body = await _json_body(request)
+            queries = body.get("queries", [body["query"]] if "query" in body else None)
+            if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+                raise ValueError("give 'query' or a non-empty 'queries' list of strings")
+            if len(queries) > API_MAX_QUERIES:
+                raise ValueError(f"at most {API_MAX_QUERIES} queries per request")
+            top_k, filters = _top_k(body, ENGINE_TOP_K), _filters(body)
+        except ValueError as e:
+            return _error(400, str(e))
+
+        async def run():
+            try:
+                results, search_stats = await asyncio.to_thread(engine.search, queries, top_k, filters)
+            except LookupError as e:
+                return _error(409, str(e))
+            except RuntimeError as e:
+                return _error(503, f"search unavailable ({e})", headers={"Retry-After": "5"})
+            return JSONResponse({"results": results, "stats": search_stats})
+        return await limited("search", run)
+
+    async def answer(request: Request):
+        try:
+            body = await _json_body(request)
+            question = body.get("question")
+            if not isinstance(question, str) or not question.strip():
+                raise ValueError("'question' must be a non-empty string")
+            top_k, filters = _top_k(body, ENGINE_TOP_K), _filters(body)
+        except ValueError as e:
+            return _error(400, str(e))
+
+        async def run():
+            try:
+                return JSONResponse(await engine.answer(question, top_k, filters))
+            except LookupError as e:
+                return _error(409, str(e))
+            except RuntimeError as e:
+                return _error(503, f"answering unavailable ({e})", headers={"Retry-After": "5"})
+        return await limited("answer", run)
+
+    async def ingest(request: Request):
+        if not enable_ingest:
+            return _error(403, "ingest is disabled on this server (API_ENABLE_INGEST=0); "
+                               "build the corpus with python -m app.ingest")
+        size = int(request.headers.get("content-length") or 0)
+        if size > API_MAX_UPLOAD_MB * 1e6:
+            return _error(413, f"upload exceeds {API_MAX_UPLOAD_MB:g} MB (API_MAX_UPLOAD_MB)")
+        active = [j for j in (engine.jobs.get(i) for i in ingest_jobs) if j is not None and not j.finished]
+        if len(active) >= API_MAX_ACTIVE_INGESTS:
+            return _error(429, f"ingest job {active[0].id} is still running", headers={"Retry-After": "5"})
+        part_limit = int(API_MAX_UPLOAD_MB * 1e6)
+        async with request.form(max_part_size=part_limit) as form:
+            files = [(f.filename or f"upload-{i}.pdf", await f.read())
+                     for i, f in enumerate(form.getlist("files")) if hasattr(f, "read")]
+            params = {k: form[k] for k in ("chunk_size", "overlap", "strategy", "dedup_mode") if k in form}
+        if not files:
+            return _error(400, "attach PDFs as multipart field 'files'")
+        try:
+            for k in ("chunk_size", "overlap"):
+                if k in params:
+                    params[k] = int(params[k])
+        except ValueError:
+            return _error(400, "'chunk_size' and 'overlap' must be integers")
+        job_id = engine.submit_ingest(files, **params)
+        ingest_jobs[:] = [i for i in ingest_jobs if engine.jobs.get(i) is not None] + [job_id]
+        return JSONResponse({"job_id": job_id, "files": len(files)}, status_code=202)
+
+    async def job_status(request: Request):
+        job = engine.jobs.get(request.path_params["job_id"])
+        if job is None:
+            return _error(404, "unknown job")
+        if request.method == "DELETE":
+            engine.jobs.cancel(job.id)
+        d = job.as_dict()
+        if job.status == "done" and isinstance(job.result, dict):
+            d["result"] = job.result
+        return JSONResponse(d)
+
+    @asynccontextmanager
+    async def lifespan(_app):
+        if load_saved and engine.snapshot is None:
+            try:
+                if await asyncio.to_thread(engine.load_saved):
+                    logger.info(f"API serving saved index ({engine.stats()['chunks']} chunks)")
+            except Exception as e:
+                logger.warning(f"Could not load saved index: {e}")
+        yield
+
+    app = Starlette(
+        routes=[
+            Route("/health", health),
+            Route("/stats", stats),
+            Route("/search", search, methods=["POST"]),
+            Route("/answer", answer, methods=["POST"]),
+            Route("/ingest", ingest, methods=["POST"]),
+            Route("/jobs/{job_id}", job_status, methods=["GET", "DELETE"]),
+        ],
+        lifespan=lifespan,
+    )
+    app.state.engine = engine
+    app.state.limiters = limiters
+    return app
+
+
+load_dotenv()
+app = create_app()
+
+
+def main():
+    import uvicorn
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"))
+    ap.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8000")))
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--no-ingest", action="store_true", help="disable /ingest (required with --workers > 1)")
+    args = ap.parse_args()
+    ingest = API_ENABLE_INGEST and not args.no_ingest
+    if args.workers > 1 and ingest:
+        ap.error("--workers > 1 needs --no-ingest: ingest jobs live in the worker that accepted them. "
+                 "Build the corpus with python -m app.ingest; workers reload it when it changes.")
+    os.environ["API_ENABLE_INGEST"] = "1" if ingest else "0"  # read by each worker's import of app.api
+    uvicorn.run("app.api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 import streamlit as st
 from dotenv import load_dotenv
 import os
+import time
 from utils.logger import get_logger
 from utils.pdf_utils import load_pdfs
 from utils.retriever_utils import build_retriever, retrieve_chunks
-from utils.generator_utils import generate_answer
+from utils.answer_cache import get_answer_cache
+from utils.generator_utils import LLM_STREAM, answer_metrics, cache_answer, cached_answer, generate_answer, stream_answer
  
 load_dotenv()
 st.set_page_config(page_title="DocuBot Studio", page_icon="✈️", layout="wide")
@@ -40,8 +42,15 @@ def main():
                 retriever = build_retriever(docs)
             
             st.session_state["retriever"] = retriever
-            st.success("✅ Index built from uploaded PDFs.")
-            logger.info(f"Successfully built index from {len(uploaded_files)} files")
+            if get_answer_cache() is not None:
+                get_answer_cache().invalidate("index rebuilt")
+            stats = retriever.build_stats
+            st.success(
+                f"✅ Index built from uploaded PDFs: {stats.get('added', 0)} added, "
+                f"{stats.get('removed', 0)} removed, {stats.get('unchanged', 0)} unchanged chunks "
+                f"({stats.get('elapsed_s', 0)}s)."
+            )
+            logger.info(f"Successfully built index from {len(uploaded_files)} files: {stats}")
         except Exception as e:
             st.error(f"❌ Error building index: {str(e)}")
             logger.error(f"Build index error: {e}", exc_info=True)
@@ -55,15 +64,42 @@ def main():
                 with st.spinner("🔎 Retrieving context..."):
                     contexts = retrieve_chunks(retriever, query)
                 
-                with st.spinner("💭 Generating answer..."):
-                    answer, sources = generate_answer(query, contexts)
-                
                 st.subheader("Answer")
-                st.write(answer)
+                t0 = time.perf_counter()
+                hit = cached_answer(query, contexts)
+                answer = None
+                if hit:
+                    answer, sources = hit
+                    elapsed = time.perf_counter() - t0
+                    metrics = {**answer_metrics(elapsed, elapsed, None, streamed=False), "cached": True}
+                    st.write(answer)
+                stream = stream_answer(query, contexts) if LLM_STREAM and not hit else None
+                if stream is not None:
+                    try:
+                        st.write_stream(stream)
+                        answer, sources = stream.text, contexts[:3]
+                        if stream.error:
+                            st.warning(f"⚠️ Answer stream interrupted: {stream.error}")
+                        metrics = stream.metrics()
+                        if answer and not stream.error:
+                            cache_answer(query, contexts, answer, metrics["total_s"])
+                    except Exception as e:
+                        logger.warning(f"Streaming failed before the first token, retrying without: {e}")
+                if not answer:
+                    with st.spinner("💭 Generating answer..."):
+                        t0 = time.perf_counter()
+                        answer, sources = generate_answer(query, contexts)
+                        elapsed = time.perf_counter() - t0
+                    metrics = answer_metrics(elapsed, elapsed, None, streamed=False)
+                    st.write(answer)
+                st.caption(
+                    ("Cached answer" if metrics.get("cached") else f"First token {metrics['ttft_s']:.2f}s · total {metrics['total_s']:.2f}s")
+                    + (f" · {metrics['tokens_per_s']:g} tokens/s" if metrics["tokens_per_s"] else "")
+                )
                 with st.expander("Sources / Context"):
                     for s in sources:
                         st.write(s[:500] + ("..." if len(s) > 500 else ""))
-                logger.info(f"Successfully answered query: {query[:50]}...")
+                logger.info(f"Successfully answered query: {query[:50]}... {metrics}")
         except Exception as e:
             st.error(f"❌ Error processing query: {str(e)}")
             logger.error(f"Query error: {e}", exc_info=True)
@@ -1,24 +1,46 @@
 # app_steps.py — Step-by-step RAG configurator + Chatbot
-import os, io, time, json, tempfile, csv
-import logging, threading
+import os, io, time, json, tempfile, csv, copy
+import logging
 from dotenv import load_dotenv
 from typing import List, Dict
-from dataclasses import dataclass
 import streamlit as st
 import pandas as pd
 from utils.ui_helpers import openai_api_key_widget, get_openai_api_key
+from utils.embedding_utils import embed_openai_batched
+from utils.model_registry import get_registry, get_sentence_transformer
+from utils.embedding_cache import CacheStats, embed_with_cache, get_embedding_cache
+from utils.chunk_store import Chunk, ChunkStore, ChunkStoreBuilder
+from utils.index_utils import (
+    INDEX_KINDS, DEFAULT_NPROBE, DEFAULT_EF_SEARCH, build_vector_index, index_kind, recall_report,
+)
+from utils.artifact_utils import INDEX_ARTIFACT_DIR, load_artifact, save_artifact
+from utils.lexical_index import BM25Index, lexical_tokenize
+from utils.pdf_utils import PDF_WORKERS, extract_pdfs
+from utils.ingest_pipeline import chunk_pages, ingest, iter_store_pages
+from utils.chunking import (
+    CHUNK_STRATEGIES, DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_STRATEGY, make_chunker, size_unit,
+    strategy_label,
+)
+from utils.dedup import DEDUP_MODE, DEDUP_MODES, Deduplicator
+from utils.jobs import get_job_manager
+from utils.openai_pool import get_openai_client
+from utils.answer_cache import context_key, get_answer_cache
+from utils.query_cache import get_query_embedding_cache
+from utils.engine import search_chunks
+from utils.rerank import RERANK_BUDGET_MS, RERANK_CANDIDATES, RERANK_KEEP, RERANK_MODEL, approx_tokens, cross_encoder_scorer, rerank
+from utils.model_registry import CrossEncoder
+from utils.generator_utils import LLM_STREAM, LLM_TIMEOUT_S, answer_metrics, stream_chat
 
 # Optional heavy libs
 try:
     import pdfplumber
 except Exception:
     pdfplumber = None
+import numpy as np
 try:
     from sentence_transformers import SentenceTransformer
-    import numpy as np
 except Exception:
     SentenceTransformer = None
-    np = None
 try:
     from openai import OpenAI
 except Exception:
@@ -39,19 +61,12 @@ except Exception:
     pass
 
 # -------------------------
-# Data classes + helpers
+# Session state
 # -------------------------
-@dataclass
-class Chunk:
-    chunk_id: int
-    text: str
-    source: str
-    embedding: List[float] = None
-    meta: dict = None
-
-# Initialize session state
+# "chunks" holds raw per-document Chunks after Step 1 and a columnar ChunkStore
+# (same row API, embeddings in one matrix) once Step 2 has run.
 if "chunks" not in st.session_state:
-    st.session_state["chunks"] = []          # List[Chunk]
+    st.session_state["chunks"] = []          # List[Chunk] | ChunkStore
 if "faiss_index" not in st.session_state:
     st.session_state["faiss_index"] = None
 if "emb_model_name" not in st.session_state:
@@ -62,60 +77,73 @@ if "completed_steps" not in st.session_state:
     st.session_state["completed_steps"] = {f"step{i}": False for i in range(1,9)}
 if "verif_log" not in st.session_state:
     st.session_state["verif_log"] = []
-if "busy" not in st.session_state:
-    st.session_state["busy"] = False
-if "do_chunk" not in st.session_state:
-    st.session_state["do_chunk"] = False
-if "chunk_in_progress" not in st.session_state:
-    st.session_state["chunk_in_progress"] = False
+if "jobs" not in st.session_state:
+    st.session_state["jobs"] = {}           # slot ("chunk" | "embed" | "index") -> job id
+if "jobs_applied" not in st.session_state:
+    st.session_state["jobs_applied"] = set()
+if "rerank" not in st.session_state:
+    st.session_state["rerank"] = {"enabled": False, "model": RERANK_MODEL, "candidates": RERANK_CANDIDATES,
+                                  "keep": RERANK_KEEP, "budget_ms": RERANK_BUDGET_MS}
 if "chunk_params" not in st.session_state:
-    st.session_state["chunk_params"] = {"size": 400, "overlap": 50}
-
-# -------------------------
-# Loading overlay (centered image + transparent background)
-# -------------------------
-def render_loading_overlay():
-    st.markdown(
-        """
-        <style>
-        .cs-overlay { position: fixed; inset: 0; background: rgba(255,255,255,0.6); z-index: 10000; display:flex; align-items:center; justify-content:center; }
-        .cs-overlay .emoji { font-size: 84px; opacity: 0.95; animation: pedal 1.1s linear infinite; display:inline-block; }
-        @keyframes pedal {
-          0% { transform: translateY(0) translateX(0); }
-          25% { transform: translateY(-4px) translateX(2px); }
-          50% { transform: translateY(0) translateX(4px); }
-          75% { transform: translateY(4px) translateX(2px); }
-          100% { transform: translateY(0) translateX(0); }
-        }
-        html, body { overflow: hidden !important; }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
-    st.markdown(
-        '<div class="cs-overlay"><div class="emoji">🚴‍♂️</div></div>',
-        unsafe_allow_html=True,
-    )
-
+    st.session_state["chunk_params"] = {"size": DEFAULT_CHUNK_SIZE, "overlap": DEFAULT_CHUNK_OVERLAP, "strategy": DEFAULT_CHUNK_STRATEGY}
+
+
+def attach_saved_index() -> bool:
+    """Point this session at the persisted index artifact (shared, memory-mapped)."""
+    loaded = load_artifact()
+    if loaded is None:
+        return False
+    index, store, manifest = loaded
+    # Shallow copy: columns stay shared/mmapped, but re-embedding in this session
+    # rebinds attributes on the copy rather than mutating the shared store.
+    st.session_state["chunks"] = copy.copy(store)
+    st.session_state["faiss_index"] = index
+    if manifest.get("embedding_model"):
+        st.session_state["emb_model_name"] = manifest["embedding_model"]
+    st.session_state["index_manifest"] = manifest
+    return True
+
+
+# New sessions start from the saved index (if any) instead of an empty pipeline.
+if "index_autoloaded" not in st.session_state:
+    st.session_state["index_autoloaded"] = True
+    if not st.session_state["chunks"] and os.getenv("INDEX_AUTOLOAD", "1").lower() in ("1", "true", "yes"):
+        try:
+            attach_saved_index()
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Could not load saved index: {e}")
 
 # -------------------------
-# Utility: chunking (define before background task uses it)
+# Lexical (BM25) index over the current chunks
 # -------------------------
-def chunk_text(text: str, chunk_size: int, overlap: int):
-    out, i, N = [], 0, len(text)
-    while i < N:
-        end = min(N, i + chunk_size)
-        out.append(text[i:end].strip())
-        i = end - overlap
-        if i < 0:
-            i = 0
-        if i >= N:
-            break
-    return [c for c in out if len(c) > 20]
+def get_chunk_store() -> ChunkStore:
+    """Return the session's chunks as a ChunkStore, converting a raw Step 1 list once."""
+    chunks = st.session_state.get("chunks", [])
+    if not isinstance(chunks, ChunkStore):
+        chunks = ChunkStore.from_chunks(chunks)
+        st.session_state["chunks"] = chunks
+    return chunks
+
+def set_chunks(chunks, bm25: BM25Index = None):
+    """Replace the session's chunks and build the BM25 index over them once (unless given)."""
+    st.session_state["chunks"] = chunks
+    if bm25 is None:
+        texts = chunks.texts() if isinstance(chunks, ChunkStore) else [c.text for c in chunks]
+        bm25 = BM25Index.build(texts, lexical_tokenize)
+    st.session_state["bm25"] = bm25
+    st.session_state["bm25_source"] = chunks
+
+def get_bm25_index() -> BM25Index:
+    chunks = st.session_state.get("chunks", [])
+    idx = st.session_state.get("bm25")
+    if idx is None or st.session_state.get("bm25_source") is not chunks or len(idx) != len(chunks):
+        set_chunks(chunks)
+        idx = st.session_state["bm25"]
+    return idx
 
 
 # -------------------------
-# Debug + background threading helpers for chunking
+# Chunking (runs as a background job; see "Background jobs" below)
 # -------------------------
 _logger = logging.getLogger(__name__)
 if not _logger.handlers:
@@ -125,117 +153,54 @@ if not _logger.handlers:
     _logger.addHandler(_h)
 _logger.setLevel(logging.INFO)
 
-def _safe_run_chunking_task_threaded(chunk_size: int, overlap: int):
-    try:
-        _logger.info("Chunking(thread): starting")
-        st.session_state["chunk_in_progress"] = True
-        st.session_state["chunk_error"] = None
-        st.session_state["chunk_progress"] = 0
-
-        # Use existing raw texts already loaded in session
-        raw_texts = [c.text for c in st.session_state.get("chunks", [])]
-        if not raw_texts:
-            raise ValueError("No documents available to chunk. Please complete Step 1 and upload PDFs.")
-        total_len = sum(len(t or "") for t in raw_texts)
-        if total_len > 2000000:
-            raise ValueError("Input too large to chunk at once. Please upload fewer/smaller PDFs or reduce content size.")
-
-        new_chunks = []
-        for idx, t in enumerate(raw_texts):
-            cs = chunk_text(t or "", chunk_size, overlap)
-            for s in cs:
-                cid = len(new_chunks)
-                new_chunks.append(Chunk(chunk_id=cid, text=s, source="uploaded_docs"))
-            # progress up to 95%, remaining for finalize
-            st.session_state["chunk_progress"] = min(95, int((idx + 1) / max(1, len(raw_texts)) * 95))
-            time.sleep(0.005)
-
-        st.session_state["chunks"] = new_chunks
-        st.session_state["chunk_progress"] = 100
-        _logger.info(f"Chunking(thread): finished, created {len(new_chunks)} chunks")
-    except Exception as e:
-        st.session_state["chunk_error"] = repr(e)
-        _logger.exception("Chunking(thread) failed")
-    finally:
-        st.session_state["chunk_in_progress"] = False
-
-def start_chunking_in_background(chunk_size: int, overlap: int):
-    if st.session_state.get("chunk_in_progress"):
-        _logger.info("Chunking already in progress; ignoring start request")
-        return None
-    st.session_state["chunk_error"] = None
-    t = threading.Thread(target=_safe_run_chunking_task_threaded, args=(chunk_size, overlap), daemon=True)
-    t.start()
-    _logger.info("Chunking: background thread started")
-    return t
+# Soft budget for one chunking run. Larger inputs are still chunked (page by page, so
+# memory does not depend on input size); the budget only triggers a warning.
+CHUNK_SOFT_LIMIT_MB = float(os.getenv("CHUNK_SOFT_LIMIT_MB", "50"))
+
+def chunk_store_pages(store: ChunkStore, chunk_size: int, overlap: int, strategy: str = DEFAULT_CHUNK_STRATEGY,
+                      on_page=None, dedup_mode: str = DEDUP_MODE):
+    """Re-chunk Step 1's page rows into a new ChunkStore (plus its BM25 index) and stats.
+
+    Step 1 stores one row per page; chunking page by page keeps (source, page) on
+    every chunk. Repeated boilerplate is dropped before it reaches Step 3's embedder.
+    Does not touch st.session_state, so it can run on a job thread.
+    """
+    size_mb = store.text_nbytes() / 1e6
+    warning = None
+    if size_mb > CHUNK_SOFT_LIMIT_MB:
+        warning = (f"Input is {size_mb:.1f} MB of text, above the {CHUNK_SOFT_LIMIT_MB:g} MB soft budget "
+                   "(CHUNK_SOFT_LIMIT_MB); chunking continues but will take longer.")
+        _logger.warning(warning)
+    new_chunks = ChunkStoreBuilder()
+    dedup = Deduplicator(dedup_mode)
+    stats = chunk_pages(iter_store_pages(store), make_chunker(chunk_size, overlap, strategy), new_chunks,
+                        on_page=on_page, dedup=dedup)
+    chunks = new_chunks.build()
+    if dedup.stats.dropped:
+        _logger.info(f"Dedup: dropped {dedup.stats.exact} exact + {dedup.stats.near} near duplicates "
+                     f"of {dedup.stats.seen} chunks")
+    _logger.info(f"Chunking: {stats.bytes / 1e6:.1f} MB in {stats.elapsed_s:.2f}s ({stats.as_dict()['mb_per_s']} MB/s)")
+    chunk_stats = dict(stats.as_dict(), warning=warning, dedup=dedup.stats.as_dict())
+    return chunks, BM25Index.build(chunks.texts(), lexical_tokenize), chunk_stats
+
+def _chunk_job(ctx, store: ChunkStore, chunk_size: int, overlap: int, strategy: str, dedup_mode: str):
+    n_pages = len(store)
+    ctx.progress(0, n_pages, "chunking pages")
+    chunks, bm25, chunk_stats = chunk_store_pages(
+        store, chunk_size, overlap, strategy, dedup_mode=dedup_mode,
+        on_page=lambda stats: ctx.progress(stats.pages, n_pages),
+    )
+    ctx.progress(n_pages, n_pages, f"{len(chunks)} chunks")
+    return {"chunks": chunks, "bm25": bm25, "chunk_stats": chunk_stats}
 
 def render_chunking_debug_panel():
     st.markdown("### DEBUG: Chunking internals (temporary)")
-    keys = [
-        "do_chunk", "chunk_in_progress", "chunk_error", "chunk_progress",
-        "chunk_params"
-    ]
-    debug = {k: st.session_state.get(k, "<missing>") for k in keys}
+    job = get_job_manager().get(st.session_state["jobs"].get("chunk"))
+    debug = {"chunk_params": st.session_state.get("chunk_params"), "job": job.as_dict() if job else None}
     debug["chunks_count"] = len(st.session_state.get("chunks", []))
     st.json(debug)
 
 
-# -------------------------
-# Background task triggers (two-phase pattern)
-# -------------------------
-def _run_chunking_task():
-    # Uses params saved in session by Step 2 UI
-    try:
-        size = int(st.session_state["chunk_params"].get("size", 400))
-        overlap = int(st.session_state["chunk_params"].get("overlap", 50))
-        raw_texts = [c.text for c in st.session_state["chunks"]]
-        # Validate inputs
-        if not raw_texts:
-            raise ValueError("No documents available to chunk. Please complete Step 1 and upload PDFs.")
-        if not any((t or '').strip() for t in raw_texts):
-            raise ValueError("Uploaded documents contain no extractable text.")
-        total_len = sum(len(t or "") for t in raw_texts)
-        if total_len > 2000000:
-            raise ValueError("Input too large to chunk at once. Please upload fewer/smaller PDFs or reduce content size.")
-
-        new_chunks = []
-        base_id = 0
-        for t in raw_texts:
-            cs = chunk_text(t or "", size, overlap)
-            for s in cs:
-                cid = base_id + len(new_chunks)
-                new_chunks.append(Chunk(chunk_id=cid, text=s, source="uploaded_docs"))
-
-        st.session_state["chunks"] = new_chunks
-        st.session_state["do_chunk"] = False
-        st.session_state["chunk_in_progress"] = False
-        st.session_state["busy"] = False
-        st.toast(f"Created {len(new_chunks)} chunks.", icon="✅")
-        st.rerun()
-    except Exception as e:
-        # Ensure flags are reset and notify user
-        st.session_state["do_chunk"] = False
-        st.session_state["chunk_in_progress"] = False
-        st.session_state["busy"] = False
-        st.error(f"Chunking failed: {e}")
-        st.toast("Chunking failed. See error above.", icon="❌")
-        st.rerun()
-
-
-# Execute background chunking using a stable three-phase pattern
-# 1) Button sets do_chunk=True then reruns
-# 2) On next run, we only mark chunk_in_progress=True, render overlay, and rerun to let browser paint
-# 3) On the following run, we perform the heavy work, then rerun to show results
-if st.session_state.get("do_chunk") and not st.session_state.get("chunk_in_progress"):
-    st.session_state["busy"] = True
-    st.session_state["chunk_in_progress"] = True
-    render_loading_overlay()
-    st.rerun()
-elif st.session_state.get("chunk_in_progress"):
-    st.session_state["busy"] = True
-    render_loading_overlay()
-    _run_chunking_task()
-
 # -------------------------
 # Utility functions
 # -------------------------
@@ -243,114 +208,256 @@ def parse_pdf_bytes(pdf_bytes: bytes):
     if not pdfplumber:
         st.error("pdfplumber not installed.")
         return []
-    pages = []
-    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-        for p in pdf.pages:
-            pages.append(p.extract_text() or "")
-    return pages
+    return extract_pdfs([("upload.pdf", pdf_bytes)], engine="pdfplumber", workers=st.session_state.get("pdf_workers"))[0].pages
 
-def embed_texts_sentence_transformer(texts: List[str], model_name: str):
+def encode_sentence_transformer(texts: List[str], model_name: str, show_progress_bar: bool = True):
+    """(embeddings, CacheStats) without touching session state (safe on job threads)."""
     if SentenceTransformer is None:
         raise RuntimeError("Install sentence-transformers for local embeddings.")
-    model = st.session_state.get("local_emb_model")
-    if model is None or getattr(model, "name", "") != model_name:
-        model = SentenceTransformer(model_name)
-        st.session_state["local_emb_model"] = model
-    arr = model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
-    return arr.tolist()
+    # Shared across sessions: loaded once per process by the model registry.
+    model = get_sentence_transformer(model_name)
+    return embed_with_cache(
+        texts, model_name,
+        lambda miss: model.encode(miss, show_progress_bar=show_progress_bar, convert_to_numpy=True),
+        get_embedding_cache(),
+    )
 
-def embed_texts_openai(texts: List[str], model="text-embedding-3-small"):
+def embed_texts_sentence_transformer(texts: List[str], model_name: str):
+    arr, stats = encode_sentence_transformer(texts, model_name)
+    st.session_state["emb_cache_stats"] = stats.as_dict()
+    return arr
+
+def encode_openai(texts: List[str], api_key: str, model: str = "text-embedding-3-small"):
+    """EmbeddingBatchResult for ``texts``; no UI side effects (safe on job threads)."""
     if not OpenAI:
         raise RuntimeError("Install openai package.")
+    # Retries/backoff are handled per batch by embed_openai_batched.
+    client = get_openai_client(api_key, max_retries=0)
+    res = embed_openai_batched(client, texts, model=model)
+    _logger.info(
+        f"OpenAI embeddings: {len(texts)} texts in {res.requests} requests "
+        f"({res.retries} retries, {res.failed} failed) in {res.elapsed_s:.2f}s"
+    )
+    return res
+
+def openai_embedding_problems(n_texts: int, failed: int, errors: List[str]) -> List[tuple]:
+    """(level, message) pairs describing failed OpenAI embedding batches."""
+    if not failed:
+        return []
+    msg = errors[0] if errors else ""
+    if "insufficient_quota" in msg or "429" in msg:
+        out = [("error", "OpenAI rate limit or quota exceeded. Switch to a local embedding model in Step 3 or update your OpenAI plan.")]
+    else:
+        out = [("error", f"OpenAI embeddings failed: {msg}")]
+    if failed < n_texts:
+        out.append(("warning", f"Kept {n_texts - failed} of {n_texts} embeddings; {failed} chunks have no embedding."))
+    return out
+
+def embed_texts_openai(texts: List[str], model="text-embedding-3-small"):
     key = get_openai_api_key()
     if not key:
         raise RuntimeError("OpenAI API key missing — set it in Step 3 to use OpenAI embeddings.")
-    client = OpenAI(api_key=key)
-    try:
-        embeddings = []
-        for t in texts:
-            resp = client.embeddings.create(input=t, model=model)
-            embeddings.append(resp.data[0].embedding)
-        return embeddings
-    except Exception as e:
-        msg = str(e)
-        if "insufficient_quota" in msg or "429" in msg:
-            st.error("OpenAI rate limit or quota exceeded. Switch to a local embedding model in Step 3 or update your OpenAI plan.")
-            return []
-        st.error(f"OpenAI embeddings failed: {e}")
-        return []
+    res = encode_openai(texts, key, model=model)
+    for level, msg in openai_embedding_problems(len(texts), res.failed, res.errors):
+        getattr(st, level)(msg)
+    return res.embeddings
 
-def build_faiss_index(embeddings):
+def build_faiss_index(embeddings, kind: str = "auto", **params):
     if faiss is None or np is None:
         raise RuntimeError("Install faiss-cpu and numpy")
-    xb = np.array(embeddings).astype("float32")
+    # float32 matrices are used as-is (normalized in place); no per-row conversion.
+    xb = np.ascontiguousarray(embeddings, dtype="float32")
+    if not xb.flags.writeable:  # memory-mapped embeddings from a saved artifact
+        xb = xb.copy()
     faiss.normalize_L2(xb)
-    dim = xb.shape[1]
-    index = faiss.IndexFlatIP(dim)
-    index.add(xb)
-    return index
+    return build_vector_index(xb, kind=kind, **params)
 
-def retrieve_in_memory(query: str, top_k: int=5):
-    # default fallback: naive ngram or chunk similarity - but prefer using FAISS if built
-    if not st.session_state.get("faiss_index"):
-        # improved fallback: keyword-overlap scoring across tokens
-        import re
-        stop = {
-            "the","a","an","and","or","is","are","to","of","in","on","for","with","how","should","be","by","do","does","can","could","would","what","when","where","why","which"
-        }
-        toks = [t for t in re.findall(r"[a-z0-9]+", query.lower()) if t not in stop]
-        qset = set(toks)
-        scored = []
-        for c in st.session_state.get("chunks", [])[:500]:
-            words = set(re.findall(r"[a-z0-9]+", (c.text or "").lower()))
-            ov = len(qset & words)
-            if ov > 0:
-                scored.append((ov, c))
-        scored.sort(key=lambda x: x[0], reverse=True)
-        out = []
-        for score, c in scored[:top_k]:
-            out.append({"chunk_id": c.chunk_id, "score": float(score), "text": c.text, "source": c.source})
-        return out
-    # with FAISS: embed query using the selected embedding model
+def embed_queries(queries: List[str]):
+    """Embed all queries with the selected embedding model, one call for the cache misses.
+
+    Returns (matrix, ok, QueryCacheStats) where ``ok[i]`` is False for a query that
+    could not be embedded. Vectors come from the process-wide query embedding cache.
+    """
     emb_name = st.session_state.get("emb_model_name")
-    q_emb = None
     if emb_name and emb_name.startswith("openai"):
-        q_emb = embed_texts_openai([query])[0]
+        encode_fn = embed_texts_openai
+    else:
+        encode_fn = lambda miss: encode_sentence_transformer(miss, emb_name, show_progress_bar=False)[0]
+    embs, qstats = get_query_embedding_cache().encode(emb_name or "", list(queries), encode_fn)
+    ok = np.array([e is not None for e in embs], dtype=bool)
+    if not ok.any():
+        raise RuntimeError("Could not embed the query.")
+    dim = len(next(e for e in embs if e is not None))
+    mat = np.zeros((len(embs), dim), dtype="float32")
+    for i, e in enumerate(embs):
+        if e is not None:
+            mat[i] = e
+    return mat, ok, qstats
+
+def format_query_cache(stats: dict) -> str:
+    return (f"query cache {stats['hits']}/{stats['hits'] + stats['misses']} hits ({stats['hit_ratio']:.0%}), "
+            f"saved {stats['saved_s'] * 1000:.1f} ms of encoding")
+
+def _result_row(c, score: float) -> dict:
+    return {"chunk_id": c.chunk_id, "score": score, "text": c.text, "source": c.source}
+
+# Rendering one expander per question dominates a large regression run.
+BATCH_DETAIL_LIMIT = 100
+
+# Chunks sent to the LLM per answer (without re-ranking, the raw top-k).
+ANSWER_TOP_K = 5
+
+def rerank_settings():
+    """The session's re-ranking settings, or None when re-ranking is off."""
+    cfg = st.session_state.get("rerank") or {}
+    return cfg if cfg.get("enabled") else None
+
+def answer_top_k() -> int:
+    cfg = rerank_settings()
+    return int(cfg["keep"]) if cfg else ANSWER_TOP_K
+
+def rerank_rows(queries: List[str], rows_per_query: List[list], top_k: int, cfg: dict, baseline_k: int):
+    """Re-rank each query's over-fetched rows with the cross-encoder and keep ``top_k``.
+
+    Returns (rows per query, stats). ``baseline_k`` rows in retrieval order are what
+    would have been sent without re-ranking; stats compare their size to the kept rows.
+    """
+    try:
+        score_fn = cross_encoder_scorer(cfg["model"])
+    except Exception as e:
+        _logger.warning(f"Re-ranking skipped: {e}")
+        return [rows[:top_k] for rows in rows_per_query], {"error": str(e)}
+    out = []
+    agg = {"queries": len(queries), "candidates": 0, "scored": 0, "truncated": 0, "rerank_ms": 0.0, "max_ms": 0.0,
+           "tokens_before": 0, "tokens_after": 0}
+    for q, rows in zip(queries, rows_per_query):
+        texts = [r["text"] for r in rows]
+        res = rerank(q, texts, top_k, score_fn, budget_ms=float(cfg["budget_ms"]))
+        kept = [{**rows[i], "rerank_score": sc} for i, sc in zip(res.order, res.scores)]
+        out.append(kept)
+        ms = res.elapsed_s * 1000
+        agg["candidates"] += res.candidates
+        agg["scored"] += res.scored
+        agg["truncated"] += int(res.truncated)
+        agg["rerank_ms"] += ms
+        agg["max_ms"] = max(agg["max_ms"], ms)
+        agg["tokens_before"] += approx_tokens(texts[:baseline_k])
+        agg["tokens_after"] += approx_tokens([r["text"] for r in kept])
+    agg["rerank_ms"] = round(agg["rerank_ms"], 2)
+    agg["max_ms"] = round(agg["max_ms"], 2)
+    return out, agg
+
+def format_rerank(stats: dict) -> str:
+    if stats.get("error"):
+        return f"re-ranking skipped: {stats['error']}"
+    n = max(1, stats["queries"])
+    before, after = stats["tokens_before"], stats["tokens_after"]
+    cut = f" (-{1 - after / before:.0%})" if before else ""
+    return (f"re-ranked {stats['scored']}/{stats['candidates']} candidates in {stats['rerank_ms'] / n:.1f} ms/query "
+            f"(max {stats['max_ms']:.1f} ms, {stats['truncated']} over budget) · context ≈ {before} → {after} tokens{cut}")
+
+def filter_mask(filters: dict = None):
+    """Row bitmap for ``filters`` ({"sources": [...], "pages": (first, last)}), or None
+    when nothing is filtered out."""
+    if not filters or (filters.get("sources") is None and filters.get("pages") is None):
+        return None
+    mask = get_chunk_store().row_mask(sources=filters.get("sources"), pages=filters.get("pages"))
+    return None if mask.all() else mask
+
+def retrieve_batch(queries: List[str], top_k: int = 5, baseline_k: int = None, filters: dict = None):
+    """Retrieve for many queries at once: one encode call and one matrix FAISS search.
+
+    ``filters`` restricts candidates to chunks from the given sources/page range before
+    scoring (see filter_mask). With re-ranking on, over-fetches the configured number
+    of candidates and keeps ``top_k`` after cross-encoder scoring. Returns (results per
+    query, stats) where stats has encode/search timings in seconds (and filter/re-rank
+    stats when used).
+    """
+    cfg = rerank_settings()
+    fetch = max(top_k, int(cfg["candidates"])) if cfg else top_k
+    mask = filter_mask(filters)
+    chunks = st.session_state.get("chunks", [])
+    if not st.session_state.get("faiss_index"):
+        # lexical fallback: BM25 over the prebuilt inverted index (whole corpus or the filtered rows)
+        hits, stats = search_chunks(queries, fetch, chunks, bm25=get_bm25_index(), mask=mask)
     else:
-        q_emb = embed_texts_sentence_transformer([query], emb_name)[0]
-    vec = np.array([q_emb]).astype("float32")
-    faiss.normalize_L2(vec)
-    D,I = st.session_state["faiss_index"].search(vec, top_k)
-    results=[]
-    for score, idx in zip(D[0], I[0]):
-        if idx<0: continue
-        c = st.session_state["chunks"][int(idx)]
-        results.append({"chunk_id": c.chunk_id, "score": float(score), "text": c.text, "source": c.source})
-    return results
+        # with FAISS: embed every query in one call using the selected embedding model
+        hits, stats = search_chunks(queries, fetch, get_chunk_store(), index=st.session_state["faiss_index"],
+                                    encode=embed_queries, mask=mask, knobs=st.session_state.get("search_knobs"))
+    out = [[_result_row(chunks[i], score) for i, score in q] for q in hits]
+    if cfg:
+        out, stats["rerank"] = rerank_rows(queries, out, top_k, cfg, baseline_k or top_k)
+    return out, stats
+
+def format_filter(stats: dict) -> str:
+    return f"searched {stats['rows']:,} of {stats['of']:,} chunks ({stats['strategy'].replace('_', ' ')})"
+
+def render_search_filter(key: str):
+    """Source / page scope widgets; returns filters for retrieve_batch, or None."""
+    chunks = st.session_state.get("chunks", [])
+    if not len(chunks):
+        return None
+    store = get_chunk_store()
+    sources = st.multiselect("Limit to documents", store.source_names, default=[], key=f"{key}_sources",
+                             help="Only these documents are searched (all when empty).")
+    pages = None
+    known = store.pages[store.pages >= 0]
+    if len(known):
+        lo, hi = int(known.min()), int(known.max())
+        if lo < hi:
+            first, last = st.slider("Pages", lo, hi, (lo, hi), key=f"{key}_pages")
+            if (first, last) != (lo, hi):
+                pages = (first, last)
+    if not sources and pages is None:
+        return None
+    return {"sources": sources or None, "pages": pages}
 
-def generate_answer_openai(question, retrieved, model_choice, temperature=0.0):
-    if not OpenAI:
-        raise RuntimeError("OpenAI client not installed.")
-    key = get_openai_api_key()
-    if not key:
-        raise RuntimeError("OpenAI API key missing — set it in Step 3 to use OpenAI LLMs.")
-    client = OpenAI(api_key=key)
+def retrieve_in_memory(query: str, top_k: int=5):
+    results, _stats = retrieve_batch([query], top_k=top_k)
+    return results[0]
+
+# Part of the answer cache key: bump whenever _answer_messages changes.
+ANSWER_PROMPT_VERSION = "compliance-v1"
+
+def answer_context_key(retrieved, model_choice):
+    return context_key(((r["chunk_id"], r["text"]) for r in retrieved), model_choice, ANSWER_PROMPT_VERSION)
+
+def _answer_messages(question, retrieved):
     context=""
     for r in retrieved:
         context += f"[chunk {r['chunk_id']} | score={r['score']}]\n{r['text']}\n\n---\n"
     system="You are a compliance assistant. Answer concisely in up to 3 bullets. After each bullet include source chunk ids in brackets."
     user=f"Context:\n{context}\n\nQuestion: {question}\n\nRequirements: 3 bullets max, cite chunk ids, if unsupported say 'No supporting policy found.'"
+    return [{"role":"system","content":system},{"role":"user","content":user}]
+
+def cited_chunk_ids(text):
+    import re
+    return [int(s) for s in re.findall(r"chunk\s*(\d+)", text, flags=re.IGNORECASE)]
+
+def _answer_client():
+    if not OpenAI:
+        raise RuntimeError("OpenAI client not installed.")
+    key = get_openai_api_key()
+    if not key:
+        raise RuntimeError("OpenAI API key missing — set it in Step 3 to use OpenAI LLMs.")
+    return get_openai_client(key)
+
+def generate_answer_openai(question, retrieved, model_choice, temperature=0.0):
+    client = _answer_client()
     try:
+        t0 = time.perf_counter()
         resp = client.chat.completions.create(
             model=model_choice,
-            messages=[{"role":"system","content":system},{"role":"user","content":user}],
+            messages=_answer_messages(question, retrieved),
             temperature=temperature,
             max_tokens=512,
+            timeout=LLM_TIMEOUT_S,
         )
+        elapsed = time.perf_counter() - t0
         text=(resp.choices[0].message.content or "").strip()
-        import re
-        ids = [int(s) for s in re.findall(r"chunk\s*(\d+)", text, flags=re.IGNORECASE)]
-        return {"answer": text, "sources": ids, "raw": {"id": resp.id}}
+        tokens = resp.usage.completion_tokens if getattr(resp, "usage", None) else None
+        return {"answer": text, "sources": cited_chunk_ids(text), "raw": {"id": resp.id},
+                "metrics": answer_metrics(elapsed, elapsed, tokens, streamed=False)}
     except Exception as e:
         msg = str(e)
         if "insufficient_quota" in msg or "429" in msg:
@@ -359,6 +466,157 @@ def generate_answer_openai(question, retrieved, model_choice, temperature=0.0):
             st.error(f"OpenAI chat failed: {e}")
         return {"answer": "[OpenAI error]", "sources": [], "raw": {"error": msg}}
 
+def stream_answer_openai(question, retrieved, model_choice, temperature=0.0):
+    """Start a streamed answer; iterate the returned AnswerStream to render it. Raises on
+    request errors so the caller can fall back to generate_answer_openai."""
+    return stream_chat(
+        _answer_client(),
+        model=model_choice,
+        messages=_answer_messages(question, retrieved),
+        temperature=temperature,
+        max_tokens=512,
+        timeout=LLM_TIMEOUT_S,
+    )
+
+def format_answer_metrics(m):
+    if m.get("cached"):
+        sim = m.get("similarity", 1.0)
+        return f"cached answer ({'exact match' if sim >= 1.0 else f'similar question, {sim:.2f}'}) · {m['total_s'] * 1000:.0f} ms"
+    parts = [f"first token {m['ttft_s']:.2f}s", f"total {m['total_s']:.2f}s"]
+    if m.get("tokens_per_s"):
+        parts.append(f"{m['tokens_per_s']:g} tokens/s")
+    return " · ".join(parts) + ("" if m.get("streamed") else " (not streamed)")
+
+# -------------------------
+# Background jobs: chunking (Step 2), embedding (Step 3), index builds (Step 4)
+# -------------------------
+# Jobs run on the process-wide JobManager pool and never touch st.session_state. The
+# session only remembers job IDs; a fragment polls the active job, and the finished
+# job's result is applied on the script thread by apply_finished_jobs().
+JOB_POLL_S = float(os.getenv("JOB_POLL_S", "0.5"))
+# Texts per embedding slice: progress/ETA granularity and cancellation points.
+EMBED_JOB_SLICE = int(os.getenv("EMBED_JOB_SLICE", "512"))
+
+def _embed_job(ctx, store: ChunkStore, emb_choice: str, api_key: str = None):
+    n = len(store)
+    use_openai = emb_choice.startswith("openai")
+    model_name = "text-embedding-3-small" if "embedding-3-small" in emb_choice else emb_choice
+    ctx.progress(0, n, f"embedding {n} chunks with {model_name}")
+    parts, failed, errors, cache = [], 0, [], CacheStats()
+    for lo in range(0, n, EMBED_JOB_SLICE):
+        texts = [store.text(i) for i in range(lo, min(n, lo + EMBED_JOB_SLICE))]
+        if use_openai:
+            res = encode_openai(texts, api_key, model=model_name)
+            parts.extend(res.embeddings)
+            failed += res.failed
+            errors.extend(res.errors)
+        else:
+            arr, stats = encode_sentence_transformer(texts, emb_choice, show_progress_bar=False)
+            parts.append(arr)
+            cache.add(stats)
+        ctx.progress(min(n, lo + EMBED_JOB_SLICE), n)
+    embs = parts if use_openai else (np.concatenate(parts) if parts else [])
+    return {
+        "store": store,
+        "embeddings": embs,
+        "cache_stats": None if use_openai else cache.as_dict(),
+        "notes": openai_embedding_problems(n, failed, errors),
+    }
+
+def _index_job(ctx, store: ChunkStore, kind: str, params: dict):
+    embs = store.embedding_matrix()
+    ctx.progress(0, 1, f"building {kind} index over {len(embs)} vectors")
+    t0 = time.time()
+    index = build_faiss_index(embs, kind=kind, **params)
+    ctx.progress(1, 1)
+    return {"store": store, "index": index, "build_s": time.time() - t0}
+
+def submit_job(slot: str, fn, *args, label: str = None) -> str:
+    """Start ``fn`` as the session's job for ``slot``; a running job there is cancelled."""
+    mgr = get_job_manager()
+    prev = mgr.get(st.session_state["jobs"].get(slot))
+    if prev is not None and not prev.finished:
+        mgr.cancel(prev.id)
+    job_id = mgr.submit(slot, fn, *args, label=label or slot)
+    st.session_state["jobs"][slot] = job_id
+    st.session_state.setdefault("job_notes", {})[slot] = []
+    return job_id
+
+def job_running(slot: str) -> bool:
+    job = get_job_manager().get(st.session_state["jobs"].get(slot))
+    return job is not None and not job.finished
+
+def _apply_job_result(slot: str, result: dict) -> List[tuple]:
+    if slot == "chunk":
+        set_chunks(result["chunks"], result["bm25"])
+        st.session_state["chunk_stats"] = result["chunk_stats"]
+        return [("success", f"Created {len(result['chunks'])} chunks.")]
+    # Embeddings/indexes belong to the chunk set they were computed from.
+    if st.session_state.get("chunks") is not result["store"]:
+        return [("warning", "Chunks changed while the job was running; its result was discarded.")]
+    if slot == "embed":
+        notes = list(result["notes"])
+        embs = result["embeddings"]
+        if len(embs) and any(e is not None for e in embs):
+            result["store"].set_embeddings(embs)
+            notes.insert(0, ("success", "Embeddings computed and attached to chunks."))
+        if result["cache_stats"]:
+            st.session_state["emb_cache_stats"] = result["cache_stats"]
+        return notes
+    if slot == "index":
+        st.session_state.pop("index_manifest", None)
+        if get_answer_cache() is not None:
+            get_answer_cache().invalidate("index rebuilt")
+        st.session_state["faiss_index"] = result["index"]
+        return [("success", f"FAISS index built ({index_kind(result['index'])}, {result['index'].ntotal} vectors) "
+                            f"in {result['build_s']:.2f}s.")]
+    return []
+
+def apply_finished_jobs():
+    """Move results of this session's finished jobs into session state (once per job)."""
+    mgr = get_job_manager()
+    notes = st.session_state.setdefault("job_notes", {})
+    for slot, job_id in list(st.session_state["jobs"].items()):
+        job = mgr.get(job_id)
+        if job is None:  # pruned from the manager's history
+            del st.session_state["jobs"][slot]
+            if job_id not in st.session_state["jobs_applied"]:
+                notes[slot] = [("info", f"The {slot} job's result expired before it was picked up; rerun it.")]
+            continue
+        if not job.finished or job_id in st.session_state["jobs_applied"]:
+            continue
+        st.session_state["jobs_applied"].add(job_id)
+        if job.status == "done":
+            try:
+                notes[slot] = _apply_job_result(slot, job.result)
+            except Exception as e:
+                _logger.exception(f"Applying job {job_id} failed")
+                notes[slot] = [("error", f"{job.label} finished but its result could not be applied: {e}")]
+            job.result = None  # the session holds it now
+        elif job.status == "failed":
+            notes[slot] = [("error", f"{job.label} failed: {job.error}")]
+        else:
+            notes[slot] = [("info", f"{job.label} was cancelled.")]
+
+@st.fragment(run_every=JOB_POLL_S)
+def _job_progress(slot: str):
+    job = get_job_manager().get(st.session_state["jobs"].get(slot))
+    if job is None or job.finished:
+        st.rerun()  # full rerun: apply_finished_jobs() picks the result up
+    d = job.as_dict()
+    eta = f", ETA {d['eta_s']:.0f}s" if d["eta_s"] is not None else ""
+    st.progress(d["progress"] or 0.0, text=f"{job.label} — {d['status']} {d['message']} ({d['elapsed_s']:.0f}s{eta})")
+    if st.button("Cancel", key=f"cancel_job_{slot}", disabled=job.cancel_requested):
+        get_job_manager().cancel(job.id)
+
+def render_job_status(slot: str):
+    if job_running(slot):
+        _job_progress(slot)
+    for level, msg in st.session_state.get("job_notes", {}).get(slot, []):
+        getattr(st, level)(msg)
+
+apply_finished_jobs()
+
 # -------------------------
 # Sidebar: steps checklist
 # -------------------------
@@ -387,24 +645,37 @@ tab = st.radio("Go to step", [f"Step {i}" for i in range(1,9)], index=0)
 if tab == "Step 1":
     st.header("Step 1 — Upload PDF(s)")
     uploaded = st.file_uploader("Upload PDF(s)", type=["pdf"], accept_multiple_files=True)
+    st.number_input(
+        "Extraction workers", min_value=1, max_value=max(1, os.cpu_count() or 1) * 2, value=PDF_WORKERS, step=1,
+        key="pdf_workers", help="Processes used to extract pages in parallel (PDF_WORKERS).",
+    )
     if uploaded:
         st.session_state["chunks"] = []
-        total_pages=0
-        added=0
-        for f in uploaded:
-            data=f.read()
-            pages = parse_pdf_bytes(data) if pdfplumber else [""]
-            txt = "\n\n".join(pages)
-            start_id = len(st.session_state["chunks"])
-            chs = chunk_text(txt, 10000, 0)  # added big chunk for raw doc storage
-            for i, t in enumerate(chs):
-                cid=start_id+i
-                st.session_state["chunks"].append(Chunk(chunk_id=cid, text=t, source=f.name))
-                added+=1
-            total_pages += len(pages)
-        st.success(f"Indexed {len(uploaded)} documents, {added} raw-doc chunks, {total_pages} pages.")
+        st.session_state["faiss_index"] = None
+        st.session_state.pop("index_manifest", None)
+        # Stream pages -> normalized text -> one row per non-empty page; whole documents
+        # are never concatenated and every row keeps its source file and page number.
+        builder = ChunkStoreBuilder()
+        _, ingest_stats = ingest(
+            ((f.name, f.read()) for f in uploaded),
+            chunker=lambda t: [t] if len(t) > 20 else [],
+            builder=builder,
+            engine="pdfplumber" if pdfplumber else "pypdf",
+            workers=st.session_state["pdf_workers"],
+        )
+        set_chunks(builder.build())
+        for err in ingest_stats.errors:
+            st.warning(f"Could not read {err}")
+        st.success(
+            f"Indexed {ingest_stats.files} documents, {ingest_stats.chunks} page records, {ingest_stats.pages} pages."
+        )
+        st.caption(
+            f"Ingested {ingest_stats.pages} pages in {ingest_stats.elapsed_s:.2f}s "
+            f"({ingest_stats.as_dict()['pages_per_s'] or 0:.0f} pages/s, {st.session_state['pdf_workers']} worker(s))"
+        )
+        st.dataframe(pd.DataFrame(ingest_stats.per_file))
         st.write("Indexed documents:")
-        st.write(list(set([c.source for c in st.session_state["chunks"]])))
+        st.write(list(st.session_state["chunks"].source_names))
 
     if st.button("Mark Step 1 Complete"):
         st.session_state["completed_steps"]["step1"]=True
@@ -413,24 +684,29 @@ if tab == "Step 1":
 # STEP 2: Chunk & Preview
 if tab=="Step 2":
     st.header("Step 2 — Chunk & Preview")
-    chunk_size = st.number_input("Chunk size (chars)", value=400, min_value=200, max_value=3000, step=50)
-    overlap = st.number_input("Overlap (chars)", value=50, min_value=0, max_value=500, step=10)
-    if st.button("Run chunking on current docs"):
+    strategy = st.selectbox(
+        "Chunking strategy", CHUNK_STRATEGIES, index=CHUNK_STRATEGIES.index(DEFAULT_CHUNK_STRATEGY),
+        format_func=strategy_label, help="Size and overlap are counted in tokens for the token strategy.",
+    )
+    chunk_size = st.number_input(f"Chunk size ({size_unit(strategy)})", value=DEFAULT_CHUNK_SIZE, min_value=50, max_value=3000, step=50)
+    overlap = st.number_input(f"Overlap ({size_unit(strategy)})", value=DEFAULT_CHUNK_OVERLAP, min_value=0, max_value=500, step=10)
+    dedup_labels = {"near": "Exact + near duplicates", "exact": "Exact duplicates only", "off": "Keep duplicates"}
+    dedup_mode = st.selectbox(
+        "Duplicate removal", DEDUP_MODES, index=DEDUP_MODES.index(DEDUP_MODE), format_func=dedup_labels.get,
+        help="Drops repeated headers, footers and disclaimers before embedding "
+             "(near = MinHash shingle similarity ≥ DEDUP_THRESHOLD).",
+    )
+    if st.button("Run chunking on current docs", disabled=job_running("chunk")):
         # Validate before triggering background work
-        have_raw = bool(st.session_state.get("chunks")) and any(
-            (c.text or '').strip() for c in st.session_state.get("chunks", [])
-        )
+        have_raw = bool(st.session_state.get("chunks")) and get_chunk_store().text_nbytes() > 0
         if not have_raw:
             st.warning("No documents with text to chunk. Please complete Step 1 first.")
         else:
-            # Start non-blocking background chunking (preferred)
-            st.session_state["chunk_params"] = {"size": int(chunk_size), "overlap": int(overlap)}
-            start_chunking_in_background(int(chunk_size), int(overlap))
-            st.info("Background chunking started. Use the debug panel below to monitor progress.")
-    # Optional debug background run that won't block Streamlit's event loop
-    if st.button("Run chunking (background debug)"):
-        start_chunking_in_background(int(chunk_size), int(overlap))
-        st.info("Background chunking started. Use the debug panel below to monitor progress.")
+            st.session_state["chunk_params"] = {"size": int(chunk_size), "overlap": int(overlap), "strategy": strategy,
+                                                "dedup": dedup_mode}
+            submit_job("chunk", _chunk_job, get_chunk_store(), int(chunk_size), int(overlap), strategy, dedup_mode,
+                       label="Chunking")
+    render_job_status("chunk")
     # preview
     num_preview = st.slider("Preview N chunks", 1, 20, 5)
     if st.session_state["chunks"]:
@@ -442,14 +718,25 @@ if tab=="Step 2":
         st.info("No chunks found. Run Step 1 first or click run chunking.")
     # Show debug panel at the end of Step 2
     render_chunking_debug_panel()
-    # Status and error display for background worker
-    if st.session_state.get("chunk_in_progress"):
+    if job_running("chunk"):
         st.info("Chunking in progress — running in background. UI remains responsive.")
-    elif st.session_state.get("chunk_error"):
-        st.error("Chunking failed (see details below).")
-        st.code(st.session_state.get("chunk_error"), language="text")
     elif st.session_state.get("chunks"):
         st.success(f"Chunking complete. {len(st.session_state['chunks'])} chunks available.")
+        chunk_stats = st.session_state.get("chunk_stats")
+        if chunk_stats:
+            if chunk_stats.get("warning"):
+                st.warning(chunk_stats["warning"])
+            st.caption(
+                f"Last run: {chunk_stats['pages']} pages, {chunk_stats['mb']} MB "
+                f"→ {chunk_stats['chunks']} chunks in {chunk_stats['elapsed_s']}s ({chunk_stats['mb_per_s']} MB/s)"
+            )
+            dd = chunk_stats.get("dedup")
+            if dd and dd["dropped"]:
+                st.caption(
+                    f"Duplicates removed: {dd['exact']} exact + {dd['near']} near of {dd['seen']} chunks "
+                    f"({dd['saved_pct']}%) — {dd['embeddings_saved']} embedding inputs and "
+                    f"{dd['chars_saved'] / 1e3:.1f}k chars not embedded."
+                )
     if st.button("Mark Step 2 Complete"):
         st.session_state["completed_steps"]["step2"]=True
         st.success("Step 2 marked complete.")
@@ -469,26 +756,31 @@ if tab=="Step 3":
         ],
     )
     st.session_state["emb_model_name"] = emb_choice
-    if st.button("Compute embeddings for all chunks (may be slow)"):
-        texts = [c.text for c in st.session_state["chunks"]]
-        with st.spinner("Computing embeddings..."):
-            if emb_choice.startswith("openai"):
-                if OpenAI is None:
-                    st.error("OpenAI client not installed. Install 'openai' package and retry.")
-                    embs = []
-                elif not get_openai_api_key():
-                    st.error("OpenAI API key missing — set it in Step 3 to use OpenAI embeddings.")
-                    embs = []
-                else:
-                    model_name = "text-embedding-3-small" if "embedding-3-small" in emb_choice else emb_choice
-                    embs = embed_texts_openai(texts, model=model_name)
-            else:
-                embs = embed_texts_sentence_transformer(texts, emb_choice)
-        # attach embeddings
-        for c,e in zip(st.session_state["chunks"], embs):
-            c.embedding = e
-        st.success("Embeddings computed and attached to chunks.")
-        st.write(f"Vector dim: {len(embs[0]) if embs else 'unknown'}")
+    if st.button("Compute embeddings for all chunks (may be slow)", disabled=job_running("embed")):
+        store = get_chunk_store()
+        if not len(store):
+            st.warning("No chunks to embed. Run Step 2 first.")
+        elif emb_choice.startswith("openai") and OpenAI is None:
+            st.error("OpenAI client not installed. Install 'openai' package and retry.")
+        elif emb_choice.startswith("openai") and not get_openai_api_key():
+            st.error("OpenAI API key missing — set it in Step 3 to use OpenAI embeddings.")
+        elif not emb_choice.startswith("openai") and SentenceTransformer is None:
+            st.error("Install sentence-transformers for local embeddings.")
+        else:
+            submit_job("embed", _embed_job, store, emb_choice, get_openai_api_key(), label=f"Embedding ({emb_choice})")
+    render_job_status("embed")
+    if st.session_state.get("chunks") and not job_running("embed"):
+        st.write(f"Vector dim: {get_chunk_store().dim or 'unknown'}")
+        if not emb_choice.startswith("openai") and st.session_state.get("emb_cache_stats"):
+            cs = st.session_state["emb_cache_stats"]
+            st.caption(
+                f"Embedding cache: {cs['hits']} hits, {cs['misses']} misses "
+                f"({cs['hit_rate']:.0%} hit rate), {cs['bytes_saved'] / 1e6:.2f} MB not recomputed"
+            )
+    model_stats = get_registry().stats()
+    if model_stats:
+        with st.expander("Loaded embedding models (shared by all sessions)", expanded=False):
+            st.table(model_stats)
     if st.button("Mark Step 3 Complete"):
         st.session_state["completed_steps"]["step3"]=True
         st.success("Step 3 marked complete.")
@@ -496,13 +788,79 @@ if tab=="Step 3":
 # STEP 4: Build index & Retrieval
 if tab=="Step 4":
     st.header("Step 4 — Build Index & Retrieval Test")
-    if st.button("Build FAISS index"):
-        embs = [c.embedding for c in st.session_state["chunks"] if c.embedding is not None]
-        if not embs:
+    manifest = st.session_state.get("index_manifest")
+    if manifest:
+        st.caption(
+            f"Using saved index {manifest.get('version')} ({manifest.get('index_kind')}, {manifest.get('n_chunks')} chunks, "
+            f"model {manifest.get('embedding_model')}), loaded in {manifest.get('load_time_s')}s."
+        )
+    if st.button("Load saved index from disk"):
+        try:
+            if attach_saved_index():
+                st.success("Saved index loaded.")
+                st.rerun()
+            else:
+                st.warning(f"No saved index found in {INDEX_ARTIFACT_DIR}.")
+        except Exception as e:
+            st.error(f"Loading saved index failed: {e}")
+    with st.expander("Index type & search parameters", expanded=False):
+        ic1, ic2, ic3 = st.columns(3)
+        with ic1:
+            idx_kind = st.selectbox("Index type", INDEX_KINDS, index=0,
+                                    help="auto: Flat for small corpora, HNSW for mid-size, IVF-PQ for very large")
+            nlist = st.number_input("IVF lists (0 = auto)", min_value=0, max_value=65536, value=0, step=64)
+        with ic2:
+            train_size = st.number_input("IVF training sample (0 = auto)", min_value=0, value=0, step=1000)
+            nprobe = st.number_input("nprobe (IVF)", min_value=1, max_value=4096, value=DEFAULT_NPROBE, step=1)
+        with ic3:
+            hnsw_m = st.number_input("HNSW M", min_value=4, max_value=128, value=32, step=4)
+            ef_search = st.number_input("efSearch (HNSW)", min_value=1, max_value=4096, value=DEFAULT_EF_SEARCH, step=8)
+    with st.expander("Re-ranking (cross-encoder)", expanded=False):
+        cfg = st.session_state["rerank"]
+        if CrossEncoder is None:
+            st.caption("Install sentence-transformers to enable cross-encoder re-ranking.")
+        cfg["enabled"] = CrossEncoder is not None and st.checkbox("Re-rank retrieved chunks", value=cfg["enabled"], disabled=CrossEncoder is None,
+                                     help="Over-fetch candidates from the index, score them with a local cross-encoder and keep the best.")
+        rc1, rc2, rc3 = st.columns(3)
+        with rc1:
+            cfg["candidates"] = st.number_input("Candidates to score", min_value=2, max_value=200, value=int(cfg["candidates"]), step=1)
+        with rc2:
+            cfg["keep"] = st.number_input("Chunks sent to the LLM", min_value=1, max_value=20, value=int(cfg["keep"]), step=1,
+                                          help=f"Without re-ranking the chatbot sends the top {ANSWER_TOP_K}.")
+        with rc3:
+            cfg["budget_ms"] = st.number_input("Time budget per query (ms, 0 = none)", min_value=0, max_value=10000,
+                                               value=int(cfg["budget_ms"]), step=50)
+        cfg["model"] = st.text_input("Cross-encoder model", value=cfg["model"])
+    if st.button("Build FAISS index", disabled=job_running("index")):
+        store = get_chunk_store() if st.session_state.get("chunks") else None
+        if store is None or store.embeddings is None:
             st.error("No embeddings found. Run Step 3.")
+        elif faiss is None or np is None:
+            st.error("Install faiss-cpu and numpy")
         else:
-            st.session_state["faiss_index"] = build_faiss_index(embs)
-            st.success("FAISS index built.")
+            params = {"nlist": int(nlist) or None, "train_size": int(train_size) or None, "hnsw_m": int(hnsw_m)}
+            submit_job("index", _index_job, store, idx_kind, params, label=f"Index build ({idx_kind})")
+    render_job_status("index")
+    # Per-session knobs passed with each search: the index may be a loaded artifact shared
+    # by every session in the process, so it is never modified.
+    st.session_state["search_knobs"] = {"nprobe": int(nprobe), "ef_search": int(ef_search)}
+    if st.session_state.get("faiss_index") is not None:
+        if st.button("Save index to disk"):
+            try:
+                version = save_artifact(
+                    st.session_state["faiss_index"], get_chunk_store(), embedding_model=st.session_state.get("emb_model_name"),
+                )
+                st.success(f"Saved index version {version} to {INDEX_ARTIFACT_DIR}.")
+            except Exception as e:
+                st.error(f"Saving index failed: {e}")
+        if st.button("Recall@k vs. latency report (against exact Flat)"):
+            xb = get_chunk_store().embedding_matrix()
+            rng = np.random.default_rng(0)
+            rows = rng.choice(len(xb), size=min(200, len(xb)), replace=False)
+            # Perturbed copies of stored chunks stand in for real queries.
+            queries = xb[rows] + rng.normal(scale=0.05, size=(len(rows), xb.shape[1])).astype("float32")
+            st.table([recall_report(xb, st.session_state["faiss_index"], queries, k=10,
+                                    **st.session_state["search_knobs"])])
     # ---------- Enhanced retrieval testers (single + batch) ----------
     DEFAULT_SAMPLE_QUESTIONS = [
         "What is Flykite Airlines' leave accrual policy?",
@@ -563,6 +921,7 @@ if tab=="Step 4":
         return parsed[:top_k]
 
     st.subheader("Test queries (single or batch)")
+    scope = render_search_filter("step4_filter")
     if "sample_questions" not in st.session_state:
         st.session_state["sample_questions"] = DEFAULT_SAMPLE_QUESTIONS.copy()
 
@@ -641,14 +1000,23 @@ if tab=="Step 4":
         else:
             with st.spinner("Running retrieval..."):
                 t0 = time.time()
+                single_stats = {}
                 try:
-                    results = retrieve_in_memory(q, top_k=int(top_k_single))
+                    batch, single_stats = retrieve_batch([q], top_k=int(top_k_single), filters=scope)
+                    results = batch[0]
                 except Exception as e:
                     st.error(f"retrieve_in_memory raised an error: {e}")
                     results = []
                 elapsed = time.time() - t0
             parsed = parse_retrieval_results(results, top_k=int(top_k_single))
             st.success(f"Retrieved {len(parsed)} results in {elapsed:.2f}s")
+            if single_stats.get("query_cache"):
+                st.caption(f"encode {single_stats['encode_s'] * 1000:.1f} ms · {format_query_cache(single_stats['query_cache'])} · "
+                           f"process-wide: {format_query_cache(get_query_embedding_cache().stats_dict())}")
+            if single_stats.get("filter"):
+                st.caption(format_filter(single_stats["filter"]) + f" · search {single_stats['search_s'] * 1000:.2f} ms")
+            if single_stats.get("rerank"):
+                st.caption(format_rerank(single_stats["rerank"]))
             for i, r in enumerate(parsed):
                 st.markdown(f"**Result #{i+1}** — Score: {r.get('score')}")
                 st.write(r.get("chunk_text"))
@@ -669,22 +1037,39 @@ if tab=="Step 4":
             summary = []
             full_results = {}
             with st.spinner(f"Running batch retrieval for {len(qlist)} questions..."):
-                for q in qlist:
-                    t0 = time.time()
-                    try:
-                        res = retrieve_in_memory(q, top_k=int(batch_top_k))
-                    except Exception as e:
-                        res = []
-                        st.error(f"Error while retrieving for query: {q[:80]}... -> {e}")
-                    t_elapsed = time.time() - t0
+                t0 = time.perf_counter()
+                try:
+                    batch_res, batch_stats = retrieve_batch(qlist, top_k=int(batch_top_k), filters=scope)
+                except Exception as e:
+                    st.error(f"Batch retrieval failed: {e}")
+                    batch_res, batch_stats = [[] for _ in qlist], {"mode": "error", "encode_s": 0.0, "search_s": 0.0}
+                t_total = time.perf_counter() - t0
+                per_query_ms = 1000 * t_total / len(qlist)
+                for q, res in zip(qlist, batch_res):
                     parsed = parse_retrieval_results(res, top_k=int(batch_top_k))
                     top_score = parsed[0].get("score") if parsed else None
-                    summary.append({"query": q, "retrieved": len(parsed), "top_score": top_score, "time_s": round(t_elapsed, 3)})
+                    summary.append({"query": q, "retrieved": len(parsed), "top_score": top_score, "time_ms": round(per_query_ms, 3)})
                     full_results[q] = parsed
             st.markdown("**Batch summary**")
-            st.table(summary)
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("Queries", len(qlist))
+            m2.metric("Throughput", f"{len(qlist) / t_total:,.1f} q/s" if t_total > 0 else "-")
+            m3.metric("Per-query latency", f"{per_query_ms:.2f} ms")
+            m4.metric("Total", f"{t_total:.2f} s")
+            st.caption(
+                f"Mode: {batch_stats['mode']} · encode {batch_stats['encode_s'] * 1000:.1f} ms · "
+                f"search {batch_stats['search_s'] * 1000:.1f} ms (one batched call each; per-query time is amortized)"
+                + (f" · {format_query_cache(batch_stats['query_cache'])}" if batch_stats.get("query_cache") else "")
+            )
+            if batch_stats.get("filter"):
+                st.caption(format_filter(batch_stats["filter"]))
+            if batch_stats.get("rerank"):
+                st.caption(format_rerank(batch_stats["rerank"]))
+            st.dataframe(pd.DataFrame(summary))
             st.markdown("**Details**")
-            for q in qlist:
+            if len(qlist) > BATCH_DETAIL_LIMIT:
+                st.caption(f"Showing details for the first {BATCH_DETAIL_LIMIT} of {len(qlist)} questions.")
+            for q in qlist[:BATCH_DETAIL_LIMIT]:
                 with st.expander(q, expanded=False):
                     parsed = full_results.get(q, [])
                     if not parsed:
@@ -713,7 +1098,10 @@ if tab=="Step 5":
     prompt = st.text_area("Edit prompt template", value=prompt, height=160)
     test_q = st.text_input("Test question for generator", value="What is the leave policy during probation?")
     if st.button("Run generator test"):
-        retrieved = retrieve_in_memory(test_q, top_k=5)
+        results, gen_stats = retrieve_batch([test_q], top_k=answer_top_k(), baseline_k=ANSWER_TOP_K)
+        retrieved = results[0]
+        if gen_stats.get("rerank"):
+            st.caption(format_rerank(gen_stats["rerank"]))
         try:
             if OpenAI is None:
                 st.error("OpenAI client not installed. Install 'openai' package and set OPENAI_API_KEY.")
@@ -822,6 +1210,14 @@ if tab=="Step 8":
                 st.session_state.pop("chat_history", None)
                 st.success("Chat history cleared.")
 
+        answer_cache = get_answer_cache()
+        if answer_cache is not None:
+            st.subheader("Answer cache")
+            st.caption("Repeated questions over the same retrieved chunks, model and prompt reuse the stored answer (shared by all sessions; cleared when an index is rebuilt).")
+            st.json(answer_cache.stats_dict())
+            if st.button("Clear answer cache", key="clear_answer_cache_btn"):
+                answer_cache.invalidate("cleared from Step 8")
+
         st.markdown("----")
         st.caption("After launching, the configuration panel will be replaced with the interactive chatbot. Use the Close button in the chat header to return here.")
 
@@ -846,51 +1242,104 @@ if tab=="Step 8":
             if hasattr(st, "chat_message"):
                 with st.chat_message(role):
                     st.markdown(text)
+                    if msg.get("metrics"):
+                        st.caption(format_answer_metrics(msg["metrics"]))
+                    if msg.get("rerank"):
+                        st.caption(format_rerank(msg["rerank"]))
             else:
                 if role == "user":
                     st.markdown(f"> **You:** {text}")
                 else:
                     st.markdown(f"**Assistant:** {text}")
+        # The exchange in progress renders here, below the history, while it streams.
+        live = st.container()
 
+        chat_scope = render_search_filter("chat_filter")
         user_input = st.text_input("Type a message", key="chat_input", placeholder="Ask something about your uploaded documents...")
         send_col, dummy = st.columns([1,9])
         with send_col:
-            if st.button("Send", key="send_msg_btn"):
-                query = user_input.strip()
-                if not query:
-                    st.warning("Please type a question.")
-                else:
-                    st.session_state["chat_history"].append({"role":"user","text": query})
-                    with st.spinner("Generating response..."):
-                        try:
-                            retrieved = retrieve_in_memory(query, top_k=5)
-                        except Exception as e:
-                            retrieved = []
-                            st.error(f"Retrieval failed: {e}")
-
+            send_clicked = st.button("Send", key="send_msg_btn")
+        if send_clicked:
+            query = user_input.strip()
+            if not query:
+                st.warning("Please type a question.")
+            else:
+                st.session_state["chat_history"].append({"role":"user","text": query})
+                with live:
+                    with st.chat_message("user"):
+                        st.markdown(query)
+                    with st.chat_message("bot"):
+                        qvec = None
+                        with st.spinner("Retrieving context..."):
+                            try:
+                                results, rstats = retrieve_batch([query], top_k=answer_top_k(), baseline_k=ANSWER_TOP_K, filters=chat_scope)
+                                retrieved = results[0]
+                                if rstats.get("query_vectors") is not None:
+                                    qvec = rstats["query_vectors"][0]
+                            except Exception as e:
+                                retrieved = []
+                                st.error(f"Retrieval failed: {e}")
+
+                        answer_text, metrics, cache_ctx = None, None, None
+                        rerank_stats = rstats.get("rerank") if retrieved else None
                         try:
-                            answer_text = None
                             # Prefer centralized helper (session/env) to avoid secrets.toml errors
                             try:
                                 key_present = bool(get_openai_api_key())
                             except Exception:
                                 key_present = False
-                            if key_present:
+                            model_choice = st.session_state.get("llm_choice") or "gpt-4o-mini"
+                            cache = get_answer_cache() if key_present and retrieved else None
+                            if cache is not None:
+                                t0 = time.perf_counter()
+                                cache_ctx = answer_context_key(retrieved, model_choice)
+                                hit = cache.get(query, cache_ctx, query_vector=qvec)
+                                if hit:
+                                    entry, sim = hit
+                                    answer_text = entry.answer
+                                    lookup_s = time.perf_counter() - t0
+                                    metrics = {**answer_metrics(lookup_s, lookup_s, None, streamed=False), "cached": True, "similarity": round(sim, 3)}
+                                    st.markdown(answer_text)
+                            if key_present and LLM_STREAM and answer_text is None:
+                                try:
+                                    stream = stream_answer_openai(query, retrieved, model_choice=model_choice, temperature=0.0)
+                                    st.write_stream(stream)
+                                    if stream.text:
+                                        answer_text, metrics = stream.text, stream.metrics()
+                                    if stream.error:
+                                        st.warning(f"Answer stream interrupted: {stream.error}")
+                                    elif cache_ctx and answer_text:
+                                        cache.put(query, cache_ctx, answer_text, cited_chunk_ids(answer_text), metrics["total_s"], query_vector=qvec)
+                                except Exception as e:
+                                    st.warning(f"Streaming failed, retrying without streaming: {e}")
+                            if key_present and answer_text is None:
                                 try:
-                                    answer_obj = generate_answer_openai(query, retrieved, model_choice=st.session_state.get("llm_choice","gpt-4o-mini"), temperature=0.0)
+                                    with st.spinner("Generating response..."):
+                                        answer_obj = generate_answer_openai(query, retrieved, model_choice=model_choice, temperature=0.0)
                                     answer_text = answer_obj.get("answer") if isinstance(answer_obj, dict) else str(answer_obj)
+                                    metrics = answer_obj.get("metrics") if isinstance(answer_obj, dict) else None
+                                    if cache_ctx and metrics:  # metrics are only set on success
+                                        cache.put(query, cache_ctx, answer_text, answer_obj.get("sources"), metrics["total_s"], query_vector=qvec)
                                 except Exception as e:
                                     st.warning(f"LLM call failed, using fallback: {e}")
                                     answer_text = fallback_generate_answer(query, retrieved)
-                            else:
+                                st.markdown(answer_text)
+                            elif answer_text is None:
                                 answer_text = fallback_generate_answer(query, retrieved)
-                        except NameError:
-                            answer_text = fallback_generate_answer(query, retrieved)
+                                st.markdown(answer_text)
                         except Exception as e:
                             st.error(f"Error while generating answer: {e}")
                             answer_text = fallback_generate_answer(query, retrieved)
-
-                        st.session_state["chat_history"].append({"role":"bot","text": answer_text})
+                            st.markdown(answer_text)
+                        if metrics:
+                            st.caption(format_answer_metrics(metrics))
+                            _logger.info(f"Chat answer metrics: {metrics}")
+                        if rerank_stats:
+                            st.caption(format_rerank(rerank_stats))
+                        if chat_scope and retrieved and rstats.get("filter"):
+                            st.caption(format_filter(rstats["filter"]))
+
+                st.session_state["chat_history"].append({"role":"bot","text": answer_text, "metrics": metrics, "rerank": rerank_stats})
 
 st.sidebar.markdown("---")
 st.sidebar.info("Use the tabs to perform each step. Mark steps complete to indicate configuration readiness.")
@@ -0,0 +1,82 @@
+"""Offline bulk ingestion: build the index artifact the apps load from a directory of PDFs.
+
+    python -m app.ingest ./policies
+    python -m app.ingest ./policies --model openai-embedding-3-small --files-per-shard 64 --json run.json
+
+Runs parallel extraction, page-wise chunking with dedup, batched embedding and the
+index build, then saves a new artifact version under --out (INDEX_ARTIFACT_DIR);
+Streamlit sessions pick it up on start. Finished groups of files are kept in --work,
+so rerunning the same command resumes an interrupted run and a nightly rebuild only
+reprocesses new or changed PDFs. Use --fresh after changing the PDF set layout or to
+start over.
+"""
+import argparse
+import json
+import sys
+
+from dotenv import load_dotenv
+
+from app.utils.artifact_utils import INDEX_ARTIFACT_DIR
+from app.utils.bulk_ingest import BULK_FILES_PER_SHARD, BULK_WORK_DIR, bulk_ingest, format_stages
+from app.utils.chunking import (
+    CHUNK_STRATEGIES, DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_STRATEGY, token_counter,
+)
+from app.utils.dedup import DEDUP_MODE, DEDUP_MODES
+from app.utils.engine import ENGINE_EMBED_MODEL
+from app.utils.index_utils import INDEX_KINDS
+from app.utils.pdf_utils import PDF_WORKERS
+
+
+def main(argv=None) -> int:
+    load_dotenv()
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("input_dir", help="directory searched recursively for *.pdf")
+    ap.add_argument("--out", default=INDEX_ARTIFACT_DIR, help="artifact root (default: %(default)s)")
+    ap.add_argument("--work", default=BULK_WORK_DIR, help="resumable shard directory (default: %(default)s)")
+    ap.add_argument("--model", default=ENGINE_EMBED_MODEL, help="sentence-transformers model or openai-embedding-3-small")
+    ap.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    ap.add_argument("--overlap", type=int, default=DEFAULT_CHUNK_OVERLAP)
+    ap.add_argument("--strategy", default=DEFAULT_CHUNK_STRATEGY, choices=CHUNK_STRATEGIES,
+                    help=f"'token' counts {token_counter()} (default: %(default)s)")
+    ap.add_argument("--dedup", default=DEDUP_MODE, choices=DEDUP_MODES)
+    ap.add_argument("--index-kind", default="auto", choices=INDEX_KINDS)
+    ap.add_argument("--files-per-shard", type=int, default=BULK_FILES_PER_SHARD)
+    ap.add_argument("--workers", type=int, default=PDF_WORKERS, help="PDF extraction processes")
+    ap.add_argument("--engine", default="pypdf", choices=["pypdf", "pdfplumber"])
+    ap.add_argument("--fresh", action="store_true", help="discard finished shards and start over")
+    ap.add_argument("--json", help="also write the run summary to this file")
+    args = ap.parse_args(argv)
+    if args.strategy == "token" and token_counter() != "tiktoken cl100k_base":
+        print("warning: tiktoken is not installed; the token strategy counts regex words, so chunk sizes "
+              "will not match model token limits", file=sys.stderr)
+
+    try:
+        summary = bulk_ingest(
+            args.input_dir, out_dir=args.out, work_dir=args.work, embed_model=args.model,
+            chunk_size=args.chunk_size, overlap=args.overlap, strategy=args.strategy, dedup_mode=args.dedup,
+            index_kind=args.index_kind, files_per_shard=args.files_per_shard, workers=args.workers,
+            engine=args.engine, fresh=args.fresh,
+        )
+    except (RuntimeError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        print("interrupted; rerun the same command to resume", file=sys.stderr)
+        return 130
+    print(format_stages(summary))
+    print(f"{summary['chunks']:,} chunks from {summary['files']:,} PDFs ({summary['files_skipped']:,} reused, "
+          f"{summary['duplicates']:,} duplicate chunks dropped) in {summary['elapsed_s']:.1f}s "
+          f"-> {args.out} version {summary['version']}")
+    for err in summary["errors"]:
+        print(f"warning: {err}", file=sys.stderr)
+    if summary["failed_chunks"]:
+        print(f"warning: {summary['failed_chunks']:,} chunks could not be embedded and are not searchable; "
+              f"rerun the same command to retry their {summary['files_retry']:,} PDFs", file=sys.stderr)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
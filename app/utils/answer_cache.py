@@ -0,0 +1,208 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import hashlib
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from .embedding_cache import text_key
+from .logger import get_logger
+
+# Process-wide cache of generated answers. An entry is valid only for the exact
+# retrieved context (chunk IDs plus chunk text hashes), model and prompt version, so a
+# hit never answers from context the LLM did not see. Within that context, a question
+# whose embedding is close enough to a cached one (cosine >= ANSWER_CACHE_SIMILARITY)
+# also hits; 0 disables the semantic lookup.
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+ANSWER_CACHE_TTL_S = float(os.getenv("ANSWER_CACHE_TTL_S", "86400"))  # 0 disables expiry
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.92"))
+
+logger = get_logger(__name__)
+
+_PUNCT = re.compile(r"[^\w\s]")
+
+
+def normalize_question(question: str) -> str:
+    """Case, punctuation and whitespace insensitive form used for exact lookups."""
+    return " ".join(_PUNCT.sub(" ", (question or "").lower()).split())
+
+
+def context_key(chunks: Iterable[Tuple[Any, str]], model: str, prompt_version: str) -> str:
+    """Key of one retrieved context: the set of (chunk id, chunk text) pairs, the model
+    and the prompt version. Order does not matter; text hashes keep IDs from a rebuilt
+    or different corpus from colliding."""
+    ids = sorted(f"{cid}:{text_key(text)}" for cid, text in chunks)
+    raw = "\n".join([model, prompt_version, *ids])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class AnswerCacheStats:
+    hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+    saved_s: float = 0.0  # generation time of the cached answers that were served
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 3),
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "saved_s": round(self.saved_s, 2),
+        }
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    sources: List[Any]
+    cost_s: float
+    created_at: float = field(default_factory=time.time)
+    vector: Optional[np.ndarray] = None
+    hits: int = 0
+
+
+def _unit(vec) -> Optional[np.ndarray]:
+    if vec is None:
+        return None
+    v = np.asarray(vec, dtype=np.float32).reshape(-1)
+    n = float(np.linalg.norm(v))
+    return v / n if n > 0 else None
+
+
+class AnswerCache:
+    """Thread-safe LRU of answers with TTL expiry, shared by every session.
+
+    ``get`` returns ``(entry, similarity)`` or None; similarity is 1.0 for an exact
+    match of the normalized question. ``invalidate`` drops everything, e.g. after an
+    index rebuild.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl_s: float = ANSWER_CACHE_TTL_S,
+                 similarity: float = ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.similarity = similarity
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], CachedAnswer]" = OrderedDict()
+        self._by_context: Dict[str, Dict[str, CachedAnswer]] = {}
+        self.stats = AnswerCacheStats()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expired(self, entry: CachedAnswer, now: float) -> bool:
+        return self.ttl_s > 0 and now - entry.created_at > self.ttl_s
+
+    def _drop(self, key: Tuple[str, str]):
+        self._entries.pop(key, None)
+        group = self._by_context.get(key[0])
+        if group is not None:
+            group.pop(key[1], None)
+            if not group:
+                del self._by_context[key[0]]
+
+    def get(self, question: str, ctx_key: str, query_vector=None) -> Optional[Tuple[CachedAnswer, float]]:
+        now = time.time()
+        qn = normalize_question(question)
+        with self._lock:
+            found, sim = self._entries.get((ctx_key, qn)), 1.0
+            if found is not None and self._expired(found, now):
+                self._drop((ctx_key, qn))
+                self.stats.expirations += 1
+                found = None
+            if found is None:
+                found, sim = self._nearest(ctx_key, _unit(query_vector), now)
+                if found is not None:
+                    self.stats.semantic_hits += 1
+            if found is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end((ctx_key, normalize_question(found.question)))
+            found.hits += 1
+            self.stats.hits += 1
+            self.stats.saved_s += found.cost_s
+            return found, sim
+
+    def _nearest(self, ctx_key: str, qv: Optional[np.ndarray], now: float) -> Tuple[Optional[CachedAnswer], float]:
+        if qv is None or self.similarity <= 0:
+            return None, 0.0
+        best, best_sim = None, self.similarity
+        for qn, entry in list(self._by_context.get(ctx_key, {}).items()):
+            if self._expired(entry, now):
+                self._drop((ctx_key, qn))
+                self.stats.expirations += 1
+                continue
+            if entry.vector is None or entry.vector.shape != qv.shape:
+                continue
+            sim = float(entry.vector @ qv)
+            if sim >= best_sim:
+                best, best_sim = entry, sim
+        return best, best_sim
+
+    def put(self, question: str, ctx_key: str, answer: str, sources: Optional[List[Any]] = None,
+            cost_s: float = 0.0, query_vector=None):
+        key = (ctx_key, normalize_question(question))
+        entry = CachedAnswer(question=question, answer=answer, sources=list(sources or []), cost_s=cost_s,
+                             vector=_unit(query_vector))
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = entry
+            self._by_context.setdefault(ctx_key, {})[key[1]] = entry
+            self.stats.stores += 1
+            while len(self._entries) > self.max_entries:
+                old = next(iter(self._entries))
+                self._drop(old)
+                self.stats.evictions += 1
+
+    def invalidate(self, reason: str = ""):
+        with self._lock:
+            n = len(self._entries)
+            self._entries.clear()
+            self._by_context.clear()
+            self.stats.invalidations += 1
+        logger.info(f"Answer cache invalidated ({n} entries){': ' + reason if reason else ''}")
+
+    def stats_dict(self) -> dict:
+        d = self.stats.as_dict()
+        d["entries"] = len(self._entries)
+        return d
+
+
+_cache: Optional[AnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Process-wide answer cache, or None when ANSWER_CACHE_ENABLED is off."""
+    global _cache
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnswerCache()
+    return _cache
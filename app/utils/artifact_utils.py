@@ -0,0 +1,146 @@
+from typing import Any, Dict, Optional, Tuple
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+
+try:
+    import faiss  # type: ignore
+except Exception:  # pragma: no cover
+    faiss = None  # type: ignore
+
+from .chunk_store import ChunkStore
+from .index_utils import index_kind
+from .logger import get_logger
+
+# Persisted index artifacts. Each save goes to a fresh version directory under
+# INDEX_ARTIFACT_DIR and the CURRENT file is switched atomically, so readers never
+# see a half-written artifact:
+#
+#   <root>/CURRENT                   -> "v20240101T120000-1234"
+#   <root>/v.../manifest.json        format version, model, counts
+#   <root>/v.../index.faiss          FAISS index (read with IO_FLAG_MMAP)
+#   <root>/v.../chunks/*             ChunkStore columns (np.load mmap_mode="r")
+ARTIFACT_FORMAT_VERSION = 1
+INDEX_ARTIFACT_DIR = os.getenv("INDEX_ARTIFACT_DIR", os.path.abspath("./data/index"))
+ARTIFACT_KEEP_VERSIONS = int(os.getenv("INDEX_ARTIFACT_KEEP_VERSIONS", "2"))
+
+logger = get_logger(__name__)
+
+# Disambiguates saves from one process within the same millisecond.
+_save_seq = itertools.count()
+
+
+def current_version(root: str = INDEX_ARTIFACT_DIR) -> Optional[str]:
+    try:
+        with open(os.path.join(root, "CURRENT"), encoding="utf-8") as f:
+            v = f.read().strip()
+        return v if v and os.path.isdir(os.path.join(root, v)) else None
+    except FileNotFoundError:
+        return None
+
+
+def read_manifest(root: str = INDEX_ARTIFACT_DIR, version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    version = version or current_version(root)
+    if not version:
+        return None
+    with open(os.path.join(root, version, "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_artifact(index: Any, store: ChunkStore, root: str = INDEX_ARTIFACT_DIR,
+                  embedding_model: Optional[str] = None, extra: Optional[Dict[str, Any]] = None) -> str:
+    """Write ``index`` + ``store`` as a new version and make it current. Returns the version."""
+    if faiss is None:
+        raise RuntimeError("Install faiss-cpu and numpy")
+    os.makedirs(root, exist_ok=True)
+    version = time.strftime("v%Y%m%dT%H%M%S") + f"{int(time.time() * 1000) % 1000:03d}-{os.getpid()}-{next(_save_seq)}"
+    tmp = os.path.join(root, f".{version}.tmp")
+    os.makedirs(tmp, exist_ok=True)
+    faiss.write_index(index, os.path.join(tmp, "index.faiss"))
+    store.save(os.path.join(tmp, "chunks"))
+    manifest = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "version": version,
+        "created_at": time.time(),
+        "index_kind": index_kind(index),
+        "n_chunks": len(store),
+        "dim": store.dim,
+        "embedding_model": embedding_model,
+    }
+    manifest.update(extra or {})
+    with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(root, version))
+    cur_tmp = os.path.join(root, f".CURRENT.{os.getpid()}")
+    with open(cur_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(cur_tmp, os.path.join(root, "CURRENT"))
+    _prune(root, keep=version)
+    logger.info(f"Saved index artifact {version} ({len(store)} chunks) to {root}")
+    return version
+
+
+def _prune(root: str, keep: str):
+    versions = sorted(d for d in os.listdir(root) if d.startswith("v") and d != keep and os.path.isdir(os.path.join(root, d)))
+    n_old = max(0, ARTIFACT_KEEP_VERSIONS - 1)
+    for v in versions[:len(versions) - n_old]:
+        shutil.rmtree(os.path.join(root, v), ignore_errors=True)
+
+
+def _read_index(path: str, mmap: bool):
+    """Read a saved index; with ``mmap`` its vectors stay in the page cache.
+
+    IO_FLAG_MMAP_IFC maps flat/HNSW storage (and IVF lists) in place. IO_FLAG_MMAP only
+    maps IVF inverted lists, so it is the fallback for faiss builds without in-place
+    mapping; anything else is loaded into memory.
+    """
+    if mmap:
+        flags = [faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY]
+        if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+            flags.insert(0, faiss.IO_FLAG_MMAP_IFC)
+        for flag in flags:
+            try:
+                return faiss.read_index(path, flag)
+            except Exception:
+                continue
+        logger.info(f"mmap read not supported for {path}; loading into memory")
+    return faiss.read_index(path)
+
+
+_loaded: Dict[Tuple[str, str], Tuple[Any, ChunkStore, Dict[str, Any]]] = {}
+_loaded_lock = threading.Lock()
+
+
+def load_artifact(root: str = INDEX_ARTIFACT_DIR, mmap: bool = True) -> Optional[Tuple[Any, ChunkStore, Dict[str, Any]]]:
+    """Load the current artifact as (index, store, manifest), or None if there is none.
+
+    Loaded artifacts are shared by every session in the process; with ``mmap`` the
+    index and chunk columns are read-only mappings, so separate worker processes
+    share one copy through the page cache.
+    """
+    if faiss is None:
+        return None
+    version = current_version(root)
+    if version is None:
+        return None
+    key = (os.path.abspath(root), version)
+    with _loaded_lock:
+        if key in _loaded:
+            return _loaded[key]
+        manifest = read_manifest(root, version)
+        if manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported index artifact format {manifest.get('format_version')} in {version}")
+        t0 = time.perf_counter()
+        vdir = os.path.join(root, version)
+        index = _read_index(os.path.join(vdir, "index.faiss"), mmap)
+        store = ChunkStore.load(os.path.join(vdir, "chunks"), mmap=mmap)
+        manifest["load_time_s"] = round(time.perf_counter() - t0, 4)
+        # Drop older versions of this root; their mappings close once sessions release them.
+        for k in [k for k in _loaded if k[0] == key[0]]:
+            del _loaded[k]
+        _loaded[key] = (index, store, manifest)
+        logger.info(f"Loaded index artifact {version} in {manifest['load_time_s']}s (mmap={mmap})")
+        return _loaded[key]
@@ -0,0 +1,391 @@
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+from dataclasses import dataclass, field
+import bisect
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+try:
+    import faiss  # type: ignore
+except Exception:  # pragma: no cover
+    faiss = None  # type: ignore
+
+from .artifact_utils import INDEX_ARTIFACT_DIR, save_artifact
+from .chunk_store import ChunkStore, ChunkStoreBuilder
+from .chunking import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_STRATEGY, make_chunker, token_counter
+from .dedup import DEDUP_MODE, Deduplicator
+from .engine import ENGINE_EMBED_MODEL, make_embedder
+from .index_utils import build_vector_index
+from .ingest_pipeline import PageRecord, buffered, iter_chunks, iter_normalized
+from .logger import get_logger
+from .pdf_utils import extract_pdfs
+
+# Offline bulk ingestion: a directory of PDFs -> the index artifact the apps load at
+# startup. Files are processed in groups; each finished group is written to the work
+# directory as a shard (a ChunkStore with its embeddings) and recorded in shards.jsonl.
+# An interrupted run therefore resumes at the first unfinished group, and re-running
+# over the same directory only reprocesses files that are new or changed (a shard
+# whose files changed or disappeared is dropped and its remaining files redone).
+# Shards hold chunks after deduplication, so a shard also records the earlier shards
+# whose chunks its dropped duplicates matched ("deps"); when one of those is dropped,
+# so is the dependent shard, and its files are redone to restore the shared chunks.
+BULK_WORK_DIR = os.getenv("BULK_WORK_DIR", os.path.abspath("./data/ingest_work"))
+BULK_FILES_PER_SHARD = int(os.getenv("BULK_FILES_PER_SHARD", "32"))
+
+logger = get_logger(__name__)
+
+
+class SourceFile(NamedTuple):
+    name: str  # path relative to the input directory; becomes the chunk source
+    path: str
+    size: int
+    mtime_ns: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}|{self.size}|{self.mtime_ns}"
+
+
+@dataclass
+class StageStats:
+    items: int = 0
+    seconds: float = 0.0
+    mb: float = 0.0
+
+    def as_dict(self, unit: str) -> dict:
+        return {
+            "items": self.items,
+            "unit": unit,
+            "seconds": round(self.seconds, 3),
+            "per_s": round(self.items / self.seconds, 1) if self.seconds > 0 else None,
+            "mb": round(self.mb, 2),
+        }
+
+
+# stage -> unit its throughput is counted in
+STAGES = {"read": "files", "extract": "pages", "chunk": "chunks", "embed": "chunks", "write": "shards",
+          "merge": "chunks", "index": "vectors", "save": "chunks"}
+
+
+@dataclass
+class BulkStats:
+    files: int = 0
+    files_skipped: int = 0  # already in a finished shard
+    shards_reused: int = 0
+    shards_written: int = 0
+    duplicates: int = 0
+    failed_chunks: int = 0  # chunks the encoder returned no embedding for
+    files_retry: int = 0  # files in shards left unrecorded because of failed chunks
+    errors: List[str] = field(default_factory=list)
+    stages: Dict[str, StageStats] = field(default_factory=lambda: {s: StageStats() for s in STAGES})
+    elapsed_s: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "files": self.files,
+            "files_skipped": self.files_skipped,
+            "shards_reused": self.shards_reused,
+            "shards_written": self.shards_written,
+            "duplicates": self.duplicates,
+            "failed_chunks": self.failed_chunks,
+            "files_retry": self.files_retry,
+            "errors": self.errors,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "stages": {s: st.as_dict(STAGES[s]) for s, st in self.stages.items()},
+        }
+
+
+def discover_pdfs(root: str) -> List[SourceFile]:
+    """Every ``*.pdf`` under ``root`` (recursively), in a stable order."""
+    out = []
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for fn in filenames:
+            if fn.lower().endswith(".pdf"):
+                path = os.path.join(dirpath, fn)
+                st = os.stat(path)
+                out.append(SourceFile(os.path.relpath(path, root).replace(os.sep, "/"), path, st.st_size,
+                                      st.st_mtime_ns))
+    return sorted(out)
+
+
+class WorkDir:
+    """Shards and the run parameters they were built with.
+
+    shards.jsonl has one line per finished shard: {"shard", "files": [keys], "chunks", "deps"}.
+    A shard directory is complete before its line is appended, so a crash leaves at
+    most an orphan directory, never a recorded shard with missing data.
+    """
+
+    def __init__(self, path: str, params: dict, fresh: bool = False):
+        self.path = path
+        if fresh and os.path.isdir(path):
+            shutil.rmtree(path)
+        os.makedirs(os.path.join(path, "shards"), exist_ok=True)
+        run_path = os.path.join(path, "run.json")
+        if os.path.exists(run_path):
+            with open(run_path, encoding="utf-8") as f:
+                previous = json.load(f)
+            if previous != params:
+                changed = sorted(k for k in set(previous) | set(params) if previous.get(k) != params.get(k))
+                raise ValueError(f"{path} holds shards built with different settings ({', '.join(changed)}); "
+                                 "rerun with --fresh to rebuild them")
+        else:
+            with open(run_path, "w", encoding="utf-8") as f:
+                json.dump(params, f, indent=2)
+
+    def _log_path(self) -> str:
+        return os.path.join(self.path, "shards.jsonl")
+
+    def shard_dir(self, shard: str) -> str:
+        return os.path.join(self.path, "shards", shard)
+
+    def finished(self, current_keys: set) -> List[dict]:
+        """Recorded shards whose files are all unchanged; the others are deleted."""
+        records = []
+        if os.path.exists(self._log_path()):
+            with open(self._log_path(), encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        valid = [r for r in records if set(r["files"]) <= current_keys
+                 and (not r["chunks"] or os.path.isdir(self.shard_dir(r["shard"])))]
+        keep = {r["shard"] for r in valid}
+        while True:  # a shard whose duplicates pointed into a dropped shard is missing those chunks
+            lost = [r for r in valid if not set(r.get("deps", ())) <= keep]
+            if not lost:
+                break
+            valid = [r for r in valid if r not in lost]
+            keep = {r["shard"] for r in valid}
+        for r in records:
+            if r["shard"] not in keep:
+                shutil.rmtree(self.shard_dir(r["shard"]), ignore_errors=True)
+        for d in os.listdir(os.path.join(self.path, "shards")):
+            if d not in keep:  # orphans from an interrupted write
+                shutil.rmtree(self.shard_dir(d), ignore_errors=True)
+        if len(valid) != len(records):
+            self._rewrite(valid)
+        return valid
+
+    def _rewrite(self, records: List[dict]):
+        tmp = self._log_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for r in records:
+                f.write(json.dumps(r) + "\n")
+        os.replace(tmp, self._log_path())
+
+    def add(self, shard: str, files: List[SourceFile], store: Optional[ChunkStore], deps: List[str]) -> dict:
+        if store is not None and len(store):
+            tmp = self.shard_dir(f".{shard}.tmp")
+            store.save(tmp)
+            os.replace(tmp, self.shard_dir(shard))
+        record = {"shard": shard, "files": [s.key for s in files], "chunks": 0 if store is None else len(store),
+                  "deps": deps}
+        with open(self._log_path(), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        return record
+
+    def load(self, record: dict) -> Optional[ChunkStore]:
+        return ChunkStore.load(self.shard_dir(record["shard"])) if record["chunks"] else None
+
+
+def _groups(files: List[SourceFile], size: int) -> Iterator[List[SourceFile]]:
+    for lo in range(0, len(files), max(1, size)):
+        yield files[lo:lo + size]
+
+
+def _extract_group(group: List[SourceFile], chunker: Callable[[str], List[str]], dedup: Deduplicator,
+                   stats: BulkStats, engine: str, workers: Optional[int]
+                   ) -> Tuple[List[SourceFile], ChunkStore, int, Set[int]]:
+    """Read, extract and chunk one group (runs on the producer thread). Returns the
+    files that extracted cleanly, their chunks, the deduplicator position of the first
+    kept chunk and the positions of earlier chunks that dropped duplicates matched."""
+    t0 = time.perf_counter()
+    blobs = []
+    for sf in group:
+        with open(sf.path, "rb") as f:
+            blobs.append((sf.name, f.read()))
+    read = stats.stages["read"]
+    read.seconds += time.perf_counter() - t0
+    read.items += len(blobs)
+    read.mb += sum(len(b) for _, b in blobs) / 1e6
+
+    t0 = time.perf_counter()
+    results = extract_pdfs(blobs, engine=engine, workers=workers)
+    ext = stats.stages["extract"]
+    ext.seconds += time.perf_counter() - t0
+    ext.items += sum(len(r.pages) for r in results)
+    del blobs
+
+    t0 = time.perf_counter()
+    ok, pages = [], []
+    for sf, res in zip(group, results):
+        if res.error:
+            stats.errors.append(f"{sf.name}: {res.error}")
+            continue
+        ok.append(sf)
+        pages.extend(PageRecord(sf.name, i + 1, text) for i, text in enumerate(res.pages))
+    builder = ChunkStoreBuilder()
+    dropped, first = dedup.stats.dropped, dedup.stats.kept
+    matched = set()
+    for c in iter_chunks(iter_normalized(pages), chunker):
+        kind, pos = dedup.check(c.text)
+        if kind is None:
+            builder.add(c.text, c.source, page=c.page)
+        elif pos < first:
+            matched.add(pos)
+    stats.duplicates += dedup.stats.dropped - dropped
+    chunk = stats.stages["chunk"]
+    chunk.seconds += time.perf_counter() - t0
+    chunk.items += len(builder)
+    return ok, builder.build(), first, matched
+
+
+def _embed(store: ChunkStore, encode: Callable[[List[str]], Any], batch: int = 512) -> int:
+    """Embed every chunk of ``store``; returns how many the encoder failed on (``None`` rows)."""
+    parts: List[Any] = []
+    for lo in range(0, len(store), batch):
+        parts.extend(encode([store.text(i) for i in range(lo, min(len(store), lo + batch))]))
+    store.set_embeddings(parts)
+    return int(len(store) - np.count_nonzero(store.valid))
+
+
+def merge_shards(stores: List[ChunkStore]) -> ChunkStore:
+    """Concatenate shard stores (with embeddings) into one store with global chunk IDs."""
+    builder = ChunkStoreBuilder()
+    for s in stores:
+        for i in range(len(s)):
+            p = int(s.pages[i])
+            builder.add(s.text(i), s.source(i), page=p if p >= 0 else None)
+    merged = builder.build()
+    if stores:
+        merged.embeddings = np.concatenate([np.asarray(s.embeddings, dtype=np.float32) for s in stores])
+        merged.valid = np.concatenate([np.asarray(s.valid, dtype=bool) for s in stores])
+    return merged
+
+
+def bulk_ingest(input_dir: str, out_dir: str = INDEX_ARTIFACT_DIR, work_dir: str = BULK_WORK_DIR,
+                embed_model: str = ENGINE_EMBED_MODEL, embed_fn: Optional[Callable[[List[str]], Any]] = None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_CHUNK_OVERLAP,
+                strategy: str = DEFAULT_CHUNK_STRATEGY, dedup_mode: str = DEDUP_MODE, index_kind: str = "auto",
+                files_per_shard: int = BULK_FILES_PER_SHARD, workers: Optional[int] = None, engine: str = "pypdf",
+                fresh: bool = False) -> dict:
+    """Build and save an index artifact from every PDF under ``input_dir``.
+
+    Extraction/chunking of the next group runs on a producer thread (PDF pages on the
+    extraction process pool) while the current group is embedded. ``embed_fn``
+    overrides the encoder for ``embed_model``. Returns the run summary (also stored in
+    the artifact manifest under "bulk_ingest").
+    """
+    if faiss is None:
+        raise RuntimeError("Install faiss-cpu and numpy")
+    t_start = time.perf_counter()
+    encode = embed_fn or make_embedder(embed_model)
+    params = {"embed_model": embed_model, "chunk_size": chunk_size, "overlap": overlap, "strategy": strategy,
+              "dedup_mode": dedup_mode, "engine": engine}
+    if strategy == "token":
+        params["token_counter"] = token_counter()  # installing tiktoken changes every chunk
+    work = WorkDir(work_dir, params, fresh=fresh)
+    stats = BulkStats()
+    files = discover_pdfs(input_dir)
+    stats.files = len(files)
+    if not files:
+        raise ValueError(f"No PDFs found under {input_dir}")
+
+    done = work.finished({sf.key for sf in files})
+    done_keys = {k for r in done for k in r["files"]}
+    todo = [sf for sf in files if sf.key not in done_keys]
+    stats.files_skipped = len(files) - len(todo)
+    stats.shards_reused = len(done)
+    logger.info(f"Bulk ingest: {len(files)} PDFs, {stats.files_skipped} already done in {len(done)} shards, "
+                f"{len(todo)} to process")
+
+    # Replay finished shards through the deduplicator so resumed groups see the same history.
+    # starts[j] is the deduplicator position of the first kept chunk of shard owners[j].
+    dedup = Deduplicator(dedup_mode)
+    starts: List[int] = []
+    owners: List[str] = []
+    for r in done:
+        starts.append(dedup.stats.kept)
+        owners.append(r["shard"])
+        store = work.load(r)
+        for i in range(len(store) if store is not None else 0):
+            dedup.check(store.text(i))
+
+    next_id = 1 + max((int(r["shard"].split("-")[1]) for r in done), default=-1)
+    chunker = make_chunker(chunk_size, overlap, strategy)
+    produced = (_extract_group(g, chunker, dedup, stats, engine, workers) for g in _groups(todo, files_per_shard))
+    processed = 0
+    # Shards with chunks the encoder failed on go into this run's artifact (the failed rows
+    # are flagged invalid) but are not recorded, so the next run embeds their files again.
+    retry: List[ChunkStore] = []
+    for ok, store, first, matched in buffered(produced, maxsize=1):
+        shard = f"shard-{next_id:06d}"
+        next_id += 1
+        deps = sorted({owners[bisect.bisect_right(starts, pos) - 1] for pos in matched})
+        starts.append(first)
+        owners.append(shard)
+        failed = 0
+        if len(store):
+            t0 = time.perf_counter()
+            failed = _embed(store, encode)
+            emb = stats.stages["embed"]
+            emb.seconds += time.perf_counter() - t0
+            emb.items += len(store)
+        if failed:
+            stats.failed_chunks += failed
+            stats.files_retry += len(ok)
+            retry.append(store)
+            logger.warning(f"{shard}: {failed} of {len(store)} chunks could not be embedded; "
+                           f"its {len(ok)} files will be retried on the next run")
+        else:
+            t0 = time.perf_counter()
+            done.append(work.add(shard, ok, store if len(store) else None, deps))
+            stats.stages["write"].seconds += time.perf_counter() - t0
+            stats.stages["write"].items += 1
+            stats.shards_written += 1
+        processed += len(ok)
+        elapsed = time.perf_counter() - t_start
+        eta = elapsed / processed * (len(todo) - processed) if processed else 0.0
+        logger.info(f"{shard}: {len(ok)} files, {len(store)} chunks · {processed}/{len(todo)} files "
+                    f"in {elapsed:.1f}s (ETA {eta:.0f}s)")
+
+    t0 = time.perf_counter()
+    stores = [s for s in (work.load(r) for r in done) if s is not None]
+    store = merge_shards(stores + retry)
+    del stores, retry
+    stats.stages["merge"].seconds = time.perf_counter() - t0
+    stats.stages["merge"].items = len(store)
+    if not len(store):
+        raise ValueError("No text could be extracted from the PDFs")
+
+    t0 = time.perf_counter()
+    xb = store.embeddings.copy()
+    faiss.normalize_L2(xb)
+    index = build_vector_index(xb, kind=index_kind)
+    del xb
+    stats.stages["index"].seconds = time.perf_counter() - t0
+    stats.stages["index"].items = index.ntotal
+
+    stats.elapsed_s = time.perf_counter() - t_start
+    summary = stats.as_dict()
+    summary.update(chunks=len(store), source_dir=os.path.abspath(input_dir), params=params)
+    t0 = time.perf_counter()
+    summary["version"] = save_artifact(index, store, out_dir, embedding_model=embed_model,
+                                       extra={"bulk_ingest": summary})
+    stats.stages["save"].seconds = time.perf_counter() - t0
+    stats.stages["save"].items = len(store)
+    stats.elapsed_s = time.perf_counter() - t_start
+    summary["elapsed_s"] = round(stats.elapsed_s, 3)
+    summary["stages"] = {s: st.as_dict(STAGES[s]) for s, st in stats.stages.items()}
+    return summary
+
+
+def format_stages(summary: dict) -> str:
+    """Per-stage throughput table for a bulk_ingest summary."""
+    lines = [f"{'stage':<8} {'items':>10} {'unit':<8} {'seconds':>9} {'per_s':>10} {'MB':>9}"]
+    for name, s in summary["stages"].items():
+        per_s = f"{s['per_s']:,.1f}" if s["per_s"] is not None else "-"
+        lines.append(f"{name:<8} {s['items']:>10,} {s['unit']:<8} {s['seconds']:>9.2f} {per_s:>10} "
+                     f"{s['mb'] or '':>9}")
+    return "\n".join(lines)
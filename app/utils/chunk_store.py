@@ -0,0 +1,257 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from dataclasses import dataclass
+import json
+import os
+
+import numpy as np
+
+
+@dataclass
+class Chunk:
+    chunk_id: int
+    text: str
+    source: str
+    embedding: List[float] = None
+    meta: dict = None
+
+
+class ChunkStore:
+    """Columnar chunk storage.
+
+    Texts are kept as one UTF-8 buffer plus an offsets array, sources as integer codes
+    into a small name table, pages as an int32 column (-1 when unknown) and embeddings
+    as a single contiguous matrix whose row ``i`` belongs to chunk ``i``.
+
+    Indexing/iterating yields lightweight ``Chunk`` views built on demand, so code that
+    reads ``c.text`` / ``c.source`` / ``c.chunk_id`` keeps working unchanged.
+    """
+
+    def __init__(self, buf: bytes, offsets: np.ndarray, chunk_ids: np.ndarray, source_codes: np.ndarray,
+                 source_names: List[str], pages: np.ndarray, metas: Optional[List[Optional[dict]]] = None):
+        self._buf = buf
+        self._offsets = offsets
+        self.chunk_ids = chunk_ids
+        self.source_codes = source_codes
+        self.source_names = source_names
+        self.pages = pages
+        self._metas = metas
+        self.embeddings: Optional[np.ndarray] = None
+        self.valid: Optional[np.ndarray] = None
+
+    # -- construction ------------------------------------------------------
+    @classmethod
+    def build(cls, texts: Sequence[str], sources: Sequence[str], chunk_ids: Optional[Sequence[int]] = None,
+              pages: Optional[Sequence[int]] = None, metas: Optional[Sequence[Optional[dict]]] = None) -> "ChunkStore":
+        b = ChunkStoreBuilder()
+        for i, t in enumerate(texts):
+            b.add(
+                t,
+                sources[i],
+                chunk_id=chunk_ids[i] if chunk_ids is not None else None,
+                page=pages[i] if pages is not None else None,
+                meta=metas[i] if metas is not None else None,
+            )
+        return b.build()
+
+    @classmethod
+    def from_chunks(cls, chunks: Sequence[Chunk]) -> "ChunkStore":
+        b = ChunkStoreBuilder()
+        for c in chunks:
+            meta = dict(c.meta) if c.meta else None
+            page = meta.pop("page", None) if meta else None
+            b.add(c.text, c.source, chunk_id=c.chunk_id, page=page, meta=meta or None)
+        store = b.build()
+        if chunks and any(c.embedding is not None for c in chunks):
+            store.set_embeddings([c.embedding for c in chunks])
+        return store
+
+    # -- row access --------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def text(self, i: int) -> str:
+        # _buf is bytes when built in memory, a read-only uint8 memmap when loaded from disk.
+        return bytes(self._buf[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+
+    def text_nbytes(self) -> int:
+        """UTF-8 size of all chunk texts, without decoding them."""
+        return int(self._offsets[-1]) if len(self._offsets) else 0
+
+    def texts(self) -> List[str]:
+        return [self.text(i) for i in range(len(self))]
+
+    def source(self, i: int) -> str:
+        return self.source_names[self.source_codes[i]]
+
+    def meta(self, i: int) -> Optional[dict]:
+        m = dict(self._metas[i]) if self._metas is not None and self._metas[i] else {}
+        if self.pages[i] >= 0:
+            m["page"] = int(self.pages[i])
+        return m or None
+
+    def _view(self, i: int) -> Chunk:
+        emb = self.embeddings[i] if self.embeddings is not None else None
+        return Chunk(chunk_id=int(self.chunk_ids[i]), text=self.text(i), source=self.source(i),
+                     embedding=emb, meta=self.meta(i))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._view(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._view(i)
+
+    def __iter__(self) -> Iterator[Chunk]:
+        for i in range(len(self)):
+            yield self._view(i)
+
+    def rows_for_sources(self, names: Sequence[str]) -> np.ndarray:
+        codes = [self.source_names.index(n) for n in names if n in self.source_names]
+        return np.flatnonzero(np.isin(self.source_codes, codes))
+
+    def row_mask(self, sources: Optional[Sequence[str]] = None, pages: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Boolean row bitmap for chunks from ``sources`` whose page lies in the inclusive
+        ``pages`` = (first, last) range. ``None`` leaves that field unconstrained."""
+        mask = np.ones(len(self), dtype=bool)
+        if sources is not None:
+            codes = [self.source_names.index(n) for n in sources if n in self.source_names]
+            mask &= np.isin(self.source_codes, codes)
+        if pages is not None:
+            first, last = pages
+            mask &= (self.pages >= first) & (self.pages <= last)
+        return mask
+
+    # -- embeddings --------------------------------------------------------
+    def set_embeddings(self, embeddings: Any, dtype: str = "float32"):
+        """Attach embeddings as one (n, dim) matrix.
+
+        Accepts an ndarray or a list of vectors where ``None`` marks a chunk that could
+        not be embedded; those rows are zero-filled and flagged in ``valid``.
+        """
+        if isinstance(embeddings, np.ndarray):
+            mat = np.ascontiguousarray(embeddings, dtype=dtype)
+            valid = np.ones(len(mat), dtype=bool)
+        else:
+            first = next((e for e in embeddings if e is not None), None)
+            if first is None:
+                raise ValueError("No embeddings to attach.")
+            mat = np.zeros((len(embeddings), len(first)), dtype=dtype)
+            valid = np.zeros(len(embeddings), dtype=bool)
+            for i, e in enumerate(embeddings):
+                if e is not None:
+                    mat[i] = e
+                    valid[i] = True
+        if len(mat) != len(self):
+            raise ValueError(f"Got {len(mat)} embeddings for {len(self)} chunks.")
+        self.embeddings = mat
+        self.valid = valid
+
+    def embedding_matrix(self) -> Optional[np.ndarray]:
+        """float32 view of the embeddings (a copy only when stored as float16)."""
+        if self.embeddings is None:
+            return None
+        return np.ascontiguousarray(self.embeddings, dtype=np.float32)
+
+    @property
+    def dim(self) -> Optional[int]:
+        return None if self.embeddings is None else int(self.embeddings.shape[1])
+
+    # -- persistence -------------------------------------------------------
+    def save(self, path: str):
+        """Write every column as a flat file that ``load`` can memory-map."""
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "text.bin"), "wb") as f:
+            f.write(bytes(self._buf))
+        np.save(os.path.join(path, "offsets.npy"), self._offsets)
+        np.save(os.path.join(path, "chunk_ids.npy"), self.chunk_ids)
+        np.save(os.path.join(path, "source_codes.npy"), self.source_codes)
+        np.save(os.path.join(path, "pages.npy"), self.pages)
+        with open(os.path.join(path, "sources.json"), "w", encoding="utf-8") as f:
+            json.dump(self.source_names, f)
+        if self._metas is not None:
+            with open(os.path.join(path, "metas.json"), "w", encoding="utf-8") as f:
+                json.dump(self._metas, f)
+        if self.embeddings is not None:
+            np.save(os.path.join(path, "embeddings.npy"), self.embeddings)
+            np.save(os.path.join(path, "valid.npy"), self.valid)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "ChunkStore":
+        mode = "r" if mmap else None
+        text_path = os.path.join(path, "text.bin")
+        if mmap and os.path.getsize(text_path):
+            buf = np.memmap(text_path, dtype=np.uint8, mode="r")
+        else:
+            with open(text_path, "rb") as f:
+                buf = f.read()
+        with open(os.path.join(path, "sources.json"), encoding="utf-8") as f:
+            names = json.load(f)
+        metas = None
+        if os.path.exists(os.path.join(path, "metas.json")):
+            with open(os.path.join(path, "metas.json"), encoding="utf-8") as f:
+                metas = json.load(f)
+        store = cls(
+            buf=buf,
+            offsets=np.load(os.path.join(path, "offsets.npy"), mmap_mode=mode),
+            chunk_ids=np.load(os.path.join(path, "chunk_ids.npy"), mmap_mode=mode),
+            source_codes=np.load(os.path.join(path, "source_codes.npy"), mmap_mode=mode),
+            source_names=names,
+            pages=np.load(os.path.join(path, "pages.npy"), mmap_mode=mode),
+            metas=metas,
+        )
+        if os.path.exists(os.path.join(path, "embeddings.npy")):
+            store.embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode=mode)
+            store.valid = np.load(os.path.join(path, "valid.npy"), mmap_mode=mode)
+        return store
+
+    def nbytes(self) -> int:
+        n = len(self._buf) + self._offsets.nbytes + self.chunk_ids.nbytes + self.source_codes.nbytes + self.pages.nbytes
+        if self.embeddings is not None:
+            n += self.embeddings.nbytes
+        return n
+
+
+class ChunkStoreBuilder:
+    """Append-only builder; ``build()`` freezes the columns into numpy arrays."""
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._offsets: List[int] = [0]
+        self._ids: List[int] = []
+        self._codes: List[int] = []
+        self._names: List[str] = []
+        self._name_codes: Dict[str, int] = {}
+        self._pages: List[int] = []
+        self._metas: List[Optional[dict]] = []
+        self._has_meta = False
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, text: str, source: str, chunk_id: Optional[int] = None, page: Optional[int] = None,
+            meta: Optional[dict] = None):
+        self._buf += (text or "").encode("utf-8")
+        self._offsets.append(len(self._buf))
+        self._ids.append(len(self._ids) if chunk_id is None else int(chunk_id))
+        code = self._name_codes.get(source)
+        if code is None:
+            code = self._name_codes[source] = len(self._names)
+            self._names.append(source)
+        self._codes.append(code)
+        self._pages.append(-1 if page is None else int(page))
+        self._metas.append(meta or None)
+        self._has_meta = self._has_meta or bool(meta)
+
+    def build(self) -> ChunkStore:
+        code_dtype = np.uint16 if len(self._names) < 2 ** 16 else np.int32
+        return ChunkStore(
+            buf=bytes(self._buf),
+            offsets=np.asarray(self._offsets, dtype=np.int64),
+            chunk_ids=np.asarray(self._ids, dtype=np.int64),
+            source_codes=np.asarray(self._codes, dtype=code_dtype),
+            source_names=list(self._names),
+            pages=np.asarray(self._pages, dtype=np.int32),
+            metas=self._metas if self._has_meta else None,
+        )
@@ -0,0 +1,218 @@
+from typing import Callable, List, Optional, Sequence, Tuple
+import os
+import re
+
+try:
+    import tiktoken  # type: ignore
+except Exception:  # pragma: no cover
+    tiktoken = None  # type: ignore
+
+# One chunker for every pipeline (Step 2 / FAISS, the Process PDFs flow and the Chroma
+# retriever). Chunk boundaries are computed as (start, end) offsets into the source
+# text, so each chunk is sliced exactly once (no re-slicing of a shrinking remainder).
+CHUNK_STRATEGIES = ["char", "token", "sentence"]
+DEFAULT_CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "800"))
+DEFAULT_CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "120"))
+DEFAULT_CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "char")
+# Chunks shorter than this (after trimming) are dropped.
+CHUNK_MIN_CHARS = int(os.getenv("CHUNK_MIN_CHARS", "20"))
+
+Span = Tuple[int, int]
+
+_WORD_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+# Sentence ends: terminal punctuation (optionally closed by quotes/brackets) + whitespace,
+# or a blank line. Not after a digit, so "1. " list markers do not end a sentence.
+_SENTENCE_END_RE = re.compile(r"(?<!\d)[.!?;:][\"')\]]*\s+|\n\s*\n")
+# Heading lines: numbered ("4.2 Leave policy"), "Section/Article/Clause ..." or ALL CAPS,
+# without terminal punctuation (so numbered list sentences are not headings).
+_HEADING_RE = re.compile(
+    r"^[ \t]*(?:\d+(?:\.\d+)*\.?|[IVXLC]+\.|(?:section|article|clause|chapter|part)\s+[\w.]+)[ \t]+\S[^\n]{0,120}(?<![.;:!?,])[ \t]*$",
+    re.MULTILINE | re.IGNORECASE,
+)
+_CAPS_HEADING_RE = re.compile(r"^[ \t]*[A-Z][A-Z0-9 &/,\-]{3,80}[ \t]*$", re.MULTILINE)
+
+
+def _trim(text: str, lo: int, hi: int) -> Span:
+    while lo < hi and text[lo].isspace():
+        lo += 1
+    while hi > lo and text[hi - 1].isspace():
+        hi -= 1
+    return lo, hi
+
+
+def _windows(n: int, size: int, overlap: int) -> List[Span]:
+    """[start, end) windows of ``size`` over ``n`` items, consecutive windows sharing ``overlap``."""
+    size = max(1, int(size))
+    step = max(1, size - max(0, int(overlap)))
+    out = []
+    start = 0
+    while start < n:
+        end = min(n, start + size)
+        out.append((start, end))
+        if end == n:
+            break
+        start += step
+    return out
+
+
+# -- tokenizers ------------------------------------------------------------
+def word_token_spans(text: str) -> List[Span]:
+    """Word/punctuation tokens; a dependency-free stand-in for a subword tokenizer."""
+    return [m.span() for m in _WORD_TOKEN_RE.finditer(text)]
+
+
+def tiktoken_spans(encoding: str = "cl100k_base") -> Callable[[str], List[Span]]:
+    """Token spans from a tiktoken encoding (counts match OpenAI model limits)."""
+    if tiktoken is None:
+        raise RuntimeError("Install tiktoken for tokenizer-counted chunking.")
+    enc = tiktoken.get_encoding(encoding)
+
+    def _spans(text: str) -> List[Span]:
+        tokens = enc.encode(text)
+        _, starts = enc.decode_with_offsets(tokens)
+        ends = starts[1:] + [len(text)]
+        return list(zip(starts, ends))
+    return _spans
+
+
+def default_tokenizer() -> Callable[[str], List[Span]]:
+    return tiktoken_spans() if tiktoken is not None else word_token_spans
+
+
+def token_counter() -> str:
+    """What the token strategy counts here: tiktoken tokens, or regex words without it."""
+    return "tiktoken cl100k_base" if tiktoken is not None else "regex words"
+
+
+def strategy_label(strategy: str) -> str:
+    """UI label for a chunking strategy; flags the word-count fallback of ``token``."""
+    if strategy == "token" and tiktoken is None:
+        return "Tokens (approx.: words, tiktoken not installed)"
+    return {"char": "Characters", "token": "Tokens", "sentence": "Sentences / headings"}.get(strategy, strategy)
+
+
+def size_unit(strategy: str) -> str:
+    """What chunk size and overlap count for ``strategy`` (for UI labels)."""
+    if strategy == "token":
+        return "tokens" if tiktoken is not None else "words"
+    return "chars"
+
+
+# -- strategies --------------------------------------------------------------
+def char_spans(text: str, size: int, overlap: int) -> List[Span]:
+    return _windows(len(text), size, overlap)
+
+
+def token_spans(text: str, size: int, overlap: int,
+                tokenizer: Optional[Callable[[str], List[Span]]] = None) -> List[Span]:
+    """Windows of ``size`` tokens (``overlap`` shared), mapped back to character offsets."""
+    toks = (tokenizer or default_tokenizer())(text)
+    return [(toks[a][0], toks[b - 1][1]) for a, b in _windows(len(toks), size, overlap)]
+
+
+def sentence_units(text: str) -> List[Tuple[int, int, bool]]:
+    """Split ``text`` into (start, end, starts_with_heading) sentence/heading units."""
+    breaks = {0, len(text)}
+    headings = set()
+    for rx in (_HEADING_RE, _CAPS_HEADING_RE):
+        for m in rx.finditer(text):
+            breaks.update((m.start(), m.end()))
+            headings.add(m.start())
+    for m in _SENTENCE_END_RE.finditer(text):
+        breaks.add(m.end())
+    bounds = sorted(breaks)
+    return [(a, b, a in headings) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def sentence_spans(text: str, size: int, overlap: int) -> List[Span]:
+    """Pack whole sentences up to ``size`` chars; a heading always starts a new chunk.
+
+    Trailing sentences totalling at most ``overlap`` chars are repeated at the start
+    of the next chunk. A sentence longer than ``size`` falls back to char windows; a
+    heading is kept with the sentence after it even if that exceeds ``size``.
+    """
+    out: List[Span] = []
+    cur: List[Span] = []
+    has_body = False  # consecutive headings stay together with the text that follows them
+
+    def _flush():
+        if cur:
+            out.append((cur[0][0], cur[-1][1]))
+
+    for a, b, heading in sentence_units(text):
+        a, b = _trim(text, a, b)
+        if a == b:
+            continue
+        if b - a > size:
+            _flush()
+            cur, has_body = [], False
+            out.extend((a + lo, a + hi) for lo, hi in _windows(b - a, size, overlap))
+            continue
+        if cur and has_body and (heading or b - cur[0][0] > size):
+            _flush()
+            carry: List[Span] = []
+            if not heading:
+                for unit in reversed(cur):
+                    if cur[-1][1] - unit[0] > overlap or b - unit[0] > size:
+                        break
+                    carry.insert(0, unit)
+            cur, has_body = carry, bool(carry)
+        cur.append((a, b))
+        has_body = has_body or not heading
+    _flush()
+    return out
+
+
+def chunk_spans(text: str, size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_CHUNK_OVERLAP,
+                strategy: str = DEFAULT_CHUNK_STRATEGY, min_chars: int = CHUNK_MIN_CHARS,
+                tokenizer: Optional[Callable[[str], List[Span]]] = None) -> List[Span]:
+    """Trimmed (start, end) offsets of the chunks of ``text``; see CHUNK_STRATEGIES."""
+    out = []
+    for lo, hi in _raw_spans(text, size, overlap, strategy, tokenizer):
+        lo, hi = _trim(text, lo, hi)
+        if hi - lo >= max(1, min_chars):
+            out.append((lo, hi))
+    return out
+
+
+def _raw_spans(text: str, size: int, overlap: int, strategy: str,
+               tokenizer: Optional[Callable[[str], List[Span]]]) -> List[Span]:
+    if not text:
+        return []
+    if strategy == "char":
+        return char_spans(text, size, overlap)
+    if strategy == "token":
+        return token_spans(text, size, overlap, tokenizer)
+    if strategy == "sentence":
+        return sentence_spans(text, size, overlap)
+    raise ValueError(f"Unknown chunking strategy: {strategy}")
+
+
+def chunk_text(text: str, size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_CHUNK_OVERLAP,
+               strategy: str = DEFAULT_CHUNK_STRATEGY, min_chars: int = CHUNK_MIN_CHARS,
+               tokenizer: Optional[Callable[[str], List[Span]]] = None) -> List[str]:
+    """Chunks of ``text``: one slice per span, trimmed with C-level ``strip`` (same result as
+    slicing the trimmed ``chunk_spans`` offsets, without the per-character Python loop)."""
+    min_chars = max(1, min_chars)
+    out = []
+    for lo, hi in _raw_spans(text, size, overlap, strategy, tokenizer):
+        piece = text[lo:hi].strip()
+        if len(piece) >= min_chars:
+            out.append(piece)
+    return out
+
+
+def make_chunker(size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_CHUNK_OVERLAP,
+                 strategy: str = DEFAULT_CHUNK_STRATEGY, min_chars: int = CHUNK_MIN_CHARS) -> Callable[[str], List[str]]:
+    """A ``text -> chunks`` callable with fixed settings, as the ingest pipeline expects."""
+    tokenizer = default_tokenizer() if strategy == "token" else None
+
+    def _chunk(text: str) -> List[str]:
+        return chunk_text(text or "", size, overlap, strategy, min_chars, tokenizer)
+    return _chunk
+
+
+def split_documents(docs: Sequence[str], size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_CHUNK_OVERLAP,
+                    strategy: str = DEFAULT_CHUNK_STRATEGY) -> List[str]:
+    chunker = make_chunker(size, overlap, strategy)
+    return [c for doc in docs if doc for c in chunker(doc)]
@@ -0,0 +1,171 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from dataclasses import dataclass, asdict
+import hashlib
+import os
+import re
+import zlib
+
+import numpy as np
+
+# Chunk deduplication before embedding. Exact duplicates are caught by a hash of the
+# normalized text; near duplicates (boilerplate differing only in page numbers, dates or
+# a word or two) by MinHash signatures over word 3-shingles, looked up through LSH bands
+# so each check only compares against the few chunks that share a band.
+DEDUP_MODES = ["near", "exact", "off"]
+# Near dedup is opt-in: policy clauses written from one template ("employees get 18 days" /
+# "contractors get 10 days") are ~0.9 similar yet both must stay searchable.
+DEDUP_MODE = os.getenv("DEDUP_MODE", "exact")
+# Estimated shingle Jaccard similarity at or above which a chunk counts as a near duplicate.
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.95"))
+# Shorter chunks only get the exact check; shingles of a handful of words are too coarse.
+DEDUP_NEAR_MIN_WORDS = int(os.getenv("DEDUP_NEAR_MIN_WORDS", "8"))
+MINHASH_PERM = 128
+# 32 bands x 4 rows (MINHASH_PERM / LSH_BANDS): a pair with Jaccard s shares a band with
+# probability 1 - (1 - s^4)^32, i.e. >0.999 at s >= 0.7, ~0.87 at 0.5, ~0.05 at 0.2 and
+# ~0.003 at 0.1. Band matches are only candidates; the full signature decides.
+LSH_BANDS = 32
+SHINGLE_SIZE = 3
+
+_WORD_RE = re.compile(r"\w+")
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(20240611)
+_PERM_A = _rng.randint(1, _PRIME, size=MINHASH_PERM).astype(np.int64)
+_PERM_B = _rng.randint(0, _PRIME, size=MINHASH_PERM).astype(np.int64)
+
+
+def normalize_for_dedup(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def exact_key(text: str) -> str:
+    return hashlib.sha1(normalize_for_dedup(text).encode("utf-8")).hexdigest()
+
+
+def shingles(text: str) -> set:
+    # Digits are kept as-is: folding them would merge rows of salary/leave tables.
+    words = _WORD_RE.findall((text or "").lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> np.ndarray:
+    """MINHASH_PERM-slot MinHash signature of the text's shingle set."""
+    x = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles(text)), dtype=np.int64)
+    if not len(x):
+        return np.full(MINHASH_PERM, _PRIME, dtype=np.int64)
+    # (a * x + b) mod p stays below 2**63: a < 2**31 and x < 2**32.
+    return ((np.outer(x, _PERM_A) + _PERM_B) % _PRIME).min(axis=0)
+
+
+def jaccard_estimate(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+@dataclass
+class DedupStats:
+    seen: int = 0
+    kept: int = 0
+    exact: int = 0
+    near: int = 0
+    chars_saved: int = 0
+
+    @property
+    def dropped(self) -> int:
+        return self.exact + self.near
+
+    def as_dict(self) -> dict:
+        d = asdict(self)
+        d["dropped"] = self.dropped
+        # Every dropped chunk is one text that is never sent to the embedding model
+        # (and one vector fewer in the index).
+        d["embeddings_saved"] = self.dropped
+        d["saved_pct"] = round(100.0 * self.dropped / self.seen, 1) if self.seen else 0.0
+        return d
+
+
+class Deduplicator:
+    """Streaming duplicate filter: feed chunks in order, the first copy is kept.
+
+    Signatures are split into LSH bands; only kept chunks sharing at least one whole
+    band with the new chunk are compared, so a check stays cheap as the corpus grows.
+    """
+
+    def __init__(self, mode: str = DEDUP_MODE, threshold: float = DEDUP_THRESHOLD,
+                 near_min_words: int = DEDUP_NEAR_MIN_WORDS):
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"Unknown dedup mode: {mode}")
+        self.mode = mode
+        self.threshold = threshold
+        self.near_min_words = near_min_words
+        self.stats = DedupStats()
+        self._exact: Dict[str, int] = {}
+        # Signatures of kept chunks, row i <-> kept chunk i (zeros for chunks without one).
+        self._signatures = np.zeros((1024, MINHASH_PERM), dtype=np.int64)
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(LSH_BANDS)]
+
+    def check(self, text: str) -> Tuple[Optional[str], Optional[int]]:
+        """Classify ``text`` and remember it if new.
+
+        Returns (None, i) for a kept chunk (its position among kept chunks), or
+        ("exact"|"near", i) naming the kept chunk it duplicates.
+        """
+        self.stats.seen += 1
+        if self.mode == "off":
+            return self._keep(None)
+        key = exact_key(text)
+        hit = self._exact.get(key)
+        if hit is not None:
+            return self._drop("exact", hit, text)
+        sig = None
+        if self.mode == "near" and len(_WORD_RE.findall(text)) >= self.near_min_words:
+            sig = minhash(text)
+            hit = self._near(sig)
+            if hit is not None:
+                self._exact[key] = hit
+                return self._drop("near", hit, text)
+        return self._keep(key, sig)
+
+    def _bands(self, sig: np.ndarray) -> List[bytes]:
+        return [band.tobytes() for band in sig.reshape(LSH_BANDS, -1)]
+
+    def _near(self, sig: np.ndarray) -> Optional[int]:
+        cands = set()
+        for band, buckets in zip(self._bands(sig), self._buckets):
+            cands.update(buckets.get(band, ()))
+        if not cands:
+            return None
+        # Score all candidates in one pass; the most similar kept chunk wins.
+        idx = np.fromiter(cands, dtype=np.int64, count=len(cands))
+        sims = np.count_nonzero(self._signatures[idx] == sig, axis=1) / MINHASH_PERM
+        best = int(np.argmax(sims))
+        return int(idx[best]) if sims[best] >= self.threshold else None
+
+    def _keep(self, key: Optional[str], sig: Optional[np.ndarray] = None) -> Tuple[None, int]:
+        i = self.stats.kept
+        self.stats.kept += 1
+        if key is not None:
+            self._exact[key] = i
+        if sig is not None:
+            if i >= len(self._signatures):
+                self._signatures = np.concatenate([self._signatures, np.zeros_like(self._signatures)])
+            self._signatures[i] = sig
+            for band, buckets in zip(self._bands(sig), self._buckets):
+                buckets.setdefault(band, []).append(i)
+        return None, i
+
+    def _drop(self, kind: str, kept: int, text: str) -> Tuple[str, int]:
+        if kind == "exact":
+            self.stats.exact += 1
+        else:
+            self.stats.near += 1
+        self.stats.chars_saved += len(text)
+        return kind, kept
+
+
+def dedup_texts(texts: Iterable[str], mode: str = DEDUP_MODE,
+                threshold: float = DEDUP_THRESHOLD) -> Tuple[List[int], DedupStats]:
+    """Indices of the texts to keep (first copies, in order) and the savings report."""
+    d = Deduplicator(mode, threshold)
+    keep = [i for i, t in enumerate(texts) if d.check(t)[0] is None]
+    return keep, d.stats
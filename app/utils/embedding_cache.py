@@ -0,0 +1,212 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from dataclasses import dataclass, asdict
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+# On-disk, content-addressed embedding cache. Vectors for each model live in one
+# append-only float32 file that is read through np.memmap; a small SQLite table maps
+# (model, sha256(normalized text)) -> row in that file.
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", os.path.abspath("./data/embeddings/cache"))
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    bytes_saved: int = 0
+
+    def add(self, other: "CacheStats"):
+        self.hits += other.hits
+        self.misses += other.misses
+        self.bytes_saved += other.bytes_saved
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> dict:
+        d = asdict(self)
+        d["hit_rate"] = round(self.hit_rate, 3)
+        return d
+
+
+class EmbeddingCache:
+    def __init__(self, root: str = EMBED_CACHE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"), timeout=30, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS models (model TEXT PRIMARY KEY, dim INTEGER NOT NULL, file TEXT NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (model TEXT NOT NULL, key TEXT NOT NULL, row INTEGER NOT NULL,"
+            " PRIMARY KEY (model, key))"
+        )
+        self._maps: Dict[str, np.memmap] = {}
+        self.stats = CacheStats()
+
+    # -- storage helpers -------------------------------------------------
+    def _model_info(self, model: str) -> Optional[Tuple[int, str]]:
+        row = self._db.execute("SELECT dim, file FROM models WHERE model = ?", (model,)).fetchone()
+        return (int(row[0]), row[1]) if row else None
+
+    def _vectors(self, model: str, dim: int, path: str) -> np.ndarray:
+        rows = os.path.getsize(path) // (dim * 4) if os.path.exists(path) else 0
+        mm = self._maps.get(model)
+        if mm is None or mm.shape[0] != rows:
+            mm = np.memmap(path, dtype=np.float32, mode="r", shape=(rows, dim)) if rows else np.zeros((0, dim), np.float32)
+            self._maps[model] = mm
+        return mm
+
+    # -- public API ------------------------------------------------------
+    def lookup(self, model: str, texts: Sequence[str]) -> Tuple[Dict[int, np.ndarray], List[int]]:
+        """Return ({input index: vector} for hits, [input indices that missed])."""
+        with self._lock:
+            info = self._model_info(model)
+            if info is None:
+                return {}, list(range(len(texts)))
+            dim, fname = info
+            mm = self._vectors(model, dim, os.path.join(self.root, fname))
+            keys = [text_key(t) for t in texts]
+            rows: Dict[str, int] = {}
+            uniq = list(set(keys))
+            for i in range(0, len(uniq), 500):
+                part = uniq[i:i + 500]
+                q = "SELECT key, row FROM vectors WHERE model = ? AND key IN (%s)" % ",".join("?" * len(part))
+                rows.update(self._db.execute(q, [model, *part]).fetchall())
+            hits: Dict[int, np.ndarray] = {}
+            missing: List[int] = []
+            for i, k in enumerate(keys):
+                r = rows.get(k)
+                if r is not None and r < mm.shape[0]:
+                    hits[i] = np.asarray(mm[r])
+                else:
+                    missing.append(i)
+            return hits, missing
+
+    def store(self, model: str, texts: Sequence[str], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(texts) == 0:
+            return
+        with self._lock:
+            # The cache directory is shared by Streamlit, the API and the ingest CLI: the
+            # SQLite write lock (BEGIN IMMEDIATE) serializes row allocation and the append
+            # across processes, so no two writers can claim the same rows.
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                info = self._model_info(model)
+                if info is None:
+                    fname = hashlib.sha1(model.encode("utf-8")).hexdigest()[:16] + ".f32"
+                    dim = int(vectors.shape[1])
+                    self._db.execute("INSERT INTO models (model, dim, file) VALUES (?, ?, ?)", (model, dim, fname))
+                else:
+                    dim, fname = info
+                    if vectors.shape[1] != dim:
+                        raise ValueError(f"Embedding dim {vectors.shape[1]} does not match cached dim {dim} for {model}")
+                path = os.path.join(self.root, fname)
+                size = os.path.getsize(path) if os.path.exists(path) else 0
+                start = -(-size // (dim * 4))  # a torn row from a crashed writer is skipped, not reused
+                # Vectors first, then the index: a crash leaves orphan rows, never dangling keys.
+                with open(path, "r+b" if size else "wb") as f:
+                    f.seek(start * dim * 4)
+                    f.write(vectors.tobytes())
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO vectors (model, key, row) VALUES (?, ?, ?)",
+                    [(model, text_key(t), start + i) for i, t in enumerate(texts)],
+                )
+            except BaseException:
+                self._db.rollback()
+                raise
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for (fname,) in self._db.execute("SELECT file FROM models").fetchall():
+                    try:
+                        os.remove(os.path.join(self.root, fname))
+                    except FileNotFoundError:
+                        pass
+                self._db.execute("DELETE FROM vectors")
+                self._db.execute("DELETE FROM models")
+            except BaseException:
+                self._db.rollback()
+                raise
+            self._db.commit()
+            self._maps.clear()
+
+
+def embed_with_cache(texts: Sequence[str], model: str, encode_fn: Callable[[List[str]], np.ndarray],
+                     cache: Optional[EmbeddingCache]) -> Tuple[np.ndarray, CacheStats]:
+    """Embed ``texts`` computing only cache misses with ``encode_fn``.
+
+    ``model`` is the cache namespace and must change whenever the vectors would (e.g.
+    include a suffix for normalized output).
+    """
+    stats = CacheStats()
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32), stats
+    if cache is None:
+        arr = np.asarray(encode_fn(list(texts)), dtype=np.float32)
+        stats.misses = len(texts)
+        return arr, stats
+    hits, missing = cache.lookup(model, texts)
+    # Identical chunks are encoded once.
+    miss_keys: Dict[str, int] = {}
+    uniq_texts: List[str] = []
+    for i in missing:
+        k = text_key(texts[i])
+        if k not in miss_keys:
+            miss_keys[k] = len(uniq_texts)
+            uniq_texts.append(texts[i])
+    computed = np.asarray(encode_fn(uniq_texts), dtype=np.float32) if uniq_texts else None
+    if computed is not None:
+        cache.store(model, uniq_texts, computed)
+    dim = computed.shape[1] if computed is not None else next(iter(hits.values())).shape[0]
+    out = np.empty((len(texts), dim), dtype=np.float32)
+    for i, v in hits.items():
+        out[i] = v
+    for i in missing:
+        out[i] = computed[miss_keys[text_key(texts[i])]]
+    stats.hits = len(hits)
+    stats.misses = len(missing)
+    stats.bytes_saved = len(hits) * dim * 4
+    cache.stats.add(stats)
+    return out, stats
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide cache instance, or None when disabled/unavailable."""
+    global _cache
+    if not EMBED_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = EmbeddingCache()
+                except Exception:
+                    return None
+    return _cache
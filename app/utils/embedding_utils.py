@@ -0,0 +1,137 @@
+from typing import Any, List, Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+import os
+import random
+import time
+
+# Request packing limits for the OpenAI embeddings endpoint. The API accepts up to
+# 2048 inputs per request; we stay well below that and also cap the estimated token
+# volume so a single slow/oversized request does not dominate wall time.
+EMBED_BATCH_MAX_ITEMS = int(os.getenv("EMBED_BATCH_MAX_ITEMS", "256"))
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "60000"))
+EMBED_MAX_WORKERS = int(os.getenv("EMBED_MAX_WORKERS", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_BACKOFF_BASE = float(os.getenv("EMBED_BACKOFF_BASE", "0.5"))
+
+
+@dataclass
+class EmbeddingBatchResult:
+    """Outcome of a batched embedding run.
+
+    ``embeddings`` is aligned with the input texts; entries whose batch could not be
+    embedded (after retries) are ``None`` so callers keep every successful vector.
+    """
+    embeddings: List[Optional[List[float]]]
+    requests: int = 0
+    retries: int = 0
+    failed_batches: int = 0
+    errors: List[str] = field(default_factory=list)
+    elapsed_s: float = 0.0
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for e in self.embeddings if e is None)
+
+    @property
+    def ok(self) -> bool:
+        return self.failed == 0
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English prose; good enough for request packing.
+    return max(1, len(text) // 4)
+
+
+def make_batches(texts: Sequence[str], max_items: int = EMBED_BATCH_MAX_ITEMS,
+                 max_tokens: int = EMBED_BATCH_MAX_TOKENS) -> List[List[int]]:
+    """Greedily pack text indices into batches under an item and token budget."""
+    batches: List[List[int]] = []
+    cur: List[int] = []
+    cur_tokens = 0
+    for i, t in enumerate(texts):
+        n = estimate_tokens(t or "")
+        if cur and (len(cur) >= max_items or cur_tokens + n > max_tokens):
+            batches.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(i)
+        cur_tokens += n
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+def _status_code(exc: Exception) -> Optional[int]:
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code
+
+
+def is_quota_error(exc: Exception) -> bool:
+    return "insufficient_quota" in str(exc)
+
+
+def is_retryable(exc: Exception) -> bool:
+    """429 rate limits and 5xx responses are retried; exhausted quota is not."""
+    if is_quota_error(exc):
+        return False
+    code = _status_code(exc)
+    if code is not None:
+        return code == 429 or code >= 500
+    msg = str(exc)
+    return "429" in msg or "rate limit" in msg.lower() or type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def _backoff_delay(attempt: int, base: float) -> float:
+    # Exponential backoff with full jitter.
+    return random.uniform(0, base * (2 ** attempt))
+
+
+def embed_openai_batched(client: Any, texts: Sequence[str], model: str = "text-embedding-3-small",
+                         max_items: int = EMBED_BATCH_MAX_ITEMS, max_tokens: int = EMBED_BATCH_MAX_TOKENS,
+                         max_workers: int = EMBED_MAX_WORKERS, max_retries: int = EMBED_MAX_RETRIES,
+                         backoff_base: float = EMBED_BACKOFF_BASE, sleep=time.sleep) -> EmbeddingBatchResult:
+    """Embed ``texts`` with the OpenAI embeddings API using packed, concurrent requests.
+
+    Batches are sent from a bounded thread pool. A batch that fails with a retryable
+    error is retried with exponential backoff; a batch that still fails leaves ``None``
+    in its slots instead of discarding the rest of the run.
+    """
+    t0 = time.perf_counter()
+    result = EmbeddingBatchResult(embeddings=[None] * len(texts))
+    if not texts:
+        return result
+    batches = make_batches(texts, max_items=max_items, max_tokens=max_tokens)
+
+    def _run(batch: List[int]):
+        # The API rejects empty strings, so send a single space for blank chunks.
+        payload = [texts[i] if (texts[i] or "").strip() else " " for i in batch]
+        attempt = 0
+        while True:
+            try:
+                resp = client.embeddings.create(input=payload, model=model)
+                data = sorted(resp.data, key=lambda d: d.index)
+                return batch, [d.embedding for d in data], attempt, None
+            except Exception as e:
+                if attempt >= max_retries or not is_retryable(e):
+                    return batch, None, attempt, e
+                sleep(_backoff_delay(attempt, backoff_base))
+                attempt += 1
+
+    workers = max(1, min(max_workers, len(batches)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run, b) for b in batches]
+        for fut in as_completed(futures):
+            batch, vecs, attempts, err = fut.result()
+            result.requests += attempts + 1
+            result.retries += attempts
+            if err is not None:
+                result.failed_batches += 1
+                result.errors.append(str(err))
+                continue
+            for i, v in zip(batch, vecs):
+                result.embeddings[i] = v
+
+    result.elapsed_s = time.perf_counter() - t0
+    return result
@@ -0,0 +1,371 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from dataclasses import dataclass
+import asyncio
+import os
+import threading
+import time
+
+import numpy as np
+
+try:
+    import faiss  # type: ignore
+except Exception:  # pragma: no cover
+    faiss = None  # type: ignore
+
+from .answer_cache import get_answer_cache
+from .artifact_utils import INDEX_ARTIFACT_DIR, current_version, load_artifact, save_artifact
+from .chunk_store import ChunkStore, ChunkStoreBuilder
+from .chunking import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_STRATEGY, make_chunker
+from .dedup import DEDUP_MODE, Deduplicator
+from .embedding_cache import embed_with_cache, get_embedding_cache
+from .embedding_utils import embed_openai_batched
+from .generator_utils import agenerate_answer
+from .index_utils import build_vector_index, index_kind, search_batch, search_filtered
+from .ingest_pipeline import PageRecord, chunk_pages, ingest
+from .jobs import JobManager, get_job_manager
+from .lexical_index import BM25Index, lexical_tokenize
+from .logger import get_logger
+from .model_registry import SentenceTransformer, get_sentence_transformer
+from .openai_pool import OpenAI, get_openai_client
+from .query_cache import get_query_embedding_cache
+
+# Streamlit-free retrieval engine: one corpus (chunks + FAISS/BM25 indexes) per process,
+# shared by every caller. Readers take an immutable snapshot, so searches keep running
+# against the old corpus while an ingest job builds the next one, which is swapped in
+# atomically when it finishes. Used by the HTTP API (app/api.py) and scripts.
+ENGINE_EMBED_MODEL = os.getenv("ENGINE_EMBED_MODEL", "all-MiniLM-L6-v2")
+ENGINE_INDEX_KIND = os.getenv("ENGINE_INDEX_KIND", "auto")
+ENGINE_TOP_K = int(os.getenv("ENGINE_TOP_K", "5"))
+# Texts per embedding call during ingest: progress granularity and cancellation points.
+ENGINE_EMBED_SLICE = int(os.getenv("ENGINE_EMBED_SLICE", "512"))
+# Chunks that could not be embedded keep a zero row in the index. Up to this many are
+# skipped by over-fetching; beyond it the search is restricted to the valid rows.
+ENGINE_INVALID_OVERFETCH_MAX = int(os.getenv("ENGINE_INVALID_OVERFETCH_MAX", "256"))
+# How often searches check whether another process (the ingest CLI, another API worker)
+# published a newer artifact to serve instead; 0 disables reloading.
+ENGINE_RELOAD_CHECK_S = float(os.getenv("ENGINE_RELOAD_CHECK_S", "2"))
+
+logger = get_logger(__name__)
+
+EncodeFn = Callable[[List[str]], Any]
+
+
+def make_embedder(model: str) -> EncodeFn:
+    """Text encoder for ``model`` ("openai-..." uses OPENAI_API_KEY, anything else is a
+    sentence-transformers model). Raises RuntimeError when it cannot be used here."""
+    if model.startswith("openai"):
+        api_key = os.getenv("OPENAI_API_KEY")
+        if OpenAI is None or not api_key:
+            raise RuntimeError("OpenAI embeddings need the openai package and OPENAI_API_KEY.")
+        name = "text-embedding-3-small" if "embedding-3-small" in model else model
+        # Retries/backoff are handled per batch by embed_openai_batched.
+        client = get_openai_client(api_key, max_retries=0)
+        return lambda texts: embed_openai_batched(client, texts, model=name).embeddings
+    if SentenceTransformer is None:
+        raise RuntimeError("Install sentence-transformers for local embeddings.")
+
+    def encode(texts: List[str]):
+        st_model = get_sentence_transformer(model)
+        return embed_with_cache(
+            texts, model, lambda miss: st_model.encode(miss, show_progress_bar=False, convert_to_numpy=True),
+            get_embedding_cache(),
+        )[0]
+    return encode
+
+
+def search_chunks(queries: Sequence[str], k: int, store: Any, index: Any = None, bm25: Optional[BM25Index] = None,
+                  encode: Optional[Callable] = None, mask: Optional[np.ndarray] = None,
+                  knobs: Optional[dict] = None):
+    """Top-``k`` (row, score) pairs per query over ``store``.
+
+    With ``index`` the queries are embedded by ``encode`` (returning (matrix, ok,
+    QueryCacheStats)) and searched in one FAISS call; otherwise ``bm25`` is used.
+    ``mask`` restricts candidates to the selected rows before scoring. Vector hits never
+    include rows the store flags as not embedded (``store.valid``). ``knobs``
+    ({"nprobe", "ef_search"}) tune this search only; the shared index is not modified.
+    Returns (hits per query, stats) with encode/search timings in seconds.
+    """
+    t0 = time.perf_counter()
+    filter_stats = None
+    if index is None:
+        hits = [bm25.search(q, k=k, mask=mask) for q in queries]
+        stats = {"mode": "lexical", "encode_s": 0.0, "search_s": time.perf_counter() - t0}
+        if mask is not None:
+            filter_stats = {"rows": int(mask.sum()), "of": len(mask), "strategy": "bm25_mask"}
+    else:
+        valid = getattr(store, "valid", None)
+        invalid = np.flatnonzero(~np.asarray(valid, dtype=bool)) if valid is not None else np.zeros(0, np.int64)
+        if len(invalid) and (mask is not None or len(invalid) > ENGINE_INVALID_OVERFETCH_MAX):
+            mask = (np.ones(len(store), dtype=bool) if mask is None else mask.copy())
+            mask[invalid] = False
+            invalid = invalid[:0]
+        knobs = knobs or {}
+        q_mat, ok, qstats = encode(queries)
+        t1 = time.perf_counter()
+        if mask is None:
+            D, I = search_batch(index, q_mat, k + len(invalid), **knobs)
+            if len(invalid):
+                keep = ~np.isin(I, invalid)
+                D = [d[m][:k] for d, m in zip(D, keep)]
+                I = [i[m][:k] for i, m in zip(I, keep)]
+        else:
+            rows = np.flatnonzero(mask)
+            D, I, strategy = search_filtered(index, q_mat, k, rows, vectors=getattr(store, "embeddings", None),
+                                             **knobs)
+            filter_stats = {"rows": len(rows), "of": len(mask), "strategy": strategy}
+        t2 = time.perf_counter()
+        hits = [[(int(i), float(s)) for s, i in zip(D[qi], I[qi]) if i >= 0] if ok[qi] else []
+                for qi in range(len(queries))]
+        stats = {"mode": "faiss", "encode_s": t1 - t0, "search_s": t2 - t1, "query_vectors": q_mat,
+                 "query_cache": qstats.as_dict()}
+    if filter_stats is not None:
+        stats["filter"] = filter_stats
+    return hits, stats
+
+
+@dataclass(frozen=True)
+class EngineSnapshot:
+    store: ChunkStore
+    index: Any                      # FAISS index, or None for a BM25-only corpus
+    bm25: BM25Index
+    embedding_model: Optional[str]
+    version: Optional[str]          # artifact version (None when not persisted)
+
+
+class RagEngine:
+    """Ingest, search and answer over one shared corpus without any UI state.
+
+    ``embed_fn`` overrides the encoder derived from ``embed_model`` (which then only
+    names the vectors in caches and artifacts). When no encoder is available the corpus
+    is served with BM25 alone.
+    """
+
+    def __init__(self, embed_model: str = ENGINE_EMBED_MODEL, embed_fn: Optional[EncodeFn] = None,
+                 index_kind: str = ENGINE_INDEX_KIND, artifact_dir: str = INDEX_ARTIFACT_DIR,
+                 jobs: Optional[JobManager] = None):
+        self.embed_model = embed_model
+        self.index_kind = index_kind
+        self.artifact_dir = artifact_dir
+        self._embed_fn = embed_fn
+        self._jobs = jobs
+        self._lock = threading.Lock()
+        self._snapshot: Optional[EngineSnapshot] = None
+        self._reload_lock = threading.Lock()
+        self._disk_version: Optional[str] = None  # newest artifact version already served or superseded
+        self._next_reload_check = 0.0
+
+    @property
+    def jobs(self) -> JobManager:
+        return self._jobs or get_job_manager()
+
+    @property
+    def snapshot(self) -> Optional[EngineSnapshot]:
+        return self._snapshot
+
+    def _swap(self, snap: EngineSnapshot):
+        with self._lock:
+            self._snapshot = snap
+        cache = get_answer_cache()
+        if cache is not None:
+            cache.invalidate("corpus replaced")
+
+    def _encoder(self, model: str) -> Optional[EncodeFn]:
+        if self._embed_fn is not None and model == self.embed_model:
+            return self._embed_fn
+        try:
+            return make_embedder(model)
+        except RuntimeError as e:
+            logger.warning(f"Embedding model {model} unavailable ({e}); serving BM25 only")
+            return None
+
+    # -- loading / ingest --------------------------------------------------
+    def load_saved(self, mmap: bool = True) -> bool:
+        """Serve the persisted index artifact, if there is one."""
+        loaded = load_artifact(self.artifact_dir, mmap=mmap)
+        if loaded is None:
+            return False
+        index, store, manifest = loaded
+        model = manifest.get("embedding_model") or self.embed_model
+        self._swap(EngineSnapshot(store, index, BM25Index.build(store.texts(), lexical_tokenize), model,
+                                  manifest.get("version")))
+        self._disk_version = manifest.get("version")
+        return True
+
+    def reload_if_changed(self) -> bool:
+        """Serve a newer artifact published by another process; checked at most every
+        ENGINE_RELOAD_CHECK_S. Returns True when a new corpus was swapped in."""
+        now = time.monotonic()
+        if ENGINE_RELOAD_CHECK_S <= 0 or now < self._next_reload_check:
+            return False
+        self._next_reload_check = now + ENGINE_RELOAD_CHECK_S
+        version = current_version(self.artifact_dir)
+        if version is None or version == self._disk_version or not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            logger.info(f"Index artifact changed to {version}; reloading")
+            return self.load_saved()
+        except Exception as e:
+            logger.warning(f"Could not reload index artifact {version}: {e}")
+            self._disk_version = version  # do not retry a broken version on every check
+            return False
+        finally:
+            self._reload_lock.release()
+
+    def submit_ingest(self, files: List[Tuple[str, bytes]], **params) -> str:
+        """Replace the corpus with ``files`` (name, PDF bytes) on the job pool; returns the job ID."""
+        return self.jobs.submit("ingest", self._ingest_job, files, label=f"Ingest ({len(files)} files)", **params)
+
+    def _ingest_job(self, ctx, files: List[Tuple[str, bytes]], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    overlap: int = DEFAULT_CHUNK_OVERLAP, strategy: str = DEFAULT_CHUNK_STRATEGY,
+                    dedup_mode: str = DEDUP_MODE, persist: bool = True) -> dict:
+        n_files = len(files)
+        ctx.progress(0, n_files, f"extracting {n_files} files")
+        builder = ChunkStoreBuilder()
+        _, stats = ingest(files, make_chunker(chunk_size, overlap, strategy), builder,
+                          dedup=Deduplicator(dedup_mode),
+                          on_batch=lambda s: ctx.progress(s.files, n_files, f"{s.chunks} chunks"))
+        result = self._publish(builder.build(), persist, ctx)
+        result["ingest"] = stats.as_dict()
+        result["errors"] = stats.errors
+        return result
+
+    def build(self, pages: Iterable[PageRecord], chunk_size: int = DEFAULT_CHUNK_SIZE,
+              overlap: int = DEFAULT_CHUNK_OVERLAP, strategy: str = DEFAULT_CHUNK_STRATEGY,
+              dedup_mode: str = DEDUP_MODE, persist: bool = False) -> dict:
+        """Replace the corpus with already-extracted pages, synchronously."""
+        builder = ChunkStoreBuilder()
+        stats = chunk_pages(pages, make_chunker(chunk_size, overlap, strategy), builder,
+                            dedup=Deduplicator(dedup_mode))
+        result = self._publish(builder.build(), persist)
+        result["ingest"] = stats.as_dict()
+        return result
+
+    def _publish(self, store: ChunkStore, persist: bool, ctx=None) -> dict:
+        """Embed ``store``, build its indexes, optionally persist it, then swap it in."""
+        n = len(store)
+        encode = self._encoder(self.embed_model) if n else None
+        index, timings, notes = None, {}, []
+        if encode is not None:
+            t0 = time.perf_counter()
+            parts: List[Any] = []
+            for lo in range(0, n, ENGINE_EMBED_SLICE):
+                texts = [store.text(i) for i in range(lo, min(n, lo + ENGINE_EMBED_SLICE))]
+                parts.extend(encode(texts))
+                if ctx is not None:
+                    ctx.progress(min(n, lo + ENGINE_EMBED_SLICE), n, f"embedding {n} chunks")
+            try:
+                store.set_embeddings(parts)
+            except ValueError as e:  # every embedding request failed
+                notes.append(f"embedding failed ({e}); serving BM25 only")
+                encode = None
+            else:
+                if not store.valid.all():
+                    notes.append(f"{int((~store.valid).sum())} of {n} chunks could not be embedded")
+            timings["embed_s"] = round(time.perf_counter() - t0, 3)
+        if encode is not None:
+            t0 = time.perf_counter()
+            xb = store.embedding_matrix().copy()
+            faiss.normalize_L2(xb)
+            index = build_vector_index(xb, kind=self.index_kind)
+            timings["index_s"] = round(time.perf_counter() - t0, 3)
+        elif n:
+            notes.append(f"no embedding model available ({self.embed_model}); serving BM25 only")
+        t0 = time.perf_counter()
+        bm25 = BM25Index.build(store.texts(), lexical_tokenize)
+        timings["bm25_s"] = round(time.perf_counter() - t0, 3)
+        version = None
+        if persist and index is not None:
+            version = save_artifact(index, store, self.artifact_dir, embedding_model=self.embed_model)
+            self._disk_version = version
+        else:
+            if persist:
+                notes.append("BM25-only corpora are not persisted")
+            # Only an artifact published after this corpus may replace it.
+            self._disk_version = current_version(self.artifact_dir)
+        self._swap(EngineSnapshot(store, index, bm25, self.embed_model if index is not None else None, version))
+        return {"chunks": n, "mode": "faiss" if index is not None else "lexical", "version": version,
+                "timings": timings, "notes": notes}
+
+    # -- queries -----------------------------------------------------------
+    def _require(self) -> EngineSnapshot:
+        snap = self._snapshot
+        if snap is None or not len(snap.store):
+            raise LookupError("No documents ingested yet.")
+        return snap
+
+    def _encode_queries(self, model: str) -> Callable:
+        encode = self._encoder(model)
+        if encode is None:
+            raise RuntimeError(f"Query encoder {model} unavailable.")
+
+        def encode_queries(queries: Sequence[str]):
+            embs, qstats = get_query_embedding_cache().encode(model, list(queries), encode)
+            ok = np.array([e is not None for e in embs], dtype=bool)
+            if not ok.any():
+                raise RuntimeError("Could not embed the query.")
+            dim = len(next(e for e in embs if e is not None))
+            mat = np.zeros((len(embs), dim), dtype="float32")
+            for i, e in enumerate(embs):
+                if e is not None:
+                    mat[i] = e
+            return mat, ok, qstats
+        return encode_queries
+
+    def search(self, queries: Sequence[str], top_k: int = ENGINE_TOP_K, filters: Optional[dict] = None):
+        """Results per query ({chunk_id, score, text, source, page}) and search stats.
+
+        ``filters`` is {"sources": [...], "pages": [first, last]} (either may be omitted).
+        Raises LookupError before anything has been ingested.
+        """
+        self.reload_if_changed()
+        snap = self._require()
+        mask = None
+        if filters and (filters.get("sources") is not None or filters.get("pages") is not None):
+            mask = snap.store.row_mask(sources=filters.get("sources"), pages=filters.get("pages"))
+            mask = None if mask.all() else mask
+        try:
+            encode = self._encode_queries(snap.embedding_model) if snap.index is not None else None
+            hits, stats = search_chunks(queries, top_k, snap.store, index=snap.index, bm25=snap.bm25, encode=encode,
+                                        mask=mask)
+        except RuntimeError as e:  # query encoder unavailable or failing: BM25 still answers
+            logger.warning(f"Vector search failed ({e}); falling back to BM25")
+            hits, stats = search_chunks(queries, top_k, snap.store, bm25=snap.bm25, mask=mask)
+            stats["fallback"] = str(e)
+        stats.pop("query_vectors", None)
+        store = snap.store
+        out = [[{"chunk_id": int(store.chunk_ids[i]), "score": round(score, 6), "text": store.text(i),
+                 "source": store.source(i), "page": int(store.pages[i]) if store.pages[i] >= 0 else None}
+                for i, score in q] for q in hits]
+        return out, stats
+
+    async def answer(self, question: str, top_k: int = ENGINE_TOP_K, filters: Optional[dict] = None) -> dict:
+        """Retrieve (on a worker thread) and answer with the shared async LLM client.
+
+        Without OPENAI_API_KEY the answer is the top snippets (generate_answer's fallback).
+        """
+        t0 = time.perf_counter()
+        results, stats = await asyncio.to_thread(self.search, [question], top_k, filters)
+        rows = results[0]
+        t1 = time.perf_counter()
+        text, _contexts = await agenerate_answer(question, [r["text"] for r in rows])
+        t2 = time.perf_counter()
+        return {
+            "answer": text,
+            "sources": rows[:3],
+            "timings": {"retrieve_s": round(t1 - t0, 4), "answer_s": round(t2 - t1, 4), "total_s": round(t2 - t0, 4)},
+            "search": stats,
+        }
+
+    def stats(self) -> dict:
+        snap = self._snapshot
+        if snap is None:
+            return {"chunks": 0, "mode": None}
+        return {
+            "chunks": len(snap.store),
+            "sources": len(snap.store.source_names),
+            "mode": "faiss" if snap.index is not None else "lexical",
+            "index_kind": index_kind(snap.index) if snap.index is not None else None,
+            "embedding_model": snap.embedding_model,
+            "version": snap.version,
+            "query_cache": get_query_embedding_cache().stats_dict(),
+        }
@@ -1,12 +1,93 @@
-from typing import List, Tuple
+from typing import Iterator, List, Optional, Tuple
 import os
+import time
+
+from .answer_cache import context_key, get_answer_cache
+from .openai_pool import OpenAI, get_async_openai_client, get_openai_client
 
 OPENAI_MODEL = os.getenv("LLM_MODEL", os.getenv("OPENAI_MODEL", "gpt-4o-mini"))
+# Per-request timeout for answer generation (the pooled client's default is OPENAI_TIMEOUT_S).
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "30"))
+# Stream answers token by token (stream=True); 0 keeps the single blocking request.
+LLM_STREAM = os.getenv("LLM_STREAM", "1") != "0"
+# Part of the answer cache key: bump whenever _build_prompt/_messages change.
+PROMPT_VERSION = "hr-policy-v1"
+
+
+def answer_metrics(ttft_s: float, total_s: float, tokens: Optional[int], streamed: bool) -> dict:
+    """Per-answer latency record. ``tokens_per_s`` is the decode rate after the first token."""
+    decode_s = total_s - ttft_s if streamed else total_s
+    rate = tokens / decode_s if tokens and decode_s > 0 else None
+    return {
+        "ttft_s": round(ttft_s, 3),
+        "total_s": round(total_s, 3),
+        "tokens": tokens,
+        "tokens_per_s": None if rate is None else round(rate, 1),
+        "streamed": streamed,
+    }
+
+
+class AnswerStream:
+    """Iterates the text deltas of a streamed chat completion and times them.
+
+    ``started`` is when the request was sent, so ``ttft_s`` includes connection and
+    queueing time. A failure before the first token is raised (callers fall back to a
+    blocking request); after it, the partial answer is kept and ``error`` is set.
+    """
+
+    def __init__(self, response, started: float):
+        self._response = response
+        self.started = started
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.parts: List[str] = []
+        self.deltas = 0
+        self.usage_tokens: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            for chunk in self._response:
+                usage = getattr(chunk, "usage", None)
+                if usage is not None and getattr(usage, "completion_tokens", None) is not None:
+                    self.usage_tokens = usage.completion_tokens
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if self.first_token_at is None:
+                    self.first_token_at = time.perf_counter()
+                self.parts.append(delta)
+                self.deltas += 1
+                yield delta
+        except Exception as e:
+            if self.first_token_at is None:
+                raise
+            self.error = str(e)
+        finally:
+            self.finished_at = time.perf_counter()
+            close = getattr(self._response, "close", None)
+            if close is not None:
+                close()
 
-try:
-    from openai import OpenAI  # type: ignore
-except Exception:
-    OpenAI = None  # type: ignore
+    @property
+    def text(self) -> str:
+        return "".join(self.parts).strip()
+
+    def metrics(self) -> dict:
+        end = self.finished_at or time.perf_counter()
+        first = self.first_token_at or end
+        # The API sends one token per delta; usage (when the server reports it) is exact.
+        tokens = self.usage_tokens if self.usage_tokens is not None else self.deltas
+        return answer_metrics(first - self.started, end - self.started, tokens, streamed=True)
+
+
+def stream_chat(client, **kwargs) -> AnswerStream:
+    """``client.chat.completions.create(stream=True, ...)`` wrapped in an AnswerStream."""
+    started = time.perf_counter()
+    response = client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **kwargs)
+    return AnswerStream(response, started)
 
 
 def _build_prompt(query: str, contexts: List[str]) -> str:
@@ -19,38 +100,113 @@ def _build_prompt(query: str, contexts: List[str]) -> str:
     )
 
 
+def _messages(query: str, contexts: List[str]) -> List[dict]:
+    return [
+        {"role": "system", "content": "You are a precise and concise assistant."},
+        {"role": "user", "content": _build_prompt(query, contexts)},
+    ]
+
+
 def _openai_answer(query: str, contexts: List[str]) -> str | None:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key or OpenAI is None:
         return None
-    client = OpenAI(api_key=api_key)
-    prompt = _build_prompt(query, contexts)
     try:
-        resp = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a precise and concise assistant."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.2,
+        resp = get_openai_client(api_key).chat.completions.create(
+            model=OPENAI_MODEL, messages=_messages(query, contexts), temperature=0.2, timeout=LLM_TIMEOUT_S,
         )
         return (resp.choices[0].message.content or "").strip()
     except Exception:
         return None
 
 
+async def _openai_answer_async(query: str, contexts: List[str]) -> str | None:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key or OpenAI is None:
+        return None
+    try:
+        resp = await get_async_openai_client(api_key).chat.completions.create(
+            model=OPENAI_MODEL, messages=_messages(query, contexts), temperature=0.2, timeout=LLM_TIMEOUT_S,
+        )
+        return (resp.choices[0].message.content or "").strip()
+    except Exception:
+        return None
+
+
+def stream_answer(query: str, contexts: List[str]) -> Optional[AnswerStream]:
+    """Streamed counterpart of ``generate_answer``'s LLM call.
+
+    Returns None when OpenAI is not configured or the request fails before streaming
+    starts; callers then use ``generate_answer``. Sources are ``contexts[:3]``.
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not contexts or not api_key or OpenAI is None:
+        return None
+    try:
+        return stream_chat(
+            get_openai_client(api_key), model=OPENAI_MODEL, messages=_messages(query, contexts),
+            temperature=0.2, timeout=LLM_TIMEOUT_S,
+        )
+    except Exception:
+        return None
+
+
+def _context_key(contexts: List[str]) -> str:
+    return context_key(enumerate(contexts[:3]), OPENAI_MODEL, PROMPT_VERSION)
+
+
+def cached_answer(query: str, contexts: List[str]) -> Optional[Tuple[str, List[str]]]:
+    """A previously generated LLM answer for this question over the same contexts."""
+    cache = get_answer_cache()
+    if cache is None or not contexts:
+        return None
+    hit = cache.get(query, _context_key(contexts))
+    return (hit[0].answer, contexts[:3]) if hit else None
+
+
+def cache_answer(query: str, contexts: List[str], answer: str, cost_s: float = 0.0):
+    cache = get_answer_cache()
+    if cache is not None and contexts and answer:
+        cache.put(query, _context_key(contexts), answer, cost_s=cost_s)
+
+
+def _fallback_answer(contexts: List[str]) -> Tuple[str, List[str]]:
+    snippet = "\n\n".join(contexts[:3])
+    answer = (
+        "Here is a response based on the most relevant policy snippets I found: \n\n" + snippet
+    )
+    return answer, contexts[:3]
+
+
 def generate_answer(query: str, contexts: List[str]) -> Tuple[str, List[str]]:
     if not contexts:
         return ("I couldn't find relevant information in the provided documents.", [])
 
+    hit = cached_answer(query, contexts)
+    if hit:
+        return hit
+
     # Try OpenAI if configured
+    t0 = time.perf_counter()
     llm_answer = _openai_answer(query, contexts)
     if llm_answer:
+        cache_answer(query, contexts, llm_answer, time.perf_counter() - t0)
         return llm_answer, contexts[:3]
 
     # Fallback: return concatenated snippets
-    snippet = "\n\n".join(contexts[:3])
-    answer = (
-        "Here is a response based on the most relevant policy snippets I found: \n\n" + snippet
-    )
-    return answer, contexts[:3]
+    return _fallback_answer(contexts)
+
+
+async def agenerate_answer(query: str, contexts: List[str]) -> Tuple[str, List[str]]:
+    """``generate_answer`` on the shared AsyncOpenAI client, for callers running an event loop."""
+    if not contexts:
+        return ("I couldn't find relevant information in the provided documents.", [])
+    hit = cached_answer(query, contexts)
+    if hit:
+        return hit
+    t0 = time.perf_counter()
+    llm_answer = await _openai_answer_async(query, contexts)
+    if llm_answer:
+        cache_answer(query, contexts, llm_answer, time.perf_counter() - t0)
+        return llm_answer, contexts[:3]
+    return _fallback_answer(contexts)
@@ -0,0 +1,91 @@
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import time
+
+RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+HYBRID_WORKERS = int(os.getenv("HYBRID_WORKERS", "8"))
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=HYBRID_WORKERS, thread_name_prefix="hybrid")
+    return _pool
+
+
+def run_stages(stages: Dict[str, Callable[[], Any]]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """Run independent retrieval stages concurrently.
+
+    Returns (results, timings_ms). Stage callables must not touch st.session_state:
+    they run on pool threads without a Streamlit script context. A failing stage
+    yields an empty result so the other retriever can still answer.
+    """
+    def _timed(fn):
+        t0 = time.perf_counter()
+        try:
+            return fn(), None, (time.perf_counter() - t0) * 1000
+        except Exception as e:
+            return [], e, (time.perf_counter() - t0) * 1000
+
+    pool = _get_pool()
+    futures = {name: pool.submit(_timed, fn) for name, fn in stages.items()}
+    results, timings = {}, {}
+    for name, fut in futures.items():
+        res, err, ms = fut.result()
+        results[name] = res
+        timings[f"{name}_ms"] = round(ms, 2)
+        if err is not None:
+            timings[f"{name}_error"] = repr(err)
+    return results, timings
+
+
+def hybrid_search(vector_fn: Callable[[], Tuple[List[Any], Any]], lexical_fn: Callable[[], List[Any]],
+                  fuse: Callable[[List[Any], List[Any], int], List[Any]], k: int) -> Tuple[List[Any], Any, Dict[str, Any]]:
+    """Run the vector stage (returning (pairs, query stats)) and the lexical stage
+    (returning pairs) concurrently, then ``fuse(vector_pairs, lexical_pairs, k)``.
+
+    A failed stage contributes no candidates, so the other retriever still answers.
+    Returns (fused pairs, query stats or None, timings) with ``<stage>_error`` set for
+    failed stages.
+    """
+    results, timings = run_stages({"vector": vector_fn, "lexical": lexical_fn})
+    t0 = time.perf_counter()
+    vector_pairs, qstats = ([], None) if "vector_error" in timings else results["vector"]
+    pairs = fuse(vector_pairs, results["lexical"], k)
+    timings["fusion_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    return pairs, qstats, timings
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = RRF_K,
+                           weights: Optional[Sequence[float]] = None) -> List[Tuple[Hashable, float]]:
+    """Fuse ranked key lists: score(d) = sum_i w_i / (k + rank_i(d)), ranks starting at 1."""
+    weights = weights or [1.0] * len(rankings)
+    fused: Dict[Hashable, float] = {}
+    for w, ranking in zip(weights, rankings):
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] = fused.get(key, 0.0) + w / (k + rank)
+    return sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def weighted_score_fusion(scored: Sequence[Sequence[Tuple[Hashable, float]]],
+                          weights: Optional[Sequence[float]] = None) -> List[Tuple[Hashable, float]]:
+    """Min-max normalize each retriever's scores to [0, 1], then take a weighted sum."""
+    weights = weights or [1.0] * len(scored)
+    fused: Dict[Hashable, float] = {}
+    for w, pairs in zip(weights, scored):
+        if not pairs:
+            continue
+        vals = [s for _, s in pairs]
+        lo, hi = min(vals), max(vals)
+        span = hi - lo
+        for key, s in pairs:
+            norm = (s - lo) / span if span > 0 else 1.0
+            fused[key] = fused.get(key, 0.0) + w * norm
+    return sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
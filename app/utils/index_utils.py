@@ -0,0 +1,221 @@
+from typing import Any, Dict, Optional
+import math
+import os
+import time
+
+import numpy as np
+
+try:
+    import faiss  # type: ignore
+except Exception:  # pragma: no cover
+    faiss = None  # type: ignore
+
+INDEX_KINDS = ["auto", "flat", "ivf_flat", "ivf_pq", "hnsw"]
+
+# Corpus-size thresholds for kind="auto". Exact search is fast enough for small
+# libraries; HNSW gives the best latency/recall in the middle; IVF-PQ keeps memory
+# bounded for very large corpora.
+AUTO_FLAT_MAX = int(os.getenv("INDEX_AUTO_FLAT_MAX", "20000"))
+AUTO_HNSW_MAX = int(os.getenv("INDEX_AUTO_HNSW_MAX", "500000"))
+
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+
+# Filtered search over at most this many rows scores the subset exactly from the
+# stored vectors (cost proportional to the subset); larger subsets search the index
+# with an ID selector so non-matching rows are skipped during the scan.
+FILTER_EXACT_MAX_ROWS = int(os.getenv("FILTER_EXACT_MAX_ROWS", "50000"))
+
+
+def choose_index_kind(n: int) -> str:
+    if n <= AUTO_FLAT_MAX:
+        return "flat"
+    if n <= AUTO_HNSW_MAX:
+        return "hnsw"
+    return "ivf_pq"
+
+
+def default_nlist(n: int) -> int:
+    # ~4*sqrt(n) lists, but keep >= 39 training points per centroid.
+    return max(1, min(int(4 * math.sqrt(n)), n // 39 or 1))
+
+
+def _pq_m(dim: int) -> int:
+    # Largest sub-quantizer count <= dim/4 that divides dim (8-bit codes).
+    for m in range(max(1, dim // 4), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def _train_sample(xb: np.ndarray, size: Optional[int], nlist: int, seed: int = 0) -> np.ndarray:
+    n = len(xb)
+    size = size or max(nlist * 64, 10000)
+    if size >= n:
+        return xb
+    rows = np.random.default_rng(seed).choice(n, size=size, replace=False)
+    return xb[np.sort(rows)]
+
+
+def build_vector_index(xb: np.ndarray, kind: str = "auto", nlist: Optional[int] = None, pq_m: Optional[int] = None,
+                       hnsw_m: int = 32, ef_construction: int = 200, train_size: Optional[int] = None) -> Any:
+    """Build an inner-product FAISS index over L2-normalized rows of ``xb``.
+
+    ``kind`` is one of INDEX_KINDS; "auto" picks by corpus size. IVF variants are
+    trained on a random sample of ``train_size`` rows.
+    """
+    if faiss is None:
+        raise RuntimeError("Install faiss-cpu and numpy")
+    xb = np.ascontiguousarray(xb, dtype=np.float32)
+    n, dim = xb.shape
+    if kind == "auto":
+        kind = choose_index_kind(n)
+    ip = faiss.METRIC_INNER_PRODUCT
+    if kind == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, ip)
+        index.hnsw.efConstruction = ef_construction
+        index.hnsw.efSearch = DEFAULT_EF_SEARCH
+    elif kind in ("ivf_flat", "ivf_pq"):
+        nlist = nlist or default_nlist(n)
+        quantizer = faiss.IndexFlatIP(dim)
+        if kind == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, ip)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m or _pq_m(dim), 8, ip)
+        index.train(_train_sample(xb, train_size, nlist))
+        index.nprobe = min(DEFAULT_NPROBE, nlist)
+    else:
+        raise ValueError(f"Unknown index kind: {kind}")
+    index.add(xb)
+    return index
+
+
+def index_kind(index: Any) -> str:
+    if faiss is None or index is None:
+        return "none"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def set_search_params(index: Any, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """Apply query-time knobs to ``index`` itself; parameters that do not apply to the
+    index are ignored. Shared indexes should use ``search_params`` instead."""
+    if faiss is None or index is None:
+        return
+    if nprobe and isinstance(index, faiss.IndexIVF):
+        index.nprobe = int(min(nprobe, index.nlist))
+    if ef_search and isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = int(ef_search)
+
+
+def search_params(index: Any, nprobe: Optional[int] = None, ef_search: Optional[int] = None, selector: Any = None):
+    """Per-call ``faiss.SearchParameters`` for ``index``, or None when nothing applies.
+
+    Unlike ``set_search_params`` the index is left untouched, so one index shared by
+    several sessions (e.g. a loaded artifact) can be searched with different knobs.
+    Unset knobs keep the index's own value.
+    """
+    if faiss is None or index is None:
+        return None
+    kw: Dict[str, Any] = {} if selector is None else {"sel": selector}
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(nprobe=int(min(nprobe, index.nlist)) if nprobe else index.nprobe, **kw)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=int(ef_search) if ef_search else index.hnsw.efSearch, **kw)
+    return faiss.SearchParameters(**kw) if kw else None
+
+
+def recall_report(xb: np.ndarray, index: Any, queries: np.ndarray, k: int = 10, nprobe: Optional[int] = None,
+                  ef_search: Optional[int] = None) -> Dict[str, Any]:
+    """Compare ``index`` (searched with ``nprobe``/``ef_search``) against exact Flat
+    search over the same vectors.
+
+    Returns recall@k (fraction of exact top-k ids recovered) and per-query latency.
+    """
+    xb = np.ascontiguousarray(xb, dtype=np.float32)
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    faiss.normalize_L2(queries)
+    flat = faiss.IndexFlatIP(xb.shape[1])
+    flat.add(xb)
+    k = min(k, len(xb))
+
+    t0 = time.perf_counter()
+    _, exact = flat.search(queries, k)
+    t_flat = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    _, approx = index.search(queries, k, params=search_params(index, nprobe, ef_search))
+    t_index = time.perf_counter() - t0
+
+    hits = sum(len(set(a[a >= 0]) & set(e)) for a, e in zip(approx, exact))
+    nq = max(1, len(queries))
+    return {
+        "index": index_kind(index),
+        "queries": len(queries),
+        "k": k,
+        f"recall@{k}": round(hits / (nq * k), 4),
+        "index_ms_per_query": round(1000 * t_index / nq, 4),
+        "flat_ms_per_query": round(1000 * t_flat / nq, 4),
+        "speedup_vs_flat": round(t_flat / t_index, 2) if t_index > 0 else None,
+    }
+
+
+def search_batch(index: Any, queries: np.ndarray, k: int, batch_size: Optional[int] = None,
+                 nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """Search all ``queries`` with matrix calls instead of one row at a time.
+
+    Queries are L2-normalized (on a copy). ``batch_size`` bounds the rows per
+    ``index.search`` call for very large query sets; ``nprobe``/``ef_search`` apply to
+    this call only. Returns (D, I) like FAISS.
+    """
+    xq = np.array(queries, dtype=np.float32, ndmin=2)
+    faiss.normalize_L2(xq)
+    nq = len(xq)
+    step = batch_size or nq or 1
+    params = search_params(index, nprobe, ef_search)
+    D = np.empty((nq, k), dtype=np.float32)
+    I = np.empty((nq, k), dtype=np.int64)
+    for lo in range(0, nq, step):
+        D[lo:lo + step], I[lo:lo + step] = index.search(xq[lo:lo + step], k, params=params)
+    return D, I
+
+
+def search_filtered(index: Any, queries: np.ndarray, k: int, rows: np.ndarray, vectors: Optional[np.ndarray] = None,
+                    exact_max_rows: int = FILTER_EXACT_MAX_ROWS, nprobe: Optional[int] = None,
+                    ef_search: Optional[int] = None):
+    """Search only the index rows in ``rows``; candidates are restricted before scoring.
+
+    ``vectors`` are the indexed embeddings (row i = index id i, any float dtype, may be
+    memory-mapped). Subsets up to ``exact_max_rows`` are scored exactly from those rows;
+    otherwise the index is searched with an ``IDSelectorBatch`` (and ``nprobe``/
+    ``ef_search``, for this call only). Returns (D, I, strategy)
+    like ``search_batch``, padded with -1 ids when the subset has fewer than k rows.
+    """
+    xq = np.array(queries, dtype=np.float32, ndmin=2)
+    faiss.normalize_L2(xq)
+    nq = len(xq)
+    rows = np.asarray(rows, dtype=np.int64)
+    D = np.full((nq, k), -np.inf, dtype=np.float32)
+    I = np.full((nq, k), -1, dtype=np.int64)
+    if not len(rows) or k <= 0:
+        return D, I, "empty"
+    if vectors is not None and len(rows) <= exact_max_rows:
+        sub = np.array(vectors[rows], dtype=np.float32)  # gathers only the subset
+        faiss.normalize_L2(sub)
+        sims = xq @ sub.T
+        kk = min(k, len(rows))
+        part = np.argpartition(-sims, kk - 1, axis=1)[:, :kk] if len(rows) > kk else np.tile(np.arange(kk), (nq, 1))
+        top = np.take_along_axis(sims, part, axis=1)
+        order = np.argsort(-top, axis=1, kind="stable")
+        D[:, :kk] = np.take_along_axis(top, order, axis=1)
+        I[:, :kk] = rows[np.take_along_axis(part, order, axis=1)]
+        return D, I, "subset_exact"
+    selector = faiss.IDSelectorBatch(rows)
+    D, I = index.search(xq, k, params=search_params(index, nprobe, ef_search, selector))
+    return D, I, "id_selector"
@@ -0,0 +1,239 @@
+from typing import Any, Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from dataclasses import dataclass, field
+import gc
+import os
+import queue
+import re
+import threading
+import time
+import unicodedata
+
+from .dedup import Deduplicator
+from .pdf_utils import extract_pdfs
+
+# Items buffered between two pipeline stages. A full queue blocks the producer, so at
+# most this many pages/chunks/batches are in flight regardless of upload size.
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "64"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+
+
+class PageRecord(NamedTuple):
+    source: str
+    page: int  # 1-based
+    text: str
+
+
+class ChunkRecord(NamedTuple):
+    source: str
+    page: int
+    text: str
+
+
+@dataclass
+class IngestStats:
+    files: int = 0
+    pages: int = 0
+    chunks: int = 0
+    duplicates: int = 0  # chunks dropped by the dedup stage (not counted in ``chunks``)
+    batches: int = 0
+    chars: int = 0
+    bytes: int = 0  # UTF-8 size of the page text fed to the chunker
+    elapsed_s: float = 0.0
+    errors: List[str] = field(default_factory=list)
+    per_file: List[dict] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            "files": self.files,
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "duplicates": self.duplicates,
+            "batches": self.batches,
+            "chars": self.chars,
+            "mb": round(self.bytes / 1e6, 2),
+            "elapsed_s": round(self.elapsed_s, 3),
+            "pages_per_s": round(self.pages / self.elapsed_s, 1) if self.elapsed_s > 0 else None,
+            "mb_per_s": round(self.bytes / 1e6 / self.elapsed_s, 2) if self.elapsed_s > 0 else None,
+        }
+
+
+_SPACES_RE = re.compile(r"[ \t\f\v ]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def normalize_text(text: str) -> str:
+    """NFKC-normalize, drop NULs, collapse runs of spaces and of blank lines."""
+    text = unicodedata.normalize("NFKC", text or "").replace("\x00", "")
+    text = _SPACES_RE.sub(" ", text)
+    return _BLANK_LINES_RE.sub("\n\n", text).strip()
+
+
+# -- stages ----------------------------------------------------------------
+def iter_pages(files: Iterable[Tuple[str, bytes]], engine: str = "pypdf", workers: Optional[int] = None,
+               stats: Optional[IngestStats] = None) -> Iterator[PageRecord]:
+    """Yield pages file by file; only one file's pages are held at a time."""
+    for name, data in files:
+        res = extract_pdfs([(name, data)], engine=engine, workers=workers)[0]
+        if stats is not None:
+            stats.files += 1
+            stats.per_file.append({"file": name, "pages": len(res.pages), "extract_s": round(res.seconds, 3),
+                                   "pages_per_s": round(res.pages_per_s, 1)})
+            if res.error:
+                stats.errors.append(f"{name}: {res.error}")
+        pages, res = res.pages, None
+        # pypdf readers are reference cycles; reclaim them per file rather than whenever
+        # the cyclic GC next runs, so memory does not ratchet up with the file count.
+        gc.collect()
+        for i, text in enumerate(pages):
+            yield PageRecord(name, i + 1, text)
+
+
+def iter_normalized(pages: Iterable[PageRecord]) -> Iterator[PageRecord]:
+    for p in pages:
+        yield p._replace(text=normalize_text(p.text))
+
+
+def iter_chunks(pages: Iterable[PageRecord], chunker: Callable[[str], List[str]],
+                stats: Optional[IngestStats] = None) -> Iterator[ChunkRecord]:
+    """Chunk each page on its own so every chunk keeps its (source, page)."""
+    for p in pages:
+        if stats is not None:
+            stats.pages += 1
+            stats.chars += len(p.text)
+            stats.bytes += len(p.text.encode("utf-8"))
+        for text in chunker(p.text):
+            if stats is not None:
+                stats.chunks += 1
+            yield ChunkRecord(p.source, p.page if p.page is not None and p.page >= 0 else None, text)
+
+
+def iter_dedup(chunks: Iterable[ChunkRecord], dedup: Optional[Deduplicator],
+               stats: Optional[IngestStats] = None) -> Iterator[ChunkRecord]:
+    """Drop exact/near duplicate chunks (first copy wins) before they reach the embedder."""
+    for c in chunks:
+        if dedup is not None and dedup.check(c.text)[0] is not None:
+            if stats is not None:
+                stats.chunks -= 1
+                stats.duplicates += 1
+            continue
+        yield c
+
+
+def iter_batches(items: Iterable[Any], size: int = INGEST_BATCH_SIZE) -> Iterator[List[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+_DONE = object()
+
+
+def buffered(items: Iterable[Any], maxsize: int = INGEST_QUEUE_SIZE) -> Iterator[Any]:
+    """Run ``items`` on a producer thread feeding a bounded queue.
+
+    The upstream stage works ahead of the consumer by at most ``maxsize`` items and
+    blocks when the queue is full (backpressure). Producer exceptions are re-raised
+    in the consumer; abandoning the iterator stops the producer.
+    """
+    q: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        try:
+            for item in items:
+                if not _put(item):
+                    return
+            _put(_DONE)
+        except BaseException as e:  # surfaced to the consumer
+            _put(e)
+
+    t = threading.Thread(target=_produce, name="ingest-stage", daemon=True)
+    t.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def pipeline(files: Iterable[Tuple[str, bytes]], chunker: Callable[[str], List[str]], batch_size: int = INGEST_BATCH_SIZE,
+             engine: str = "pypdf", workers: Optional[int] = None, queue_size: int = INGEST_QUEUE_SIZE,
+             stats: Optional[IngestStats] = None, dedup: Optional[Deduplicator] = None) -> Iterator[List[ChunkRecord]]:
+    """pages -> normalized text -> chunks (-> dedup) -> batches, each stage behind a bounded queue."""
+    t0 = time.perf_counter()
+    pages = buffered(iter_pages(files, engine=engine, workers=workers, stats=stats), queue_size)
+    chunks = buffered(iter_dedup(iter_chunks(iter_normalized(pages), chunker, stats=stats), dedup, stats), queue_size)
+    yield from buffered(iter_batches(chunks, batch_size), max(1, queue_size // max(1, batch_size)) + 1)
+    if stats is not None:
+        stats.elapsed_s = time.perf_counter() - t0
+
+
+def ingest(files: Iterable[Tuple[str, bytes]], chunker: Callable[[str], List[str]], builder,
+           embed_fn: Optional[Callable[[List[str]], Any]] = None, batch_size: int = INGEST_BATCH_SIZE,
+           engine: str = "pypdf", workers: Optional[int] = None,
+           on_batch: Optional[Callable[[IngestStats], None]] = None,
+           dedup: Optional[Deduplicator] = None) -> Tuple[Optional[List[Any]], IngestStats]:
+    """Drive the pipeline into ``builder`` (anything with ``add(text, source, page=...)``).
+
+    With ``embed_fn`` every batch is embedded as it arrives and the per-batch results are
+    returned in chunk order; otherwise the first element is None.
+    """
+    stats = IngestStats()
+    t0 = time.perf_counter()
+    embedded = [] if embed_fn is not None else None
+    for batch in pipeline(files, chunker, batch_size=batch_size, engine=engine, workers=workers, stats=stats,
+                          dedup=dedup):
+        for c in batch:
+            builder.add(c.text, c.source, page=c.page)
+        if embed_fn is not None:
+            embedded.append(embed_fn([c.text for c in batch]))
+        stats.batches += 1
+        if on_batch is not None:
+            on_batch(stats)
+    stats.elapsed_s = time.perf_counter() - t0
+    return embedded, stats
+
+
+def iter_store_pages(store: Any) -> Iterator[PageRecord]:
+    """Re-read page records from a ChunkStore holding one row per page (page -1 if unknown)."""
+    for i in range(len(store)):
+        yield PageRecord(store.source(i), int(store.pages[i]), store.text(i))
+
+
+def chunk_pages(pages: Iterable[PageRecord], chunker: Callable[[str], List[str]], builder,
+                on_page: Optional[Callable[[IngestStats], None]] = None,
+                dedup: Optional[Deduplicator] = None) -> IngestStats:
+    """Chunk ``pages`` one at a time into ``builder``, keeping (source, page) on every chunk.
+
+    Only the current page's text is held, so input size is bounded by the builder's
+    output rather than by a limit on the input.
+    """
+    stats = IngestStats()
+    t0 = time.perf_counter()
+    last_page = 0
+    for c in iter_dedup(iter_chunks(pages, chunker, stats=stats), dedup, stats):
+        builder.add(c.text, c.source, page=c.page)
+        if on_page is not None and stats.pages != last_page:
+            last_page = stats.pages
+            on_page(stats)
+    stats.elapsed_s = time.perf_counter() - t0
+    return stats
@@ -0,0 +1,215 @@
+from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+import os
+import threading
+import time
+import traceback
+import uuid
+
+from .logger import get_logger
+
+# Background jobs (chunking, embedding, index builds) run on one bounded, process-wide
+# pool. Job functions get a JobContext for progress/cancellation and must not touch
+# st.session_state: the UI polls the job and applies its result on the script thread.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "50"))  # finished jobs kept for status lookups
+
+JOB_STATES = ["queued", "running", "done", "failed", "cancelled"]
+
+logger = get_logger(__name__)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    label: str
+    status: str = "queued"
+    done: float = 0.0
+    total: Optional[float] = None
+    message: str = ""
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    traceback: Optional[str] = None
+    cancel_requested: bool = False
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    @property
+    def progress(self) -> Optional[float]:
+        """Fraction complete in [0, 1]; None until the job reports a total."""
+        if self.status == "done":
+            return 1.0
+        if not self.total:
+            return None
+        return max(0.0, min(1.0, self.done / self.total))
+
+    @property
+    def elapsed_s(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def eta_s(self) -> Optional[float]:
+        """Remaining time, extrapolated from the rate so far."""
+        p = self.progress
+        if self.status != "running" or not p:
+            return None
+        return self.elapsed_s * (1.0 - p) / p
+
+    def as_dict(self) -> dict:
+        eta = self.eta_s
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "label": self.label,
+            "status": self.status,
+            "progress": None if self.progress is None else round(self.progress, 4),
+            "message": self.message,
+            "elapsed_s": round(self.elapsed_s, 2),
+            "eta_s": None if eta is None else round(eta, 1),
+            "error": self.error,
+        }
+
+
+class JobContext:
+    """Handed to a job function: report progress and honour cancellation."""
+
+    def __init__(self, job: Job):
+        self._job = job
+
+    @property
+    def job_id(self) -> str:
+        return self._job.id
+
+    @property
+    def cancelled(self) -> bool:
+        return self._job.cancel_requested
+
+    def check_cancelled(self):
+        if self._job.cancel_requested:
+            raise JobCancelled(self._job.id)
+
+    def progress(self, done: float, total: Optional[float] = None, message: Optional[str] = None):
+        if total is not None:
+            self._job.total = total
+        self._job.done = done
+        if message is not None:
+            self._job.message = message
+        self.check_cancelled()
+
+
+class JobManager:
+    """Runs ``fn(ctx, *args, **kwargs)`` jobs on a bounded thread pool.
+
+    Jobs are addressed by ID. A queued job is cancelled immediately; a running one
+    stops at its next ``ctx.progress``/``ctx.check_cancelled`` call, and a result that
+    arrives after cancellation is discarded. Exceptions are captured on the job.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, history: int = JOB_HISTORY):
+        self.workers = max(1, int(workers))
+        self.history = history
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._futures: Dict[str, Future] = {}
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args, label: Optional[str] = None, **kwargs) -> str:
+        job = Job(id=uuid.uuid4().hex[:12], kind=kind, label=label or kind)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+            self._futures[job.id] = self._pool.submit(self._run, job, fn, args, kwargs)
+        logger.info(f"Job {job.id} ({job.label}) queued")
+        return job.id
+
+    def _run(self, job: Job, fn: Callable[..., Any], args, kwargs):
+        if job.cancel_requested:
+            return self._finish(job, "cancelled")
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            result = fn(JobContext(job), *args, **kwargs)
+        except JobCancelled:
+            return self._finish(job, "cancelled")
+        except Exception as e:
+            job.error = repr(e)
+            job.traceback = traceback.format_exc()
+            logger.exception(f"Job {job.id} ({job.label}) failed")
+            return self._finish(job, "failed")
+        if job.cancel_requested:
+            return self._finish(job, "cancelled")
+        job.result = result
+        self._finish(job, "done")
+
+    def _finish(self, job: Job, status: str):
+        job.finished_at = time.time()
+        if job.started_at is None:
+            job.started_at = job.finished_at
+        job.status = status
+        with self._lock:
+            self._futures.pop(job.id, None)
+        logger.info(f"Job {job.id} ({job.label}) {status} after {job.elapsed_s:.2f}s")
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j.finished]
+        for j in sorted(finished, key=lambda j: j.finished_at)[:max(0, len(finished) - self.history)]:
+            del self._jobs[j.id]
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        return self._jobs.get(job_id) if job_id else None
+
+    def list(self, kind: Optional[str] = None) -> List[Job]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [j for j in jobs if kind is None or j.kind == kind]
+
+    def cancel(self, job_id: str) -> bool:
+        """Request cancellation; False if the job is unknown or already finished."""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel_requested = True
+        with self._lock:
+            fut = self._futures.get(job_id)
+        if fut is not None and fut.cancel():
+            self._finish(job, "cancelled")
+        return True
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Job]:
+        """Block until the job finishes (for scripts and tests; the UI polls instead)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        job = self.get(job_id)
+        while job is not None and not job.finished:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            time.sleep(0.01)
+        return job
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager()
+    return _manager
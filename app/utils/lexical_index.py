@@ -0,0 +1,147 @@
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from array import array
+import re
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+LEXICAL_STOPWORDS = {
+    "the","a","an","and","or","is","are","to","of","in","on","for","with","how","should","be","by","do","does","can","could","would","what","when","where","why","which"
+}
+
+
+def regex_tokenize(text: str, stopwords: Iterable[str] = ()) -> List[str]:
+    stop = stopwords if isinstance(stopwords, (set, frozenset)) else set(stopwords)
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in stop]
+
+
+def lexical_tokenize(text: str) -> List[str]:
+    """Tokenizer for the app's BM25 indexes (question words are stopwords)."""
+    return regex_tokenize(text, LEXICAL_STOPWORDS)
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring.
+
+    Postings are stored CSR-style: for term ``t`` the documents are
+    ``doc_ids[term_ptr[t]:term_ptr[t + 1]]`` with matching ``tfs``. A query only touches
+    the postings of its own terms, so latency depends on how common the query terms
+    are rather than on corpus size.
+    """
+
+    def __init__(self, vocab: Dict[str, int], term_ptr: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray,
+                 doc_len: np.ndarray, tokenize: Callable[[str], List[str]], k1: float = 1.5, b: float = 0.75):
+        self.vocab = vocab
+        self.term_ptr = term_ptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.tokenize = tokenize
+        self.k1 = k1
+        self.b = b
+        n = len(doc_len)
+        avgdl = float(doc_len.mean()) if n else 0.0
+        df = np.diff(term_ptr).astype(np.float64)
+        self.idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        # Per-document length normalization, precomputed once.
+        self._norm = (k1 * (1.0 - b + b * doc_len / avgdl)).astype(np.float32) if n and avgdl else np.full(n, k1, np.float32)
+
+    @classmethod
+    def build(cls, texts: Sequence[str], tokenize: Callable[[str], List[str]] = regex_tokenize,
+              k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        vocab: Dict[str, int] = {}
+        term_col = array("i")
+        doc_col = array("i")
+        doc_len = np.zeros(len(texts), dtype=np.int32)
+        for d, text in enumerate(texts):
+            toks = tokenize(text or "")
+            doc_len[d] = len(toks)
+            for t in toks:
+                tid = vocab.get(t)
+                if tid is None:
+                    tid = vocab[t] = len(vocab)
+                term_col.append(tid)
+                doc_col.append(d)
+        n_docs = max(1, len(texts))
+        if term_col:
+            keys = np.frombuffer(term_col, dtype=np.int32).astype(np.int64) * n_docs + np.frombuffer(doc_col, dtype=np.int32)
+            uniq, counts = np.unique(keys, return_counts=True)  # sorted by (term, doc)
+            terms = (uniq // n_docs).astype(np.int64)
+            doc_ids = (uniq % n_docs).astype(np.int32)
+            tfs = np.minimum(counts, np.iinfo(np.uint16).max).astype(np.uint16)
+            term_ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(terms, minlength=len(vocab)), out=term_ptr[1:])
+        else:
+            doc_ids = np.zeros(0, dtype=np.int32)
+            tfs = np.zeros(0, dtype=np.uint16)
+            term_ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        return cls(vocab, term_ptr, doc_ids, tfs, doc_len, tokenize, k1=k1, b=b)
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    def score_candidates(self, query: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return (doc ids, BM25 scores, number of distinct query terms matched)."""
+        tids = sorted({self.vocab[t] for t in self.tokenize(query or "") if t in self.vocab})
+        if not tids:
+            empty = np.zeros(0, dtype=np.int32)
+            return empty, np.zeros(0, dtype=np.float32), empty
+        docs, weights = [], []
+        for t in tids:
+            lo, hi = self.term_ptr[t], self.term_ptr[t + 1]
+            d = self.doc_ids[lo:hi]
+            tf = self.tfs[lo:hi].astype(np.float32)
+            docs.append(d)
+            weights.append(self.idf[t] * tf * (self.k1 + 1.0) / (tf + self._norm[d]))
+        docs = np.concatenate(docs)
+        weights = np.concatenate(weights)
+        uniq, inv = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inv, weights=weights).astype(np.float32)
+        matched = np.bincount(inv).astype(np.int32)
+        return uniq, scores, matched
+
+    def search(self, query: str, k: int = 5, min_match: int = 1, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Top-k (doc id, score) by BM25 over the whole corpus, or over the docs where
+        the boolean ``mask`` is set."""
+        docs, scores, matched = self.score_candidates(query)
+        if len(docs) and (min_match > 1 or mask is not None):
+            keep = matched >= min_match
+            if mask is not None:
+                keep &= mask[docs]
+            docs, scores = docs[keep], scores[keep]
+        return top_k(docs, scores, k)
+
+
+def phrase_search(index: BM25Index, query: str, text_of: Callable[[int], str], k: int = 5, min_match: int = 1,
+                  phrase_bonus: float = 0.0, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+    """Top-k (doc id, score) by BM25 plus ``phrase_bonus`` for docs whose text contains the
+    query's tokens as a phrase. A doc qualifies with ``min_match`` distinct query terms or a
+    phrase match; ``text_of(doc_id)`` returns the raw text."""
+    q_tokens = index.tokenize(query or "")
+    phrase = " ".join(q_tokens)
+    n_terms = len(set(q_tokens))
+    docs, scores, matched = index.score_candidates(query)
+    keep = matched >= min(min_match, n_terms)
+    if mask is not None:
+        keep &= mask[docs]
+    docs, scores, matched = docs[keep], scores[keep], matched[keep]
+    has_phrase = np.zeros(len(docs), dtype=bool)
+    if phrase:
+        # Only docs holding every query term can contain the phrase, so the postings
+        # narrow the substring check without truncating by BM25 rank first.
+        for i in np.flatnonzero(matched >= n_terms):
+            has_phrase[i] = phrase in text_of(int(docs[i])).lower()
+    ok = (matched >= min_match) | has_phrase
+    return top_k(docs[ok], scores[ok] + np.float32(phrase_bonus) * has_phrase[ok], k)
+
+
+def top_k(docs: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+    if k <= 0 or not len(docs):
+        return []
+    if len(docs) > k:
+        part = np.argpartition(-scores, k - 1)[:k]
+        docs, scores = docs[part], scores[part]
+    order = np.lexsort((docs, -scores))  # score desc, doc id asc for ties
+    return [(int(docs[i]), float(scores[i])) for i in order]
+
@@ -0,0 +1,199 @@
+from typing import Any, Callable, Dict, List, Optional
+from collections import OrderedDict
+from dataclasses import dataclass
+import os
+import threading
+import time
+
+try:
+    from sentence_transformers import CrossEncoder, SentenceTransformer  # type: ignore
+except Exception:  # pragma: no cover
+    CrossEncoder = SentenceTransformer = None  # type: ignore
+
+from .logger import get_logger
+
+# Process-wide limits. Every Streamlit session in this process shares the loaded
+# models, so these bound total resident weights rather than per-session usage.
+MODEL_REGISTRY_MAX_MODELS = int(os.getenv("MODEL_REGISTRY_MAX_MODELS", "3"))
+MODEL_REGISTRY_MAX_MB = float(os.getenv("MODEL_REGISTRY_MAX_MB", "2048"))
+MODEL_REGISTRY_IDLE_TTL_S = float(os.getenv("MODEL_REGISTRY_IDLE_TTL_S", "0"))  # 0 disables idle eviction
+
+logger = get_logger(__name__)
+
+
+def _load_sentence_transformer(name: str):
+    if SentenceTransformer is None:
+        raise RuntimeError("Install sentence-transformers for local embeddings.")
+    return SentenceTransformer(name)
+
+
+def _load_cross_encoder(name: str):
+    if CrossEncoder is None:
+        raise RuntimeError("Install sentence-transformers for cross-encoder re-ranking.")
+    return CrossEncoder(name, device="cpu")
+
+
+LOADERS: Dict[str, Callable[[str], Any]] = {
+    "sentence-transformer": _load_sentence_transformer,
+    "cross-encoder": _load_cross_encoder,
+}
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return None
+
+
+def model_nbytes(model: Any) -> Optional[int]:
+    """Size of a torch-backed model's parameters and buffers, if it exposes them."""
+    try:
+        total = sum(p.numel() * p.element_size() for p in model.parameters())
+        total += sum(b.numel() * b.element_size() for b in model.buffers())
+        return int(total)
+    except Exception:
+        return None
+
+
+@dataclass
+class ModelEntry:
+    key: str
+    name: str
+    kind: str
+    model: Any
+    load_time_s: float
+    nbytes: int
+    loaded_at: float
+    last_used: float
+    hits: int = 0
+
+
+class ModelRegistry:
+    """Thread-safe, process-level cache of loaded models.
+
+    Each (kind, name) is loaded at most once, even when several sessions ask for it
+    concurrently. Least recently used models are evicted when the count or memory
+    budget is exceeded, or when they sit idle longer than ``idle_ttl_s``.
+    """
+
+    def __init__(self, max_models: int = MODEL_REGISTRY_MAX_MODELS, max_mb: float = MODEL_REGISTRY_MAX_MB,
+                 idle_ttl_s: float = MODEL_REGISTRY_IDLE_TTL_S, loaders: Optional[Dict[str, Callable[[str], Any]]] = None):
+        self.max_models = max_models
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.idle_ttl_s = idle_ttl_s
+        self.loaders = loaders if loaders is not None else LOADERS
+        self._entries: "OrderedDict[str, ModelEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def get(self, name: str, kind: str = "sentence-transformer") -> Any:
+        key = f"{kind}:{name}"
+        with self._lock:
+            self._evict_idle()
+            entry = self._entries.get(key)
+            if entry is not None:
+                return self._touch(entry)
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        # Load outside the registry lock so other models stay available meanwhile.
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    return self._touch(entry)
+            loader = self.loaders.get(kind)
+            if loader is None:
+                raise ValueError(f"Unknown model kind: {kind}")
+            rss0 = _rss_bytes()
+            t0 = time.perf_counter()
+            model = loader(name)
+            load_time = time.perf_counter() - t0
+            nbytes = model_nbytes(model)
+            if nbytes is None:
+                rss1 = _rss_bytes()
+                nbytes = max(0, rss1 - rss0) if rss0 is not None and rss1 is not None else 0
+            now = time.time()
+            entry = ModelEntry(key=key, name=name, kind=kind, model=model, load_time_s=load_time,
+                               nbytes=nbytes, loaded_at=now, last_used=now, hits=1)
+            logger.info(f"Loaded {key} in {load_time:.2f}s ({nbytes / 1e6:.1f} MB)")
+            with self._lock:
+                self._entries[key] = entry
+                self._evict_over_budget(keep=key)
+            return model
+
+    def _touch(self, entry: ModelEntry) -> Any:
+        entry.last_used = time.time()
+        entry.hits += 1
+        self._entries.move_to_end(entry.key)
+        return entry.model
+
+    def _evict_idle(self):
+        if self.idle_ttl_s <= 0:
+            return
+        cutoff = time.time() - self.idle_ttl_s
+        for key in [k for k, e in self._entries.items() if e.last_used < cutoff]:
+            self._drop(key, "idle")
+
+    def _evict_over_budget(self, keep: str):
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_models or self.total_bytes() > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._drop(oldest, "lru")
+
+    def _drop(self, key: str, reason: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            logger.info(f"Evicted {key} ({reason})")
+
+    def total_bytes(self) -> int:
+        return sum(e.nbytes for e in self._entries.values())
+
+    def evict(self, name: str, kind: str = "sentence-transformer") -> bool:
+        with self._lock:
+            key = f"{kind}:{name}"
+            present = key in self._entries
+            self._drop(key, "manual")
+            return present
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> List[dict]:
+        with self._lock:
+            return [
+                {
+                    "model": e.name,
+                    "kind": e.kind,
+                    "load_time_s": round(e.load_time_s, 3),
+                    "resident_mb": round(e.nbytes / 1e6, 1),
+                    "hits": e.hits,
+                    "idle_s": round(time.time() - e.last_used, 1),
+                }
+                for e in reversed(self._entries.values())
+            ]
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
+
+
+def get_sentence_transformer(name: str):
+    return get_registry().get(name, kind="sentence-transformer")
+
+
+def get_cross_encoder(name: str):
+    return get_registry().get(name, kind="cross-encoder")
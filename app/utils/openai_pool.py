@@ -0,0 +1,142 @@
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import hashlib
+import os
+import threading
+
+try:
+    import httpx  # type: ignore
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI  # type: ignore
+except Exception:  # pragma: no cover
+    httpx = None  # type: ignore
+    OpenAI = AsyncOpenAI = DefaultHttpxClient = DefaultAsyncHttpxClient = None  # type: ignore
+
+from .logger import get_logger
+
+# Shared OpenAI clients, one per (API key, base URL, retry policy). Each wraps an httpx
+# connection pool with keep-alive, so consecutive requests reuse TCP/TLS connections
+# instead of paying a new handshake per question.
+OPENAI_TIMEOUT_S = float(os.getenv("OPENAI_TIMEOUT_S", "60"))
+OPENAI_CONNECT_TIMEOUT_S = float(os.getenv("OPENAI_CONNECT_TIMEOUT_S", "5"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "32"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "16"))
+OPENAI_KEEPALIVE_EXPIRY_S = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_S", "60"))
+OPENAI_POOL_MAX_CLIENTS = int(os.getenv("OPENAI_POOL_MAX_CLIENTS", "16"))
+
+logger = get_logger(__name__)
+
+
+def _timeout(total: Optional[float] = None):
+    return httpx.Timeout(total or OPENAI_TIMEOUT_S, connect=OPENAI_CONNECT_TIMEOUT_S)
+
+
+def _limits():
+    return httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_S)
+
+
+def _key_id(api_key: str) -> str:
+    # Pool keys and stats never hold the raw API key.
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+class OpenAIClientPool:
+    """LRU of shared sync clients and per-event-loop async clients.
+
+    Sync clients are thread-safe and shared by every session in the process. An
+    ``AsyncOpenAI`` client's connections belong to the event loop that opened them,
+    so async clients are additionally keyed by loop and dropped once it closes.
+    """
+
+    def __init__(self, max_clients: int = OPENAI_POOL_MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._sync: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._async: "OrderedDict[Tuple, Tuple[Any, asyncio.AbstractEventLoop]]" = OrderedDict()
+        self.created = 0
+
+    def get(self, api_key: str, base_url: Optional[str] = None, max_retries: int = 2):
+        if OpenAI is None:
+            raise RuntimeError("Install openai package.")
+        key = (_key_id(api_key), base_url, max_retries)
+        with self._lock:
+            client = self._sync.get(key)
+            if client is not None:
+                self._sync.move_to_end(key)
+                return client
+            client = OpenAI(
+                api_key=api_key, base_url=base_url, max_retries=max_retries, timeout=_timeout(),
+                http_client=DefaultHttpxClient(limits=_limits(), timeout=_timeout()),
+            )
+            self._sync[key] = client
+            self.created += 1
+            self._evict(self._sync)
+        logger.info(f"OpenAI client created (key {key[0]}, base_url={base_url or 'default'})")
+        return client
+
+    def get_async(self, api_key: str, base_url: Optional[str] = None, max_retries: int = 2):
+        """Shared ``AsyncOpenAI`` client for the running event loop (call from a coroutine)."""
+        if AsyncOpenAI is None:
+            raise RuntimeError("Install openai package.")
+        loop = asyncio.get_running_loop()
+        key = (_key_id(api_key), base_url, max_retries, id(loop))
+        with self._lock:
+            for k in [k for k, (_, lp) in self._async.items() if lp.is_closed()]:
+                del self._async[k]
+            entry = self._async.get(key)
+            if entry is not None and entry[1] is loop:
+                self._async.move_to_end(key)
+                return entry[0]
+            client = AsyncOpenAI(
+                api_key=api_key, base_url=base_url, max_retries=max_retries, timeout=_timeout(),
+                http_client=DefaultAsyncHttpxClient(limits=_limits(), timeout=_timeout()),
+            )
+            self._async[key] = (client, loop)
+            self.created += 1
+            while len(self._async) > self.max_clients:
+                self._async.popitem(last=False)  # closed by GC; cannot await here
+        return client
+
+    def _evict(self, clients: "OrderedDict"):
+        while len(clients) > self.max_clients:
+            _, old = clients.popitem(last=False)
+            try:
+                old.close()
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        return {"sync_clients": len(self._sync), "async_clients": len(self._async), "created": self.created}
+
+    def close(self):
+        with self._lock:
+            for client in self._sync.values():
+                try:
+                    client.close()
+                except Exception:
+                    pass
+            self._sync.clear()
+            self._async.clear()
+
+
+_pool: Optional[OpenAIClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> OpenAIClientPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = OpenAIClientPool()
+    return _pool
+
+
+def get_openai_client(api_key: str, base_url: Optional[str] = None, max_retries: int = 2):
+    return get_client_pool().get(api_key, base_url=base_url, max_retries=max_retries)
+
+
+def get_async_openai_client(api_key: str, base_url: Optional[str] = None, max_retries: int = 2):
+    return get_client_pool().get_async(api_key, base_url=base_url, max_retries=max_retries)
+
@@ -1,23 +1,162 @@
-from typing import List
+from typing import List, Optional, Sequence, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from io import BytesIO
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
 
 try:
     from pypdf import PdfReader
 except Exception:  # pragma: no cover
     PdfReader = None  # type: ignore
 
+try:
+    import pdfplumber  # type: ignore
+except Exception:  # pragma: no cover
+    pdfplumber = None  # type: ignore
 
-def load_pdfs(uploaded_files) -> List[str]:
-    texts: List[str] = []
-    for f in uploaded_files:
-        if PdfReader is None:
-            texts.append(f"[PDF placeholder content for {getattr(f, 'name', 'uploaded')}]")
-            continue
-        reader = PdfReader(f)
-        content = []
-        for page in reader.pages:
+from .logger import get_logger
+
+# Pages are extracted in page ranges fanned out over a process pool (text extraction
+# is CPU-bound pure Python, so threads would serialize on the GIL).
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class PdfExtraction:
+    name: str
+    pages: List[str] = field(default_factory=list)
+    seconds: float = 0.0  # extraction work for this file, summed over its page ranges
+    error: Optional[str] = None
+
+    @property
+    def pages_per_s(self) -> float:
+        return len(self.pages) / self.seconds if self.seconds > 0 else 0.0
+
+    def text(self) -> str:
+        return "\n".join(self.pages).strip()
+
+
+def _open(src: Union[bytes, str], engine: str):
+    """Open a PDF from bytes or from a file path (what pool workers receive)."""
+    fp = BytesIO(src) if isinstance(src, bytes) else src
+    if engine == "pdfplumber":
+        return pdfplumber.open(fp)
+    return PdfReader(fp)
+
+
+def _page_count(data: bytes, engine: str) -> int:
+    doc = _open(data, engine)
+    if engine == "pdfplumber":
+        with doc:
+            return len(doc.pages)
+    return len(doc.pages)
+
+
+def _extract_range(src: Union[bytes, str], start: int, end: int, engine: str) -> Tuple[List[str], float]:
+    """Extract pages [start, end) of one PDF; a page that fails yields ''. Runs in a worker."""
+    t0 = time.perf_counter()
+    doc = _open(src, engine)
+    out = []
+    try:
+        for i in range(start, end):
             try:
-                content.append(page.extract_text() or "")
+                out.append(doc.pages[i].extract_text() or "")
             except Exception:
-                continue
-        texts.append("\n".join(content).strip())
-    return texts
+                out.append("")
+    finally:
+        if engine == "pdfplumber":
+            doc.close()
+    return out, time.perf_counter() - t0
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: Streamlit runs many threads, and forking a threaded process is unsafe.
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+
+
+def extract_pdfs(files: Sequence[Tuple[str, bytes]], engine: str = "pypdf", workers: Optional[int] = None,
+                 pages_per_task: Optional[int] = None) -> List[PdfExtraction]:
+    """Extract page texts for ``files`` given as (name, bytes) pairs.
+
+    Page ranges of every file are extracted concurrently on a process pool of
+    ``workers`` processes; results come back in file and page order. With one worker
+    (or a single range in total) extraction runs in-process.
+    """
+    if (pdfplumber if engine == "pdfplumber" else PdfReader) is None:
+        raise RuntimeError(f"Install {engine} for PDF extraction.")
+    workers = PDF_WORKERS if workers is None else max(1, int(workers))
+    step = max(1, int(pages_per_task or PDF_PAGES_PER_TASK))
+    results = [PdfExtraction(name=name) for name, _ in files]
+    tasks = []  # (file index, start, end)
+    for fi, (name, data) in enumerate(files):
+        try:
+            n = _page_count(data, engine)
+        except Exception as e:
+            results[fi].error = str(e)
+            logger.warning(f"Could not open {name}: {e}")
+            continue
+        results[fi].pages = [""] * n
+        tasks.extend((fi, lo, min(n, lo + step)) for lo in range(0, n, step))
+
+    t0 = time.perf_counter()
+    done = None
+    if workers > 1 and len(tasks) > 1:
+        # Workers get a temp-file path rather than the bytes, so a file is not
+        # pickled once per page range.
+        with tempfile.TemporaryDirectory(prefix="pdf-extract-") as tmp:
+            paths = {}
+            for fi in sorted({t[0] for t in tasks}):
+                paths[fi] = os.path.join(tmp, f"{fi}.pdf")
+                with open(paths[fi], "wb") as f:
+                    f.write(files[fi][1])
+            try:
+                pool = _get_pool(workers)
+                futures = [pool.submit(_extract_range, paths[fi], lo, hi, engine) for fi, lo, hi in tasks]
+                done = [f.result() for f in futures]
+            except BrokenProcessPool as e:
+                logger.warning(f"PDF worker pool failed ({e}); extracting in-process")
+                _reset_pool()
+    if done is None:
+        done = [_extract_range(files[fi][1], lo, hi, engine) for fi, lo, hi in tasks]
+    for (fi, lo, hi), (texts, secs) in zip(tasks, done):
+        results[fi].pages[lo:hi] = texts
+        results[fi].seconds += secs
+    wall = time.perf_counter() - t0
+    total = sum(len(r.pages) for r in results)
+    logger.info(f"Extracted {total} pages from {len(files)} file(s) in {wall:.2f}s with {workers} worker(s)")
+    return results
+
+
+def load_pdfs(uploaded_files) -> List[str]:
+    if PdfReader is None:
+        return [f"[PDF placeholder content for {getattr(f, 'name', 'uploaded')}]" for f in uploaded_files]
+    files = [(getattr(f, "name", "uploaded"), f.read()) for f in uploaded_files]
+    return [r.text() for r in extract_pdfs(files)]
@@ -0,0 +1,126 @@
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+import os
+import threading
+import time
+
+import numpy as np
+
+from .embedding_cache import normalize_text
+
+# In-memory LRU of query embeddings shared by every session in the process. Retrieval
+# testers and chat turns re-ask the same questions, and encoding a query (a model
+# forward pass or an OpenAI round trip) costs far more than the search that follows.
+# Queries are only whitespace-normalized: case can change the vector for cased models.
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "4096"))  # 0 disables the cache
+
+
+@dataclass
+class QueryCacheStats:
+    hits: int = 0
+    misses: int = 0
+    encode_s: float = 0.0  # time spent encoding misses
+    saved_s: float = 0.0   # encode time the hits would have cost
+
+    def add(self, other: "QueryCacheStats"):
+        self.hits += other.hits
+        self.misses += other.misses
+        self.encode_s += other.encode_s
+        self.saved_s += other.saved_s
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> dict:
+        d = asdict(self)
+        d["encode_s"] = round(self.encode_s, 4)
+        d["saved_s"] = round(self.saved_s, 4)
+        d["hit_ratio"] = round(self.hit_ratio, 3)
+        return d
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU of (model, normalized query) -> (vector, encode seconds)."""
+
+    def __init__(self, max_entries: int = QUERY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[np.ndarray, float]]" = OrderedDict()
+        self.stats = QueryCacheStats()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def encode(self, model: str, queries: Sequence[str],
+               encode_fn: Callable[[List[str]], Any]) -> Tuple[List[Optional[np.ndarray]], QueryCacheStats]:
+        """Vectors for ``queries``, calling ``encode_fn`` once on the distinct misses.
+
+        ``encode_fn`` returns one vector per input (an array row, or None when that
+        query could not be embedded; failures are not cached). ``model`` must change
+        whenever the vectors would.
+        """
+        stats = QueryCacheStats()
+        keys = [(model, normalize_text(q)) for q in queries]
+        out: List[Optional[np.ndarray]] = [None] * len(queries)
+        missing = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is None:
+                    missing.setdefault(key, []).append(i)
+                    continue
+                self._entries.move_to_end(key)
+                out[i] = entry[0]
+                stats.hits += 1
+                stats.saved_s += entry[1]
+        if missing:
+            miss_keys = list(missing)
+            t0 = time.perf_counter()
+            vecs = encode_fn([queries[missing[k][0]] for k in miss_keys])
+            stats.encode_s = time.perf_counter() - t0
+            each_s = stats.encode_s / len(miss_keys)
+            with self._lock:
+                for key, vec in zip(miss_keys, vecs):
+                    if vec is None:
+                        continue
+                    vec = np.asarray(vec, dtype=np.float32)
+                    vec.flags.writeable = False  # shared between sessions and callers
+                    for i in missing[key]:
+                        out[i] = vec
+                    if self.max_entries > 0:
+                        self._entries[key] = (vec, each_s)
+                        self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            # Repeats of a miss within the same call were served by its single encode.
+            stats.misses = len(miss_keys)
+            stats.hits += sum(len(ix) - 1 for ix in missing.values())
+            stats.saved_s += each_s * sum(len(ix) - 1 for ix in missing.values())
+        with self._lock:
+            self.stats.add(stats)
+        return out, stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats_dict(self) -> dict:
+        d = self.stats.as_dict()
+        d["entries"] = len(self._entries)
+        return d
+
+
+_cache: Optional[QueryEmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QueryEmbeddingCache()
+    return _cache
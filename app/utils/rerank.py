@@ -0,0 +1,97 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from dataclasses import dataclass
+import os
+import time
+
+from .model_registry import get_cross_encoder
+
+# Optional second stage: over-fetch RERANK_CANDIDATES chunks from the index, score
+# (query, chunk) pairs with a local cross-encoder in CPU batches, keep the best few.
+# Scoring stops before a batch that would overrun the per-query budget, the first batch
+# included (predicted from the model's last measured batch time); unscored candidates
+# keep their retrieval order behind the scored ones.
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_KEEP = int(os.getenv("RERANK_KEEP", "3"))
+RERANK_BATCH = int(os.getenv("RERANK_BATCH", "8"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "250"))  # 0 disables the budget
+
+ScoreFn = Callable[[List[Tuple[str, str]]], Sequence[float]]
+
+# Last measured seconds per batch, by the score function's ``cost_key`` (the model name).
+_batch_cost_s: Dict[str, float] = {}
+
+
+@dataclass
+class RerankResult:
+    order: List[int]               # candidate indices, best first, at most top_k
+    scores: List[Optional[float]]  # cross-encoder score per kept candidate (None if unscored)
+    candidates: int
+    scored: int
+    elapsed_s: float
+    truncated: bool
+
+    def as_dict(self) -> dict:
+        return {
+            "candidates": self.candidates,
+            "scored": self.scored,
+            "kept": len(self.order),
+            "rerank_ms": round(self.elapsed_s * 1000, 2),
+            "truncated": self.truncated,
+        }
+
+
+def rerank(query: str, texts: Sequence[str], top_k: int, score_fn: ScoreFn, batch_size: int = RERANK_BATCH,
+           budget_ms: float = RERANK_BUDGET_MS) -> RerankResult:
+    """Reorder ``texts`` (in retrieval order) by ``score_fn`` and keep ``top_k``.
+
+    A batch only starts if it is predicted to finish within ``budget_ms``: from the
+    average batch time so far, or for the first batch from the last query scored with
+    the same ``score_fn.cost_key``. Without a measurement the first batch runs. A query
+    stopped before its first batch halves the remembered time, so one slow (cold)
+    batch does not switch reranking off for good.
+    """
+    n = len(texts)
+    batch_size = max(1, batch_size)
+    key = getattr(score_fn, "cost_key", None)
+    t0 = time.perf_counter()
+    scores: List[float] = []
+    truncated = False
+    for lo in range(0, n, batch_size):
+        if budget_ms > 0:
+            elapsed = time.perf_counter() - t0
+            per_batch = elapsed / (lo // batch_size) if lo else _batch_cost_s.get(key)
+            if per_batch is not None and (elapsed + per_batch) * 1000 > budget_ms:
+                truncated = True
+                if not lo:
+                    _batch_cost_s[key] = per_batch / 2
+                break
+        part = texts[lo:lo + batch_size]
+        scores.extend(float(s) for s in score_fn([(query, t) for t in part]))
+    if scores and key is not None:
+        _batch_cost_s[key] = (time.perf_counter() - t0) / -(-len(scores) // batch_size)
+    scored = sorted(range(len(scores)), key=lambda i: -scores[i])  # stable: ties keep retrieval order
+    order = (scored + list(range(len(scores), n)))[:max(0, top_k)]
+    return RerankResult(
+        order=order,
+        scores=[scores[i] if i < len(scores) else None for i in order],
+        candidates=n,
+        scored=len(scores),
+        elapsed_s=time.perf_counter() - t0,
+        truncated=truncated,
+    )
+
+
+def cross_encoder_scorer(model_name: str = RERANK_MODEL) -> ScoreFn:
+    """Score function backed by the shared (registry-cached) cross-encoder."""
+    model = get_cross_encoder(model_name)
+
+    def score(pairs: List[Tuple[str, str]]) -> Sequence[float]:
+        return model.predict(pairs, batch_size=len(pairs), show_progress_bar=False, convert_to_numpy=True)
+    score.cost_key = model_name  # type: ignore[attr-defined]
+    return score
+
+
+def approx_tokens(texts: Sequence[str]) -> int:
+    """Rough prompt-token count (~4 characters per token) for size comparisons."""
+    return sum(len(t) for t in texts) // 4
@@ -1,10 +1,14 @@
-from typing import List, Any, Tuple
+from typing import List, Any, Tuple, Dict
+import hashlib
 import os
+import time
 
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 import chromadb
 from chromadb.utils import embedding_functions
 
+from .chunking import split_documents
+from .model_registry import get_sentence_transformer
+
 
 DEFAULT_EMBEDDING_MODEL = os.getenv(
     "EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
@@ -14,10 +18,12 @@ COLLECTION_NAME = os.getenv("CHROMA_COLLECTION", "hr_policies")
 
 
 class ChromaRetriever:
-    def __init__(self, client: chromadb.ClientAPI, collection: chromadb.Collection, top_k: int = 5):
+    def __init__(self, client: chromadb.ClientAPI, collection: chromadb.Collection, top_k: int = 5,
+                 build_stats: Dict[str, Any] | None = None):
         self.client = client
         self.collection = collection
         self.top_k = top_k
+        self.build_stats = build_stats or {}
 
     def query(self, q: str, k: int | None = None) -> List[str]:
         k = k or self.top_k
@@ -26,52 +32,92 @@ class ChromaRetriever:
         return docs
 
 
-def _get_splitter() -> RecursiveCharacterTextSplitter:
-    return RecursiveCharacterTextSplitter(
-        chunk_size=1200,
-        chunk_overlap=150,
-        separators=["\n\n", "\n", " ", ""],
-        add_start_index=False,
-    )
+class RegistryEmbeddingFunction(embedding_functions.EmbeddingFunction):
+    """Chroma embedding function backed by the process-wide model registry."""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def __call__(self, input):
+        model = get_sentence_transformer(self.model_name)
+        return model.encode(list(input), convert_to_numpy=True).tolist()
 
 
 def _get_embedding_fn(model: str | None = None):
     model_name = model or DEFAULT_EMBEDDING_MODEL
-    return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model_name)
+    return RegistryEmbeddingFunction(model_name)
 
 
 def _ensure_collection(client: chromadb.ClientAPI, name: str, embedding_fn) -> chromadb.Collection:
     try:
-        return client.get_collection(name)
+        return client.get_collection(name, embedding_function=embedding_fn)
     except Exception:
         return client.create_collection(name=name, embedding_function=embedding_fn)
 
 
-def build_retriever(docs: List[str], top_k: int = 5) -> Any:
-    splitter = _get_splitter()
-    chunks: List[str] = []
-    for doc in docs:
-        if not doc:
-            continue
-        pieces = splitter.split_text(doc)
-        chunks.extend([p for p in pieces if p and p.strip()])
-
-    os.makedirs(CHROMA_DIR, exist_ok=True)
-    client = chromadb.PersistentClient(path=CHROMA_DIR)
-    emb_fn = _get_embedding_fn()
-    collection = _ensure_collection(client, COLLECTION_NAME, emb_fn)
-
-    # Upsert chunks with deterministic IDs
-    if chunks:
-        ids = [f"chunk-{i}" for i in range(len(chunks))]
-        # Clean previous to avoid duplication in MVP flow
-        try:
-            collection.delete(where={})
-        except Exception:
-            pass
-        collection.add(ids=ids, documents=chunks)
-
-    return ChromaRetriever(client, collection, top_k=top_k)
+def model_collection_name(name: str, model: str) -> str:
+    """Collection for ``name`` embedded with ``model``. Chunk IDs only hash the text, so
+    vectors from different models must not share a collection."""
+    return f"{name}-{hashlib.sha1(model.encode('utf-8')).hexdigest()[:10]}"
+
+
+def chunk_ids(chunks: List[str]) -> List[str]:
+    """Stable, content-derived IDs. Repeated identical chunks get an occurrence suffix."""
+    seen: Dict[str, int] = {}
+    ids: List[str] = []
+    for c in chunks:
+        h = hashlib.sha1(c.encode("utf-8")).hexdigest()[:24]
+        n = seen.get(h, 0)
+        seen[h] = n + 1
+        ids.append(f"c-{h}" if n == 0 else f"c-{h}-{n}")
+    return ids
+
+
+def _batched(items: List[Any], size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def sync_collection(client: chromadb.ClientAPI, collection: chromadb.Collection, chunks: List[str]) -> Dict[str, Any]:
+    """Make ``collection`` hold exactly ``chunks``, embedding only chunks it does not have yet."""
+    t0 = time.perf_counter()
+    ids = chunk_ids(chunks)
+    existing = set(collection.get(include=[]).get("ids") or [])
+    wanted = dict(zip(ids, chunks))
+    to_add = [i for i in ids if i not in existing]
+    to_remove = [i for i in existing if i not in wanted]
+    try:
+        batch_size = int(client.get_max_batch_size())
+    except Exception:
+        batch_size = 5000
+    for part in _batched(to_remove, batch_size):
+        collection.delete(ids=part)
+    for part in _batched(to_add, batch_size):
+        collection.add(ids=part, documents=[wanted[i] for i in part])
+    return {
+        "added": len(to_add),
+        "removed": len(to_remove),
+        "unchanged": len(ids) - len(to_add),
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+    }
+
+
+def build_retriever(docs: List[str], top_k: int = 5, client: chromadb.ClientAPI | None = None,
+                    embedding_fn=None, collection_name: str = COLLECTION_NAME) -> Any:
+    # Same chunker and settings (CHUNK_SIZE / CHUNK_OVERLAP / CHUNK_STRATEGY) as the FAISS pipelines.
+    chunks = split_documents(docs)
+
+    if client is None:
+        os.makedirs(CHROMA_DIR, exist_ok=True)
+        client = chromadb.PersistentClient(path=CHROMA_DIR)
+    emb_fn = embedding_fn or _get_embedding_fn()
+    model = getattr(emb_fn, "model_name", None) or type(emb_fn).__name__
+    collection = _ensure_collection(client, model_collection_name(collection_name, model), emb_fn)
+
+    # Incremental sync: unchanged chunks keep their IDs and stored embeddings.
+    stats = sync_collection(client, collection, chunks)
+
+    return ChromaRetriever(client, collection, top_k=top_k, build_stats=stats)
 
 
 def retrieve_chunks(retriever: Any, query: str, k: int = 5) -> List[str]:
@@ -1,9 +1,19 @@
 import streamlit as st
 import streamlit.components.v1 as components
 import json
+import time
 from typing import List
 import numpy as np
-from io import BytesIO
+from app.utils.model_registry import get_registry, get_sentence_transformer
+from app.utils.embedding_cache import embed_with_cache, get_embedding_cache
+from app.utils.index_utils import INDEX_KINDS, build_vector_index, index_kind, search_filtered
+from app.utils.lexical_index import BM25Index, phrase_search
+from app.utils.ingest_pipeline import IngestStats, pipeline as ingest_pipeline
+from app.utils.chunking import CHUNK_STRATEGIES, DEFAULT_CHUNK_STRATEGY, make_chunker, size_unit, strategy_label
+from app.utils.dedup import DEDUP_MODE, DEDUP_MODES, Deduplicator
+from app.utils.hybrid_utils import hybrid_search, reciprocal_rank_fusion, weighted_score_fusion
+from app.utils.query_cache import get_query_embedding_cache
+from app.utils.rerank import RERANK_CANDIDATES, RERANK_MODEL, approx_tokens, cross_encoder_scorer, rerank
 try:
     import faiss  # type: ignore
     HAS_FAISS = True
@@ -93,121 +103,222 @@ def render_chartjs(container_id: str, labels: List[str], datasets: List[dict], h
     components.html(html, height=height, scrolling=False)
 
 # ---- RAG helpers: parsing, chunking, embedding, indexing, retrieval ----
-def parse_pdfs(uploaded_files: List["UploadedFile"]) -> List[dict]:
-    """Return list of page dicts: {source, page, text}."""
-    out = []
-    if not HAS_PDF:
-        return out
-    for f in uploaded_files:
-        try:
-            reader = PdfReader(BytesIO(f.read()))
-            n_pages = len(reader.pages)
-            for i in range(n_pages):
-                try:
-                    text = reader.pages[i].extract_text() or ""
-                except Exception:
-                    text = ""
-                out.append({"source": f.name, "page": i + 1, "text": text})
-        except Exception:
-            continue
-    return out
-
-def chunk_text(text: str, chunk_size: int = 800, overlap: int = 120) -> List[str]:
-    chunks = []
-    if not text:
-        return chunks
-    start = 0
-    n = len(text)
-    while start < n:
-        end = min(n, start + chunk_size)
-        chunks.append(text[start:end])
-        if end == n:
-            break
-        start = max(end - overlap, start + 1)
-    return chunks
-
-def build_chunks(pages: List[dict], chunk_size: int, overlap: int) -> List[dict]:
+def ingest_pdfs(uploaded_files: List["UploadedFile"], chunk_size: int, overlap: int, strategy: str = DEFAULT_CHUNK_STRATEGY,
+                dedup_mode: str = DEDUP_MODE):
+    """Stream uploads through pages -> normalized text -> chunks -> dedup (bounded queues
+    between stages, pages extracted in parallel). Returns (chunk dicts, IngestStats,
+    DedupStats); every chunk keeps its source file and page. Empty/very short chunks are
+    dropped by the chunker, repeated boilerplate by the dedup stage."""
+    stats = IngestStats()
+    dedup = Deduplicator(dedup_mode)
     chunks = []
-    cid = 0
-    for p in pages:
-        segs = chunk_text(p.get("text", ""), chunk_size, overlap)
-        for seg in segs:
-            cid += 1
-            chunks.append({
-                "id": f"ch{cid}",
-                "text": seg.strip(),
-                "page": p.get("page", "-"),
-                "source": p.get("source", "uploaded")
-            })
-    return chunks
+    batches = ingest_pipeline(
+        ((f.name, f.read()) for f in uploaded_files),
+        chunker=make_chunker(chunk_size, overlap, strategy),
+        stats=stats,
+        dedup=dedup,
+    )
+    for batch in batches:
+        for c in batch:
+            chunks.append({"id": f"ch{len(chunks) + 1}", "text": c.text, "page": c.page or "-", "source": c.source})
+    return chunks, stats, dedup.stats
 
 def ensure_embedding_model(model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
     if not HAS_ST:
         return None
-    if "embedding_model" in st.session_state and st.session_state.get("embedding_model_name") == model_name:
-        return st.session_state.embedding_model
-    model = SentenceTransformer(model_name)
-    st.session_state.embedding_model = model
+    # Models are shared process-wide; the session only remembers which one it uses.
+    model = get_sentence_transformer(model_name)
     st.session_state.embedding_model_name = model_name
     return model
 
+def _encode_cached(texts: List[str], model_name: str) -> np.ndarray:
+    model = ensure_embedding_model(model_name)
+    if model is None:
+        return np.zeros((len(texts), 384), dtype=np.float32)
+    # Normalized vectors get their own cache namespace.
+    embs, stats = embed_with_cache(
+        texts, f"{model_name}#normalized",
+        lambda miss: model.encode(miss, show_progress_bar=False, convert_to_numpy=True, normalize_embeddings=True),
+        get_embedding_cache(),
+    )
+    st.session_state.emb_cache_stats = stats.as_dict()
+    return embs.astype(np.float32)
+
 def compute_embeddings(texts: List[str], model_name: str = "sentence-transformers/all-MiniLM-L6-v2") -> np.ndarray:
-    """Compute embeddings with retry + fallback to a smaller model if the first load fails."""
+    """Compute embeddings with retry + fallback to a smaller model if the first load fails.
+    Only texts missing from the on-disk embedding cache are encoded."""
     try:
-        model = ensure_embedding_model(model_name)
-        if model is None:
-            return np.zeros((len(texts), 384), dtype=np.float32)
-        embs = model.encode(texts, show_progress_bar=False, convert_to_numpy=True, normalize_embeddings=True)
-        return embs.astype(np.float32)
+        return _encode_cached(texts, model_name)
     except Exception:
         # Fallback to a smaller model
         fallback = "sentence-transformers/paraphrase-MiniLM-L3-v2"
-        model = ensure_embedding_model(fallback)
-        if model is None:
+        if not HAS_ST:
             raise
+        embs = _encode_cached(texts, fallback)
         st.session_state.embedding_model_name = fallback
-        embs = model.encode(texts, show_progress_bar=False, convert_to_numpy=True, normalize_embeddings=True)
-        return embs.astype(np.float32)
+        return embs
 
 def build_index(embs: np.ndarray):
     if embs is None or len(embs) == 0:
         return None
     if HAS_FAISS:
-        index = faiss.IndexFlatIP(embs.shape[1])
-        index.add(embs)
-        return index
+        # Embeddings are already normalized; index type is chosen by corpus size unless set in Step 4.
+        return build_vector_index(embs, kind=st.session_state.get("index_kind", "auto"))
     # fallback: store matrix for numpy cosine search
     return {"matrix": embs}
 
-def search_topk(query: str, k: int = 5):
-    """Return list of (score, chunk_dict). Uses FAISS if available, else token overlap."""
+# Candidates fetched from each retriever before hybrid fusion, as a multiple of k.
+HYBRID_FETCH_MULT = 4
+
+def _vector_search(query: str, k: int, chunks: List[dict], index, model, model_name: str, rows=None, vectors=None):
+    """((score, chunk) pairs, QueryCacheStats) from the vector index, restricted to ``rows``
+    when given. Safe to run off the script thread."""
+    # Normalized vectors: the cache namespace differs from the raw-vector one in app_steps.
+    vecs, qstats = get_query_embedding_cache().encode(
+        f"{model_name}|normalized", [query],
+        lambda miss: model.encode(miss, convert_to_numpy=True, normalize_embeddings=True),
+    )
+    q = vecs[0].reshape(1, -1)
+    if HAS_FAISS and isinstance(index, faiss.Index):
+        if rows is None:
+            D, I = index.search(q, k)
+        else:
+            D, I, _strategy = search_filtered(index, q, k, rows, vectors=vectors)
+        pairs = []
+        for score, idx_i in zip(D[0].tolist(), I[0].tolist()):
+            if idx_i == -1:
+                continue
+            pairs.append((float(score), chunks[idx_i]))
+        return pairs, qstats
+    M = index.get("matrix")
+    cand = np.arange(len(M)) if rows is None else rows
+    sims = (q @ M[cand].T)[0]
+    order = np.argsort(-sims)[:k]
+    return [(float(sims[i]), chunks[int(cand[i])]) for i in order], qstats
+
+def _fuse(vector_pairs, lexical_pairs, k: int):
+    """Fuse two (score, chunk) lists by chunk identity using the session's fusion method."""
+    by_key = {id(ch): ch for _s, ch in list(vector_pairs) + list(lexical_pairs)}
+    w_vec = float(st.session_state.get("hybrid_vector_weight", 0.5))
+    weights = [w_vec, 1.0 - w_vec]
+    if st.session_state.get("fusion_method", "rrf") == "weighted":
+        fused = weighted_score_fusion(
+            [[(id(ch), sc) for sc, ch in vector_pairs], [(id(ch), sc) for sc, ch in lexical_pairs]], weights=weights
+        )
+    else:
+        fused = reciprocal_rank_fusion(
+            [[id(ch) for _s, ch in vector_pairs], [id(ch) for _s, ch in lexical_pairs]], weights=[2 * w for w in weights]
+        )
+    return [(score, by_key[key]) for key, score in fused[:k]]
+
+def format_rerank_timing(r: dict) -> str:
+    if r.get("error"):
+        return f"Re-ranking skipped: {r['error']}"
+    return (f"Re-ranked {r['scored']}/{r['candidates']} candidates in {r['rerank_ms']} ms"
+            f"{' (budget reached)' if r['truncated'] else ''} · context ≈ {r['tokens_before']} → {r['tokens_after']} tokens")
+
+def search_mask(filters: dict = None):
+    """Boolean row bitmap over st.session_state.chunks for {"sources": [...], "pages":
+    (first, last)}, or None when nothing is filtered out. Columns are built once per chunk set."""
+    if not filters or (not filters.get("sources") and filters.get("pages") is None):
+        return None
+    chunks = st.session_state.get("chunks", [])
+    cols = st.session_state.get("chunk_columns")
+    if cols is None or cols[0] is not chunks:
+        sources = np.array([c.get("source", "") for c in chunks], dtype=object)
+        pages = np.array([c["page"] if isinstance(c.get("page"), int) else -1 for c in chunks], dtype=np.int32)
+        cols = (chunks, sources, pages)
+        st.session_state.chunk_columns = cols
+    _, sources, pages = cols
+    mask = np.ones(len(chunks), dtype=bool)
+    if filters.get("sources"):
+        mask &= np.isin(sources, list(filters["sources"]))
+    if filters.get("pages") is not None:
+        first, last = filters["pages"]
+        mask &= (pages >= first) & (pages <= last)
+    return None if mask.all() else mask
+
+def search_scope(key: str):
+    """Filters selected in the scope widget ``key`` (also readable from callbacks)."""
+    chosen = st.session_state.get(key)
+    return {"sources": list(chosen)} if chosen else None
+
+def render_search_filter(key: str):
+    """Document scope widget for the retrieval test and the chat; returns filters or None."""
+    names = sorted({c.get("source", "") for c in st.session_state.get("chunks", []) if c.get("source")})
+    if len(names) < 2:
+        return None
+    st.multiselect("Limit to documents", names, default=[], key=key,
+                   help="Only these documents are searched (all when empty).")
+    return search_scope(key)
+
+def search_topk(query: str, k: int = 5, filters: dict = None):
+    """Return list of (score, chunk_dict).
+    Backends: 'vector' (FAISS, lexical fallback), 'lexical' (BM25) or 'hybrid' (both, run
+    concurrently and fused), optionally followed by cross-encoder re-ranking of an
+    over-fetched candidate list. ``filters`` (see search_mask) restricts candidates before
+    scoring. Per-stage latency is left in st.session_state.last_retrieval_timings."""
     chunks = st.session_state.get("chunks", [])
     if not chunks:
         return []
-    # Force lexical if user selected it
-    if st.session_state.get("retrieval_backend") == "lexical":
-        return retrieve_in_memory_with_scores(query, top_k=k)
-    # Prefer vector search if we have embeddings and index
-    if st.session_state.get("embeddings") is not None and st.session_state.get("index") is not None and HAS_ST:
-        model = ensure_embedding_model(st.session_state.get("embedding_model_name", "sentence-transformers/all-MiniLM-L6-v2"))
-        q = model.encode([query], convert_to_numpy=True, normalize_embeddings=True).astype(np.float32)
+    t0 = time.perf_counter()
+    mask = search_mask(filters)
+    rows = None if mask is None else np.flatnonzero(mask)
+    keep = k
+    if st.session_state.get("rerank_enabled"):
+        k = max(k, RERANK_CANDIDATES)
+    backend = st.session_state.get("retrieval_backend")
+    vector_ready = st.session_state.get("embeddings") is not None and st.session_state.get("index") is not None and HAS_ST
+    timings = {"backend": backend}
+    if rows is not None:
+        timings["filtered_rows"] = f"{len(rows)}/{len(chunks)}"
+    qstats = None
+    if backend == "hybrid" and vector_ready:
+        # Resolve session state here; the stages run on pool threads.
+        model_name = st.session_state.get("embedding_model_name", "sentence-transformers/all-MiniLM-L6-v2")
+        model = ensure_embedding_model(model_name)
         idx = st.session_state["index"]
-        if HAS_FAISS and isinstance(idx, faiss.Index):
-            D, I = idx.search(q, k)
-            pairs = []
-            for score, idx_i in zip(D[0].tolist(), I[0].tolist()):
-                if idx_i == -1:
-                    continue
-                ch = chunks[idx_i]
-                pairs.append((float(score), ch))
-            return pairs
-        else:
-            M = st.session_state["index"].get("matrix")
-            sims = (q @ M.T)[0]
-            order = np.argsort(-sims)[:k]
-            return [(float(sims[i]), chunks[i]) for i in order]
-    # fallback: lexical overlap scoring
-    return retrieve_in_memory_with_scores(query, top_k=k)
+        embs = st.session_state["embeddings"]
+        bm25 = get_bm25_index()
+        fetch = k * HYBRID_FETCH_MULT
+        # A failed stage (e.g. the query encoder) leaves the other retriever to answer alone.
+        pairs, qstats, stage_ms = hybrid_search(
+            lambda: _vector_search(query, fetch, chunks, idx, model, model_name, rows=rows, vectors=embs),
+            lambda: retrieve_in_memory_with_scores(query, top_k=fetch, chunks=chunks, bm25=bm25, mask=mask),
+            _fuse, k,
+        )
+        timings.update(stage_ms)
+    elif backend != "lexical" and vector_ready:
+        model_name = st.session_state.get("embedding_model_name", "sentence-transformers/all-MiniLM-L6-v2")
+        model = ensure_embedding_model(model_name)
+        pairs, qstats = _vector_search(query, k, chunks, st.session_state["index"], model, model_name,
+                                       rows=rows, vectors=st.session_state["embeddings"])
+        timings["vector_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    else:
+        # Forced lexical, or fallback when vectors are unavailable
+        pairs = retrieve_in_memory_with_scores(query, top_k=k, mask=mask)
+        timings["lexical_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    if qstats is not None:
+        timings["query_encode_ms"] = round(qstats.encode_s * 1000, 2)
+        timings["query_cache"] = "hit" if qstats.hits else "miss"
+    if st.session_state.get("rerank_enabled") and pairs:
+        try:
+            texts = [ch.get("text", "") for _s, ch in pairs]
+            res = rerank(query, texts, keep, cross_encoder_scorer(RERANK_MODEL))
+            timings["rerank_ms"] = round(res.elapsed_s * 1000, 2)
+            timings["rerank"] = {**res.as_dict(), "tokens_before": approx_tokens(texts[:keep]),
+                                 "tokens_after": approx_tokens([texts[i] for i in res.order])}
+            # Re-ranked pairs carry the cross-encoder score; unscored ones keep their retrieval score.
+            pairs = [(pairs[i][0] if sc is None else sc, pairs[i][1]) for i, sc in zip(res.order, res.scores)]
+        except Exception as e:
+            timings["rerank"] = {"error": str(e)}
+            pairs = pairs[:keep]
+    else:
+        pairs = pairs[:keep]
+    timings["total_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    st.session_state.last_retrieval_timings = timings
+    return pairs
+
 STOPWORDS = set("""
 the a an and or but if while is are was were be been being to of in on for with as by from at this that these those into over under within without about up down out off then than so such it its their your our my we you he she they them i me his her theirs ours yours my
 """.split())
@@ -215,50 +326,41 @@ the a an and or but if while is are was were be been being to of in on for with
 def _tokenize(text: str) -> List[str]:
     return [t for t in ''.join([c.lower() if c.isalnum() else ' ' for c in text]).split() if t and t not in STOPWORDS]
 
-# Minimum score to consider a hit relevant (tune as needed)
+# Minimum number of distinct query terms a chunk must contain to count as a hit
+# (an exact phrase match also qualifies).
 MIN_SCORE = 3
+PHRASE_BONUS = 6.0
 
-def retrieve_in_memory(query: str, top_k: int = 3):
-    """Naive in-memory retrieval over st.session_state['chunks'].
-    Expects st.session_state.chunks = List[dict(text=..., id=...)]
-    """
-    chunks = st.session_state.get("chunks", [])
-    if not chunks:
-        return []
-    q_tokens = _tokenize(query)
-    q_phrase = ' '.join(q_tokens)
-    scored = []
-    for c in chunks:
-        text = c.get("text") or ""
-        t_tokens = _tokenize(text)
-        token_overlap = len(set(q_tokens) & set(t_tokens))
-        phrase_bonus = 6 if q_phrase and q_phrase in text.lower() else 0
-        score = token_overlap + phrase_bonus
-        scored.append((score, c))
-    # filter low scores
-    scored = [pair for pair in scored if pair[0] >= MIN_SCORE]
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [c for _s, c in scored[:top_k]]
-
-# Variant that returns (score, chunk) for debugging/UI
-def retrieve_in_memory_with_scores(query: str, top_k: int = 3):
+def get_bm25_index() -> BM25Index:
+    """BM25 index over st.session_state.chunks, built once per chunk set."""
     chunks = st.session_state.get("chunks", [])
+    idx = st.session_state.get("bm25")
+    if idx is None or st.session_state.get("bm25_source") is not chunks or len(idx) != len(chunks):
+        idx = BM25Index.build([c.get("text") or "" for c in chunks], _tokenize)
+        st.session_state.bm25 = idx
+        st.session_state.bm25_source = chunks
+    return idx
+
+def retrieve_in_memory_with_scores(query: str, top_k: int = 3, chunks: List[dict] = None, bm25: BM25Index = None,
+                                   mask: np.ndarray = None):
+    """Lexical retrieval returning (score, chunk) pairs, best first.
+    Scores are BM25 plus a bonus for an exact phrase match; ``mask`` limits candidates to
+    the set rows. Pass ``chunks`` and ``bm25`` explicitly when calling off the script thread."""
+    if chunks is None:
+        chunks = st.session_state.get("chunks", [])
     if not chunks:
         return []
-    q_tokens = _tokenize(query)
-    q_phrase = ' '.join(q_tokens)
-    scored = []
-    for c in chunks:
-        text = c.get("text") or ""
-        t_tokens = _tokenize(text)
-        token_overlap = len(set(q_tokens) & set(t_tokens))
-        phrase_bonus = 6 if q_phrase and q_phrase in text.lower() else 0
-        score = token_overlap + phrase_bonus
-        scored.append((score, c))
-    # filter low scores
-    scored = [pair for pair in scored if pair[0] >= MIN_SCORE]
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return scored[:top_k]
+    if bm25 is None:
+        bm25 = get_bm25_index()
+    hits = phrase_search(bm25, query, lambda d: chunks[d].get("text") or "", k=top_k, min_match=MIN_SCORE,
+                         phrase_bonus=PHRASE_BONUS, mask=mask)
+    return [(score, chunks[d]) for d, score in hits]
+
+def retrieve_in_memory(query: str, top_k: int = 3):
+    """In-memory lexical retrieval over st.session_state['chunks'].
+    Expects st.session_state.chunks = List[dict(text=..., id=...)]
+    """
+    return [c for _s, c in retrieve_in_memory_with_scores(query, top_k=top_k)]
 
 # ---- Initialize session state keys safely ----
 if "completed_steps" not in st.session_state:
@@ -298,7 +400,7 @@ if "last_answer" not in st.session_state:
 if "demo_domain" not in st.session_state:
     st.session_state.demo_domain = ""
 if "retrieval_backend" not in st.session_state:
-    st.session_state.retrieval_backend = "vector"  # 'vector' or 'lexical'
+    st.session_state.retrieval_backend = "vector"  # 'vector', 'lexical' or 'hybrid'
 if "embedding_model_name" not in st.session_state:
     st.session_state.embedding_model_name = "sentence-transformers/all-MiniLM-L6-v2"
 if "processed_files" not in st.session_state:
@@ -430,13 +532,32 @@ with main_col:
             st.markdown("---")
             # Advanced: retrieval backend and model selection
             with st.expander("Advanced settings", expanded=False):
+                backend_labels = {
+                    "vector": "Vector (embeddings + FAISS)",
+                    "lexical": "Lexical (no embeddings)",
+                    "hybrid": "Hybrid (vector + lexical, fused)",
+                }
                 backend_choice = st.selectbox(
                     "Retrieval backend",
-                    ["Vector (embeddings + FAISS)", "Lexical (no embeddings)"],
-                    index=0 if st.session_state.retrieval_backend == "vector" else 1,
+                    list(backend_labels.values()),
+                    index=list(backend_labels).index(st.session_state.retrieval_backend),
                 )
-                st.session_state.retrieval_backend = "vector" if backend_choice.startswith("Vector") else "lexical"
-                if st.session_state.retrieval_backend == "vector":
+                st.session_state.retrieval_backend = {v: k for k, v in backend_labels.items()}[backend_choice]
+                if st.session_state.retrieval_backend == "hybrid":
+                    fusion_choice = st.selectbox(
+                        "Fusion method",
+                        ["Reciprocal rank fusion", "Weighted normalized scores"],
+                        index=0 if st.session_state.get("fusion_method", "rrf") == "rrf" else 1,
+                    )
+                    st.session_state.fusion_method = "rrf" if fusion_choice.startswith("Reciprocal") else "weighted"
+                    st.session_state.hybrid_vector_weight = st.slider(
+                        "Vector weight", 0.0, 1.0, float(st.session_state.get("hybrid_vector_weight", 0.5)), 0.05,
+                    )
+                st.session_state.rerank_enabled = st.checkbox(
+                    "Cross-encoder re-ranking", value=bool(st.session_state.get("rerank_enabled")), disabled=not HAS_ST,
+                    help=f"Score the top {RERANK_CANDIDATES} candidates with {RERANK_MODEL} and keep the best.",
+                )
+                if st.session_state.retrieval_backend in ("vector", "hybrid"):
                     model_choice = st.selectbox(
                         "Embedding model",
                         [
@@ -447,11 +568,24 @@ with main_col:
                     )
                     st.session_state.embedding_model_name = model_choice
             st.subheader("Upload & Parse PDFs")
-            colu1, colu2 = st.columns(2)
+            colu0, colu1, colu2, colu3 = st.columns(4)
+            with colu0:
+                chunk_strategy = st.selectbox(
+                    "Chunking", CHUNK_STRATEGIES, index=CHUNK_STRATEGIES.index(DEFAULT_CHUNK_STRATEGY),
+                    format_func=strategy_label,
+                    key="chunk_strategy_input", help="Size and overlap are counted in tokens for the token strategy.",
+                )
             with colu1:
-                chunk_size = st.number_input("Chunk size (chars)", min_value=300, max_value=2000, value=800, step=50, key="chunk_size_input")
+                chunk_size = st.number_input(f"Chunk size ({size_unit(chunk_strategy)})", min_value=50, max_value=2000, value=800, step=50, key="chunk_size_input")
             with colu2:
-                overlap = st.number_input("Overlap (chars)", min_value=0, max_value=400, value=120, step=10, key="chunk_overlap_input")
+                overlap = st.number_input(f"Overlap ({size_unit(chunk_strategy)})", min_value=0, max_value=400, value=120, step=10, key="chunk_overlap_input")
+            with colu3:
+                dedup_mode = st.selectbox(
+                    "Duplicates", DEDUP_MODES, index=DEDUP_MODES.index(DEDUP_MODE),
+                    format_func={"near": "Drop exact + near", "exact": "Drop exact", "off": "Keep"}.get,
+                    key="dedup_mode_input", help="Repeated headers/footers/disclaimers are removed before embedding; "
+                         "near also drops almost identical chunks.",
+                )
             uploaded = st.file_uploader("Upload PDF(s)", accept_multiple_files=True, type=["pdf"])
             # Show previously processed files, if any
             if st.session_state.get("processed_files"):
@@ -461,7 +595,7 @@ with main_col:
                 with st.expander("Previously processed files", expanded=True):
                     st.markdown(f"**Files:** {len(files)} | **Pages:** {total_pages} | **Chunks:** {total_chunks}")
                     for f in files:
-                        st.markdown(f"- {f.get('name','unknown')} — {f.get('pages',0)} page(s)")
+                        st.markdown(f"- {f.get('name','unknown')} — {f.get('pages',0)} page(s)" + (f" ({f['pages_per_s']} pages/s)" if f.get("pages_per_s") else ""))
                     def _clear_processed():
                         st.session_state.processed_files = []
                     st.button("Clear list (keep data)", on_click=_clear_processed, key="clear_processed_files")
@@ -469,25 +603,32 @@ with main_col:
                 if st.button("Process PDFs", key="process_pdfs"):
                     # 1) Parse & chunk
                     with st.spinner("Parsing and chunking PDFs..."):
-                        pages = parse_pdfs(uploaded)
-                        chunks = build_chunks(pages, int(chunk_size), int(overlap))
-                        # drop empty/very short chunks
-                        filtered = [c for c in chunks if c.get("text") and len(c.get("text")) > 20]
+                        filtered, ingest_stats, dedup_stats = ingest_pdfs(
+                            uploaded, int(chunk_size), int(overlap), chunk_strategy, dedup_mode
+                        )
                         st.session_state.chunks = filtered
+                        get_bm25_index()  # build the lexical index once, at chunking time
                         st.session_state.embeddings = None
                         st.session_state.index = None
                         # In light mode, force lexical backend (no embeddings/index builds)
                         if LIGHT_MODE:
                             st.session_state.retrieval_backend = "lexical"
                     # Build and persist processed file summary
-                    file_pages = {}
-                    for p in pages:
-                        src = p.get("source", "uploaded")
-                        file_pages[src] = file_pages.get(src, 0) + 1
                     st.session_state.processed_files = [
-                        {"name": name, "pages": count} for name, count in sorted(file_pages.items())
+                        {"name": f["file"], "pages": f["pages"], "pages_per_s": f["pages_per_s"]}
+                        for f in sorted(ingest_stats.per_file, key=lambda f: f["file"])
                     ]
-                    st.success(f"Processed {sum(file_pages.values())} pages → {len(filtered)} chunks (removed {len(chunks)-len(filtered)} empty/short).")
+                    for err in ingest_stats.errors:
+                        st.warning(f"Could not read {err}")
+                    st.success(
+                        f"Processed {ingest_stats.pages} pages → {len(filtered)} chunks in {ingest_stats.elapsed_s:.2f}s."
+                    )
+                    if dedup_stats.dropped:
+                        dd = dedup_stats.as_dict()
+                        st.caption(
+                            f"Removed {dd['exact']} exact + {dd['near']} near-duplicate chunks ({dd['saved_pct']}%), "
+                            f"saving {dd['embeddings_saved']} embedding inputs."
+                        )
                     with st.expander("Preview first 5 chunks", expanded=False):
                         for i, ch in enumerate(st.session_state.chunks[:5], start=1):
                             meta = f"{ch.get('source','uploaded')} p.{ch.get('page','-')}"
@@ -559,18 +700,32 @@ with main_col:
                         st.session_state.embedding_model_name = st.session_state.get("embedding_model_name", "sentence-transformers/all-MiniLM-L6-v2")
                         st.session_state.index = None
                     st.success(f"Computed embeddings: shape {embs.shape}")
+                    cs = st.session_state.get("emb_cache_stats")
+                    if cs:
+                        st.caption(
+                            f"Embedding cache: {cs['hits']} hits, {cs['misses']} misses "
+                            f"({cs['hit_rate']:.0%} hit rate), {cs['bytes_saved'] / 1e6:.2f} MB not recomputed"
+                        )
+            model_stats = get_registry().stats()
+            if model_stats:
+                with st.expander("Loaded embedding models (shared by all sessions)", expanded=False):
+                    st.table(model_stats)
             if st.button("Mark Step 3 Complete", key="complete3"):
                 st.session_state.completed_steps.add(3)
                 st.success("Step 3 marked complete.")
         elif active == 4:
             st.write("Build a vector index and test retrieval.")
+            st.session_state.index_kind = st.selectbox(
+                "Index type", INDEX_KINDS, index=INDEX_KINDS.index(st.session_state.get("index_kind", "auto")),
+                key="index_kind_select",
+            )
             if st.session_state.get("embeddings") is not None and st.session_state.get("index") is None:
                 if st.button("Build index", key="build_index_btn"):
                     with st.spinner("Building index..."):
                         st.session_state.index = build_index(st.session_state.embeddings)
                     st.success("Index built.")
             elif st.session_state.get("index") is not None:
-                st.info("Index already built.")
+                st.info(f"Index already built ({index_kind(st.session_state.index) if HAS_FAISS else 'numpy'}).")
             else:
                 st.warning("Compute embeddings in Step 3 first.")
 
@@ -596,14 +751,25 @@ with main_col:
                 custom_q = st.text_input("Type your test question here", key="custom_test_q")
             elif choice and choice != "-- choose sample question --":
                 custom_q = choice
+            step4_scope = render_search_filter("step4_scope")
             if st.button("Run retrieval test (Step 4)", key="run_retrieval_test"):
                 if not custom_q:
                     st.warning("Pick or type a question first.")
                 else:
-                    retrieved_scored = search_topk(custom_q, k=5)
+                    retrieved_scored = search_topk(custom_q, k=5, filters=step4_scope)
                     if not retrieved_scored:
                         st.info("No results. Ensure chunks/embeddings/index are prepared or lower the threshold.")
                     else:
+                        timings = st.session_state.get("last_retrieval_timings") or {}
+                        st.caption("Latency: " + ", ".join(f"{k.replace('_ms', '')} {v} ms" for k, v in timings.items() if k.endswith("_ms")))
+                        if timings.get("rerank"):
+                            st.caption(format_rerank_timing(timings["rerank"]))
+                        if timings.get("filtered_rows"):
+                            st.caption(f"Searched {timings['filtered_rows']} chunks (document filter)")
+                        if timings.get("query_cache"):
+                            qc = get_query_embedding_cache().stats_dict()
+                            st.caption(f"Query embedding: cache {timings['query_cache']} · hit ratio {qc['hit_ratio']:.0%} "
+                                       f"({qc['hits']}/{qc['hits'] + qc['misses']}) · saved {qc['saved_s'] * 1000:.1f} ms of encoding")
                         with st.expander("Retrieved chunks (top-5)", expanded=True):
                             for i, (sc, ch) in enumerate(retrieved_scored, start=1):
                                 meta = f"{ch.get('source','uploaded')} p.{ch.get('page','-')}"
@@ -651,6 +817,8 @@ with main_col:
                 # Banners about retrieval mode/availability
                 if st.session_state.get("retrieval_backend") == "lexical":
                     st.info("Retrieval backend: Lexical (embeddings disabled).")
+                elif st.session_state.get("retrieval_backend") == "hybrid" and st.session_state.get("index") is not None:
+                    st.info("Retrieval backend: Hybrid (vector + lexical, fused).")
                 elif not (st.session_state.get("embeddings") is not None and st.session_state.get("index") is not None):
                     st.warning("Vector search unavailable — using lexical fallback.")
 
@@ -672,7 +840,7 @@ with main_col:
                         total_pages = sum(f.get("pages", 0) for f in files)
                         st.markdown(f"Files: {len(files)} | Pages: {total_pages}")
                         for f in files:
-                            st.markdown(f"- {f.get('name','unknown')} — {f.get('pages',0)} page(s)")
+                            st.markdown(f"- {f.get('name','unknown')} — {f.get('pages',0)} page(s)" + (f" ({f['pages_per_s']} pages/s)" if f.get("pages_per_s") else ""))
                     if chs:
                         st.markdown("Preview first 3 chunks:")
                         for i, ch in enumerate(chs[:3], start=1):
@@ -753,7 +921,7 @@ with main_col:
                     st.session_state["messages"].append({"role": "user", "text": user_q})
                     st.session_state["chat_input"] = ""  # allowed inside callback
                     # Retrieve and build prompt
-                    topk_scored = search_topk(user_q, k=5)
+                    topk_scored = search_topk(user_q, k=5, filters=search_scope("chat_scope"))
                     st.session_state.last_topk = topk_scored
                     st.session_state.last_question = user_q
                     _prompt = build_prompt_with_snippets(user_q, topk_scored)
@@ -787,6 +955,13 @@ with main_col:
                 # Show latest top-K under a collapsible panel
                 if st.session_state.last_topk:
                     with st.expander("Top retrieved chunks (last question)", expanded=True):
+                        timings = st.session_state.get("last_retrieval_timings") or {}
+                        if timings:
+                            st.caption("Latency: " + ", ".join(f"{k.replace('_ms', '')} {v} ms" for k, v in timings.items() if k.endswith("_ms")))
+                        if timings.get("rerank"):
+                            st.caption(format_rerank_timing(timings["rerank"]))
+                        if timings.get("filtered_rows"):
+                            st.caption(f"Searched {timings['filtered_rows']} chunks (document filter)")
                         for i, (sc, ch) in enumerate(st.session_state.last_topk, start=1):
                             idx = ch.get("id", i)
                             page = ch.get("page", "-")
@@ -794,6 +969,7 @@ with main_col:
                             snip = _clean(ch.get("text", ""))[:1000]
                             st.write(snip)
 
+                render_search_filter("chat_scope")
                 cols = st.columns([8, 1, 1])
                 with cols[0]:
                     st.text_input("Type your question", key="chat_input", placeholder="Ask me anything about the uploaded docs…")
@@ -0,0 +1,52 @@
+"""Benchmark: per-query FAISS search loop vs. one batched matrix search.
+
+Mirrors the Step 4 batch tester: the loop issues one single-row ``index.search`` per
+question (the previous behaviour), the batched path uses ``search_batch``. Query
+encoding is excluded; both paths receive the same precomputed query vectors.
+
+    python benchmarks/bench_batch_retrieval.py --chunks 50000 --queries 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import faiss  # noqa: E402
+import numpy as np  # noqa: E402
+
+from app.utils.index_utils import INDEX_KINDS, build_vector_index, search_batch  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--chunks", type=int, default=50000)
+    ap.add_argument("--queries", type=int, default=1000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--kinds", nargs="+", default=["flat", "hnsw"], choices=INDEX_KINDS)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    xb = rng.standard_normal((args.chunks, args.dim)).astype("float32")
+    faiss.normalize_L2(xb)
+    xq = rng.standard_normal((args.queries, args.dim)).astype("float32")
+
+    print(f"{'index':>8} {'loop_qps':>10} {'batch_qps':>10} {'speedup':>8}")
+    for kind in args.kinds:
+        index = build_vector_index(xb, kind=kind)
+        t0 = time.perf_counter()
+        for i in range(len(xq)):
+            q = xq[i:i + 1].copy()
+            faiss.normalize_L2(q)
+            index.search(q, args.k)
+        t_loop = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        search_batch(index, xq, args.k)
+        t_batch = time.perf_counter() - t0
+        print(f"{kind:>8} {len(xq) / t_loop:>10.0f} {len(xq) / t_batch:>10.0f} {t_loop / t_batch:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
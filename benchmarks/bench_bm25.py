@@ -0,0 +1,81 @@
+"""Benchmark: BM25 inverted index vs. per-query re-tokenizing scan.
+
+Builds synthetic Zipf-distributed policy chunks and reports index build time and
+query latency percentiles at each corpus size. The linear scan (the previous
+retrieve_in_memory behaviour) is only run at sizes up to --scan-max.
+
+    python benchmarks/bench_bm25.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np  # noqa: E402
+
+from app.utils.lexical_index import BM25Index  # noqa: E402
+
+
+def synthetic_chunks(n, words_per_chunk=40, vocab_size=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"w{i}" for i in range(vocab_size)])
+    ids = np.minimum(rng.zipf(1.2, size=(n, words_per_chunk)) - 1, vocab_size - 1)
+    return [" ".join(vocab[row]) for row in ids]
+
+
+def queries(nq=200, vocab_size=20000, seed=1):
+    rng = np.random.default_rng(seed)
+    return [" ".join(f"w{int(i)}" for i in rng.integers(0, min(vocab_size, 2000), size=4)) for _ in range(nq)]
+
+
+def scan(chunks, query, k=5):
+    q = set(re.findall(r"[a-z0-9]+", query.lower()))
+    scored = []
+    for i, c in enumerate(chunks):
+        ov = len(q & set(re.findall(r"[a-z0-9]+", c.lower())))
+        if ov:
+            scored.append((ov, i))
+    scored.sort(reverse=True)
+    return scored[:k]
+
+
+def _pct(xs, p):
+    return float(np.percentile(np.asarray(xs) * 1000, p))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--scan-max", type=int, default=10000)
+    args = ap.parse_args()
+
+    qs = queries(args.queries)
+    print(f"{'chunks':>9} {'build_s':>8} {'bm25_p50_ms':>12} {'bm25_p95_ms':>12} {'scan_p50_ms':>12}")
+    for n in args.sizes:
+        chunks = synthetic_chunks(n)
+        t0 = time.perf_counter()
+        index = BM25Index.build(chunks)
+        build_s = time.perf_counter() - t0
+        lat = []
+        for q in qs:
+            t0 = time.perf_counter()
+            index.search(q, k=5)
+            lat.append(time.perf_counter() - t0)
+        scan_p50 = "-"
+        if n <= args.scan_max:
+            slat = []
+            for q in qs[:20]:
+                t0 = time.perf_counter()
+                scan(chunks, q)
+                slat.append(time.perf_counter() - t0)
+            scan_p50 = f"{_pct(slat, 50):.2f}"
+        print(f"{n:>9} {build_s:>8.2f} {_pct(lat, 50):>12.3f} {_pct(lat, 95):>12.3f} {scan_p50:>12}")
+        del chunks, index
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark: memory of List[Chunk] with list-of-float embeddings vs. the columnar ChunkStore.
+
+    python benchmarks/bench_chunk_store_memory.py --chunks 20000 --dim 384
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np  # noqa: E402
+
+from app.utils.chunk_store import Chunk, ChunkStoreBuilder  # noqa: E402
+
+
+def _texts(n, chars):
+    base = "Employees accrue paid leave monthly per section {i}. "
+    return [(base.format(i=i) * (chars // 50 + 1))[:chars] for i in range(n)]
+
+
+def measure(label, fn):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    obj = fn()
+    elapsed = time.perf_counter() - t0
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    gc.collect()
+    return label, current, peak, elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--chunks", type=int, default=20000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--chunk-chars", type=int, default=400)
+    args = ap.parse_args()
+
+    texts = _texts(args.chunks, args.chunk_chars)
+    rng = np.random.default_rng(0)
+    model_out = rng.standard_normal((args.chunks, args.dim)).astype(np.float32)
+
+    def legacy():
+        # Previous layout: one dataclass per chunk, embedding as a list of Python floats,
+        # then np.array(list_of_lists) when the FAISS index is built.
+        embs = model_out.copy().tolist()
+        chunks = [Chunk(chunk_id=i, text=t, source="uploaded_docs", embedding=e) for i, (t, e) in enumerate(zip(texts, embs))]
+        xb = np.array([c.embedding for c in chunks]).astype("float32")
+        del xb  # handed to FAISS, which keeps its own copy
+        return chunks
+
+    def columnar(dtype):
+        def run():
+            b = ChunkStoreBuilder()
+            for t in texts:
+                b.add(t, "uploaded_docs")
+            store = b.build()
+            store.set_embeddings(model_out.copy(), dtype=dtype)
+            xb = store.embedding_matrix()
+            del xb  # handed to FAISS, which keeps its own copy
+            return store
+        return run
+
+    rows = [
+        measure("List[Chunk] + list embeddings", legacy),
+        measure("ChunkStore float32", columnar("float32")),
+        measure("ChunkStore float16", columnar("float16")),
+    ]
+    print(f"{args.chunks} chunks x {args.dim} dims")
+    print(f"{'layout':<32} {'retained_MB':>12} {'peak_MB':>9} {'build_s':>8}")
+    for label, cur, peak, elapsed in rows:
+        print(f"{label:<32} {cur / 1e6:>12.1f} {peak / 1e6:>9.1f} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
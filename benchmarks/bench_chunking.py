@@ -0,0 +1,85 @@
+"""Benchmark: unified chunker strategies vs. the chunkers they replaced.
+
+Reports MB/s and chunk counts over a synthetic policy corpus for the three
+strategies in app/utils/chunking.py, the old slice-and-strip chunker and, when
+installed, langchain's RecursiveCharacterTextSplitter (the old Chroma path).
+
+    python benchmarks/bench_chunking.py --mb 5 --size 800 --overlap 120
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.utils.chunking import chunk_text, default_tokenizer, word_token_spans  # noqa: E402
+
+try:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+except Exception:  # pragma: no cover
+    RecursiveCharacterTextSplitter = None
+
+SECTION = """{n}.{m} Leave entitlement
+Employees accrue 1.5 days of annual leave per month of service. Leave must be approved by the line manager
+before it is taken. Unused leave may be carried over, capped at ten days per calendar year.
+Requests are submitted through the HR portal at least two weeks in advance.
+
+"""
+
+
+def corpus(mb):
+    parts, size, n = [], 0, 0
+    while size < mb * 1e6:
+        s = SECTION.format(n=n // 10 + 1, m=n % 10 + 1)
+        parts.append(s)
+        size += len(s)
+        n += 1
+    return "".join(parts)
+
+
+def legacy_slice(text, size, overlap):
+    out, i, n = [], 0, len(text)
+    while i < n:
+        end = min(n, i + size)
+        out.append(text[i:end].strip())
+        if end == n:
+            break
+        i = end - overlap
+    return [c for c in out if len(c) > 20]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--mb", type=float, default=5)
+    ap.add_argument("--size", type=int, default=800)
+    ap.add_argument("--overlap", type=int, default=120)
+    args = ap.parse_args()
+
+    text = corpus(args.mb)
+    mb = len(text.encode("utf-8")) / 1e6
+    # Token windows default to ~4 chars/token so chunk sizes are comparable.
+    tok_size, tok_overlap = args.size // 4, args.overlap // 4
+    runs = [
+        ("char", lambda: chunk_text(text, args.size, args.overlap, "char")),
+        ("token (words)", lambda: chunk_text(text, tok_size, tok_overlap, "token", tokenizer=word_token_spans)),
+        ("token (default)", lambda: chunk_text(text, tok_size, tok_overlap, "token", tokenizer=default_tokenizer())),
+        ("sentence", lambda: chunk_text(text, args.size, args.overlap, "sentence")),
+        ("legacy slice+strip", lambda: legacy_slice(text, args.size, args.overlap)),
+    ]
+    if RecursiveCharacterTextSplitter is not None:
+        splitter = RecursiveCharacterTextSplitter(chunk_size=args.size, chunk_overlap=args.overlap,
+                                                  separators=["\n\n", "\n", " ", ""])
+        runs.append(("langchain recursive", lambda: splitter.split_text(text)))
+
+    print(f"{mb:.1f} MB corpus, size={args.size} overlap={args.overlap}")
+    print(f"{'chunker':>20} {'chunks':>8} {'seconds':>8} {'MB/s':>8}")
+    for name, fn in runs:
+        t0 = time.perf_counter()
+        chunks = fn()
+        dt = time.perf_counter() - t0
+        print(f"{name:>20} {len(chunks):>8} {dt:>8.3f} {mb / dt:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
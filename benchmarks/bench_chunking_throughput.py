@@ -0,0 +1,51 @@
+"""Benchmark: page-by-page chunking throughput (MB/s) as input grows.
+
+Feeds synthetic page records through ``chunk_pages`` into a ChunkStoreBuilder,
+well past the former 2M-character ceiling, and reports MB/s and chunks/s. A flat
+MB/s column means cost is linear in input size.
+
+    python benchmarks/bench_chunking_throughput.py --mb 1 10 50
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.utils.chunk_store import ChunkStoreBuilder  # noqa: E402
+from app.utils.ingest_pipeline import PageRecord, chunk_pages  # noqa: E402
+
+PAGE = ("Employees accrue annual leave at 1.5 days per month. Unused leave may be carried "
+        "over up to ten days, subject to manager approval. ") * 24  # ~3 KB, a dense PDF page
+
+
+def pages(mb):
+    n = int(mb * 1e6 / len(PAGE))
+    return (PageRecord(f"manual-{i // 300}.pdf", i % 300 + 1, PAGE) for i in range(n))
+
+
+def chunker(size, overlap):
+    step = size - overlap
+
+    def _chunk(text):
+        return [text[i:i + size].strip() for i in range(0, len(text), step)]
+    return _chunk
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--mb", type=float, nargs="+", default=[1, 10, 50])
+    ap.add_argument("--size", type=int, default=400)
+    ap.add_argument("--overlap", type=int, default=50)
+    args = ap.parse_args()
+
+    print(f"{'input_MB':>9} {'pages':>8} {'chunks':>9} {'elapsed_s':>10} {'MB/s':>7} {'chunks/s':>10}")
+    for mb in args.mb:
+        stats = chunk_pages(pages(mb), chunker(args.size, args.overlap), ChunkStoreBuilder())
+        d = stats.as_dict()
+        print(f"{d['mb']:>9.1f} {d['pages']:>8} {d['chunks']:>9} {d['elapsed_s']:>10.2f} {d['mb_per_s']:>7.1f} "
+              f"{d['chunks'] / stats.elapsed_s:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark: document-scoped search latency vs. the size of the scoped subset.
+
+Compares over-fetching from the whole index and discarding rows outside the scope
+(``post_filter``, the only option before) with ``search_filtered``: an exact scan of
+just the subset rows (``subset_exact``) and a FAISS ``IDSelectorBatch`` search
+(``id_selector``). Latencies are per query, over a batch of precomputed vectors.
+
+    python benchmarks/bench_filtered_search.py --chunks 200000 --fractions 0.001 0.01 0.1 0.5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import faiss  # noqa: E402
+import numpy as np  # noqa: E402
+
+from app.utils.index_utils import INDEX_KINDS, build_vector_index, search_batch, search_filtered  # noqa: E402
+
+
+def _post_filter(index, xq, k, mask):
+    fetch = k
+    while True:
+        D, I = search_batch(index, xq, fetch)
+        kept = [[i for i in row if i >= 0 and mask[i]][:k] for row in I]
+        if all(len(r) == k for r in kept) or fetch >= index.ntotal:
+            return kept
+        fetch = min(index.ntotal, fetch * 4)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--chunks", type=int, default=200000)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--kind", default="flat", choices=INDEX_KINDS)
+    ap.add_argument("--fractions", nargs="+", type=float, default=[0.001, 0.01, 0.1, 0.5])
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    xb = rng.standard_normal((args.chunks, args.dim)).astype("float32")
+    faiss.normalize_L2(xb)
+    xq = rng.standard_normal((args.queries, args.dim)).astype("float32")
+    index = build_vector_index(xb, kind=args.kind)
+
+    print(f"{'subset':>8} {'rows':>8} {'post_filter_ms':>15} {'subset_exact_ms':>16} {'id_selector_ms':>15}")
+    for frac in args.fractions:
+        rows = np.sort(rng.choice(args.chunks, size=max(1, int(args.chunks * frac)), replace=False))
+        mask = np.zeros(args.chunks, dtype=bool)
+        mask[rows] = True
+        times = []
+        for run in (
+            lambda: _post_filter(index, xq, args.k, mask),
+            lambda: search_filtered(index, xq, args.k, rows, vectors=xb, exact_max_rows=args.chunks),
+            lambda: search_filtered(index, xq, args.k, rows, exact_max_rows=0),
+        ):
+            t0 = time.perf_counter()
+            run()
+            times.append((time.perf_counter() - t0) * 1000 / len(xq))
+        print(f"{frac:>8.3f} {len(rows):>8} {times[0]:>15.2f} {times[1]:>16.2f} {times[2]:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark: peak working memory of streamed vs. concatenated ingestion.
+
+The concatenated path mirrors the old Step 1: extract every page of every file, join
+each document into one string, then chunk. The streamed path runs the ingest pipeline
+(pages -> normalized text -> chunks -> batches over bounded queues). Chunks are
+consumed by a counting sink in both cases, so the figure is working memory only and
+should stay flat for the streamed path as the upload grows.
+
+    python benchmarks/bench_ingest_memory.py --pages 100 300 600
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pdf_extraction import handbook_pages, synthetic_pdf  # noqa: E402
+
+from app.utils.ingest_pipeline import pipeline  # noqa: E402
+from app.utils.pdf_utils import extract_pdfs  # noqa: E402
+
+
+def chunker(text, size=800, overlap=120):
+    return [text[i:i + size] for i in range(0, max(1, len(text)), size - overlap)]
+
+
+def concatenated(files):
+    n = 0
+    docs = [r.pages for r in extract_pdfs(files, workers=1)]
+    for pages in docs:
+        n += len(chunker("\n\n".join(pages)))
+    return n
+
+
+def streamed(files):
+    return sum(len(b) for b in pipeline(iter(files), chunker, workers=1))
+
+
+def measure(fn, files):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    n = fn(files)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return n, peak / 1e6, elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, nargs="+", default=[100, 300, 600], help="total pages per run")
+    ap.add_argument("--pages-per-file", type=int, default=100)
+    args = ap.parse_args()
+
+    print(f"{'pages':>6} {'concat_peak_MB':>15} {'stream_peak_MB':>15} {'concat_s':>9} {'stream_s':>9}")
+    for total in args.pages:
+        n_files = max(1, total // args.pages_per_file)
+        files = [(f"doc-{i}.pdf", synthetic_pdf(handbook_pages(args.pages_per_file, seed=i))) for i in range(n_files)]
+        _, c_peak, c_s = measure(concatenated, files)
+        _, s_peak, s_s = measure(streamed, files)
+        print(f"{n_files * args.pages_per_file:>6} {c_peak:>15.1f} {s_peak:>15.1f} {c_s:>9.2f} {s_s:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Benchmark: per-call OpenAI client construction vs. the shared client pool.
+
+Runs chat completions against a local mock of ``/v1/chat/completions`` (HTTP/1.1
+keep-alive, optionally TLS with a throwaway self-signed certificate made by the
+``openssl`` CLI) and prints latency percentiles plus a histogram for:
+
+  per-call     OpenAI(api_key=...) built for every question (the previous behaviour)
+  pooled       one shared client from app/utils/openai_pool.py
+  async        the pooled AsyncOpenAI client, all sessions on one event loop
+
+Each mode runs ``--sessions`` concurrent chat sessions of ``--questions`` each.
+
+    python benchmarks/bench_openai_client.py --sessions 8 --questions 25 --latency-ms 30 --tls
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import certifi  # noqa: E402
+import numpy as np  # noqa: E402
+from openai import OpenAI  # noqa: E402
+
+from app.utils.openai_pool import get_async_openai_client, get_openai_client  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "How many days of annual leave do I get?"}]
+
+
+class _MockState:
+    latency_s = 0.03
+    connections = 0
+    lock = threading.Lock()
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without NODELAY, Nagle plus the
+        # client's delayed ACK adds ~40 ms to every request on a reused connection.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with _MockState.lock:
+            _MockState.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(_MockState.latency_s)
+        payload = {
+            "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "- 18 days per year [chunk 3]"}}],
+            "usage": {"prompt_tokens": 20, "completion_tokens": 8, "total_tokens": 28},
+        }
+        raw = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+def start_mock_server(tls_dir=None):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChatHandler)
+    server.daemon_threads = True
+    scheme = "http"
+    if tls_dir:
+        cert, key = os.path.join(tls_dir, "cert.pem"), os.path.join(tls_dir, "key.pem")
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key, "-out", cert,
+                        "-days", "1", "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1"],
+                       check=True, capture_output=True)
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(cert, key)
+        server.socket = ctx.wrap_socket(server.socket, server_side=True)
+        # Clients (per-call and pooled alike) trust the throwaway cert through the env. It is
+        # appended to the full CA bundle so building an SSL context costs what it does in production.
+        bundle = os.path.join(tls_dir, "bundle.pem")
+        with open(bundle, "w") as out, open(certifi.where()) as ca, open(cert) as own:
+            out.write(ca.read() + "\n" + own.read())
+        os.environ["SSL_CERT_FILE"] = bundle
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def ask_per_call(base_url):
+    client = OpenAI(api_key="sk-bench", base_url=base_url)
+    client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+
+
+def ask_pooled(base_url):
+    get_openai_client("sk-bench", base_url=base_url).chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+
+
+def run_threads(fn, base_url, sessions, questions):
+    def session(_):
+        lat = []
+        for _ in range(questions):
+            t0 = time.perf_counter()
+            fn(base_url)
+            lat.append(time.perf_counter() - t0)
+        return lat
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as ex:
+        lat = [x for part in ex.map(session, range(sessions)) for x in part]
+    return lat, time.perf_counter() - t0
+
+
+def run_async(base_url, sessions, questions):
+    async def session():
+        lat = []
+        for _ in range(questions):
+            t0 = time.perf_counter()
+            client = get_async_openai_client("sk-bench", base_url=base_url)
+            await client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+            lat.append(time.perf_counter() - t0)
+        return lat
+
+    async def main():
+        parts = await asyncio.gather(*(session() for _ in range(sessions)))
+        return [x for part in parts for x in part]
+
+    t0 = time.perf_counter()
+    lat = asyncio.run(main())
+    return lat, time.perf_counter() - t0
+
+
+def histogram(lat_ms, edges):
+    counts, _ = np.histogram(lat_ms, bins=edges)
+    width = max(1, counts.max())
+    return [f"  {lo:>6.0f}-{hi:<6.0f}ms {'#' * int(40 * c / width):<40} {c}" for lo, hi, c in zip(edges, edges[1:], counts)]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", type=int, default=8)
+    ap.add_argument("--questions", type=int, default=25)
+    ap.add_argument("--latency-ms", type=float, default=30.0)
+    ap.add_argument("--tls", action="store_true", help="serve over HTTPS so per-call clients pay TLS handshakes")
+    args = ap.parse_args()
+
+    _MockState.latency_s = args.latency_ms / 1000.0
+    with tempfile.TemporaryDirectory() as tmp:
+        server, base_url = start_mock_server(tmp if args.tls else None)
+        get_openai_client("sk-bench", base_url=base_url)  # pooled client creation is not part of the timings
+        results = []
+        for name, run in [
+            ("per-call", lambda: run_threads(ask_per_call, base_url, args.sessions, args.questions)),
+            ("pooled", lambda: run_threads(ask_pooled, base_url, args.sessions, args.questions)),
+            ("async", lambda: run_async(base_url, args.sessions, args.questions)),
+        ]:
+            before = _MockState.connections
+            lat, wall = run()
+            results.append((name, np.asarray(lat) * 1000, wall, _MockState.connections - before))
+        server.shutdown()
+
+    n = args.sessions * args.questions
+    print(f"{n} questions, {args.sessions} sessions, mock latency {args.latency_ms:g} ms, "
+          f"{'https' if args.tls else 'http'}")
+    print(f"{'mode':<10} {'p50_ms':>8} {'p90_ms':>8} {'p99_ms':>8} {'q/s':>8} {'connections':>12}")
+    for name, lat, wall, conns in results:
+        p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+        print(f"{name:<10} {p50:>8.1f} {p90:>8.1f} {p99:>8.1f} {n / wall:>8.1f} {conns:>12}")
+    hi = max(float(np.percentile(lat, 99)) for _, lat, _, _ in results)
+    edges = np.linspace(args.latency_ms * 0.9, hi * 1.05, 9)
+    for name, lat, _, _ in results:
+        print(f"{name}:")
+        print("\n".join(histogram(lat, edges)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Benchmark: per-chunk OpenAI embedding loop vs. batched/concurrent requests.
+
+Runs against a local stub of the ``/v1/embeddings`` endpoint so no API key or network
+access is needed. The stub sleeps a fixed round-trip latency plus a small per-input cost
+and can inject 429s to exercise the retry path.
+
+    python benchmarks/bench_openai_embeddings.py --chunks 2000 --latency-ms 40
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from openai import OpenAI  # noqa: E402
+
+from app.utils.embedding_utils import embed_openai_batched  # noqa: E402
+
+DIM = 64
+
+
+class _StubState:
+    latency_s = 0.04
+    per_item_s = 0.0002
+    fail_every = 0
+    calls = 0
+    lock = threading.Lock()
+
+
+class _EmbeddingsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        inputs = body.get("input") or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        with _StubState.lock:
+            _StubState.calls += 1
+            n = _StubState.calls
+        if _StubState.fail_every and n % _StubState.fail_every == 0:
+            self._send(429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}})
+            return
+        time.sleep(_StubState.latency_s + _StubState.per_item_s * len(inputs))
+        data = [
+            {"object": "embedding", "index": i, "embedding": [float((len(t) + j) % 7) for j in range(DIM)]}
+            for i, t in enumerate(inputs)
+        ]
+        self._send(200, {"object": "list", "data": data, "model": body.get("model"),
+                         "usage": {"prompt_tokens": 0, "total_tokens": 0}})
+
+    def _send(self, code, payload):
+        raw = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+def start_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _EmbeddingsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_loop(client, texts, model):
+    # Mirrors the previous embed_texts_openai: one request per chunk, and the first
+    # error discards everything computed so far.
+    t0 = time.perf_counter()
+    out, reqs = [], 0
+    try:
+        for t in texts:
+            reqs += 1
+            resp = client.embeddings.create(input=t, model=model)
+            out.append(resp.data[0].embedding)
+    except Exception:
+        out = []
+    return out, reqs, time.perf_counter() - t0
+
+
+def run_batched(client, texts, model, max_items, workers):
+    res = embed_openai_batched(client, texts, model=model, max_items=max_items, max_workers=workers,
+                               backoff_base=0.01)
+    return res.embeddings, res.requests, res.elapsed_s
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--chunks", type=int, default=2000)
+    ap.add_argument("--chunk-chars", type=int, default=400)
+    ap.add_argument("--latency-ms", type=float, default=40.0)
+    ap.add_argument("--batch-items", type=int, default=256)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--fail-every", type=int, default=0, help="return HTTP 429 on every Nth request")
+    ap.add_argument("--skip-loop", action="store_true", help="skip the slow per-chunk baseline")
+    args = ap.parse_args()
+
+    _StubState.latency_s = args.latency_ms / 1000.0
+    _StubState.fail_every = args.fail_every
+    server = start_stub_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    client = OpenAI(api_key="sk-bench", base_url=base_url, max_retries=0)
+    texts = [("policy clause %d " % i) * (args.chunk_chars // 18 + 1) for i in range(args.chunks)]
+
+    rows = []
+    if not args.skip_loop:
+        embs, reqs, wall = run_loop(client, texts, "text-embedding-3-small")
+        rows.append(("per-chunk loop", reqs, wall, sum(e is not None for e in embs)))
+    embs, reqs, wall = run_batched(client, texts, "text-embedding-3-small", args.batch_items, args.workers)
+    rows.append((f"batched ({args.batch_items}/req, {args.workers} workers)", reqs, wall,
+                 sum(e is not None for e in embs)))
+    server.shutdown()
+
+    print(f"{'mode':<36} {'requests':>9} {'wall_s':>8} {'req/s':>8} {'chunks/s':>9} {'embedded':>9}")
+    for name, reqs, wall, ok in rows:
+        print(f"{name:<36} {reqs:>9} {wall:>8.2f} {reqs / wall:>8.1f} {ok / wall:>9.1f} {ok:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark: serial vs. process-pool PDF page extraction.
+
+Generates synthetic text PDFs (no external tools needed) and extracts them with
+``extract_pdfs`` at each worker count, reporting wall time and pages/sec. Worker
+counts above the machine's core count will not speed anything up.
+
+    python benchmarks/bench_pdf_extraction.py --files 3 --pages 300 --workers 1 2 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.utils.pdf_utils import extract_pdfs  # noqa: E402
+
+
+def synthetic_pdf(pages, lines_per_page=40):
+    """Minimal PDF with one Helvetica text page per entry of ``pages``."""
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        words = text.split()
+        per_line = max(1, len(words) // lines_per_page)
+        lines = [" ".join(words[i:i + per_line]) for i in range(0, len(words), per_line)]
+        ops = ["BT /F1 9 Tf 11 TL 40 800 Td"]
+        for line in lines:
+            esc = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            ops.append(f"({esc}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        objs.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objs.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+                    b"/Contents %d 0 R >>" % (len(objs)))
+        kids.append(len(objs))
+    objs[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    return bytes(out)
+
+
+def handbook_pages(n, seed=0):
+    words = ("employee leave policy annual clause section benefit travel expense approval manager "
+             "conduct notice period probation salary review holiday").split()
+    return [" ".join(words[(seed + p * 7 + i * 3) % len(words)] for i in range(400)) for p in range(n)]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--files", type=int, default=3)
+    ap.add_argument("--pages", type=int, default=300)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--engine", default="pypdf", choices=["pypdf", "pdfplumber"])
+    args = ap.parse_args()
+
+    files = [(f"handbook-{i}.pdf", synthetic_pdf(handbook_pages(args.pages, seed=i))) for i in range(args.files)]
+    total = args.files * args.pages
+    print(f"{total} pages in {args.files} file(s), {os.cpu_count()} CPU(s), engine={args.engine}")
+    print(f"{'workers':>8} {'wall_s':>8} {'pages/s':>9} {'per-file pages/s':>18}")
+    for w in args.workers:
+        extract_pdfs(files[:1], engine=args.engine, workers=w)  # warm the pool
+        t0 = time.perf_counter()
+        res = extract_pdfs(files, engine=args.engine, workers=w)
+        wall = time.perf_counter() - t0
+        assert sum(len(r.pages) for r in res) == total
+        per_file = ", ".join(f"{r.pages_per_s:.0f}" for r in res)
+        print(f"{w:>8} {wall:>8.2f} {total / wall:>9.0f} {per_file:>18}")
+
+
+if __name__ == "__main__":
+    main()
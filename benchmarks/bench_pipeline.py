@@ -0,0 +1,394 @@
+"""End-to-end pipeline benchmark on deterministic synthetic policy corpora.
+
+For each corpus size (in chunks) the stages run in a fresh child process, so peak RSS
+is per size: chunking (``chunk_pages`` with the app chunker), embedding, FAISS index
+build, BM25 build, single-query retrieval (``search_chunks``, what ``retrieve_in_memory``
+and the API use), batched retrieval, answering and ``ChromaRetriever.query``.
+Throughput, latency percentiles and peak RSS go to a JSON results file; with a baseline
+file, stages that got slower or larger than ``--tolerance`` are flagged and the exit
+status is 1.
+
+Offline by default: ``--embedder hash`` is a deterministic bag-of-words stub, and the
+answer stage runs without OPENAI_API_KEY, so ``generate_answer`` takes its snippet
+fallback in place of the LLM (``--llm-ms`` adds a simulated model latency). Pass a
+sentence-transformers model name to ``--embedder`` to time a real encoder.
+
+    python benchmarks/bench_pipeline.py --sizes 1000 10000 100000 --update-baseline
+    python benchmarks/bench_pipeline.py --sizes 1000 10000 100000   # compares with the baseline
+    python benchmarks/bench_pipeline.py --sizes 1000000 --chroma-max 0 --index-kind ivf_pq
+
+Numbers are only comparable between runs on the same machine and settings; the
+baseline records both and a mismatch is reported instead of compared.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+os.environ.pop("OPENAI_API_KEY", None)  # offline: generate_answer uses its snippet fallback
+
+import faiss  # noqa: E402
+import numpy as np  # noqa: E402
+
+try:
+    import resource  # noqa: E402
+except ImportError:  # Windows
+    resource = None
+
+from app.utils.chunk_store import ChunkStoreBuilder  # noqa: E402
+from app.utils.chunking import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_STRATEGY, make_chunker  # noqa: E402
+from app.utils.engine import make_embedder, search_chunks  # noqa: E402
+from app.utils.generator_utils import generate_answer  # noqa: E402
+from app.utils.index_utils import INDEX_KINDS, build_vector_index  # noqa: E402
+from app.utils.ingest_pipeline import PageRecord, chunk_pages  # noqa: E402
+from app.utils.lexical_index import BM25Index, lexical_tokenize  # noqa: E402
+from app.utils.query_cache import get_query_embedding_cache  # noqa: E402
+
+DEFAULT_OUT = os.path.join("data", "bench", "pipeline_results.json")
+DEFAULT_BASELINE = os.path.join("data", "bench", "pipeline_baseline.json")
+
+TOPICS = ["annual leave", "maternity leave", "paternity leave", "travel expenses", "code of conduct",
+          "notice period", "overtime", "remote work", "sick leave", "training budget", "performance review",
+          "data protection", "health and safety", "probation", "relocation", "equipment", "harassment",
+          "whistleblowing", "bonus", "pension"]
+ROLES = ["employees", "contractors", "managers", "interns", "part-time staff", "new hires"]
+VERBS = ["must be approved by", "is reviewed by", "should be reported to", "is recorded by", "is escalated to"]
+OWNERS = ["a line manager", "HR", "the finance team", "the compliance officer", "the department head"]
+FILLER = ("The policy applies from the effective date and supersedes earlier guidance. Exceptions are "
+          "documented in writing and retained for audit. ")
+
+# Stage -> unit of its items (queries for the retrieval stages, which also record latencies).
+STAGES = {
+    "chunk": "chunks",
+    "embed": "chunks",
+    "index": "vectors",
+    "bm25": "chunks",
+    "search": "queries",
+    "search_batch": "queries",
+    "answer": "queries",
+    "chroma_build": "chunks",
+    "chroma_query": "queries",
+}
+
+
+def _sentence(rng: random.Random, i: int) -> str:
+    topic = rng.choice(TOPICS)
+    return (f"Clause {i}: {rng.choice(ROLES).capitalize()} are entitled to {rng.randint(1, 60)} days of {topic}. "
+            f"Any request about {topic} {rng.choice(VERBS)} {rng.choice(OWNERS)} within "
+            f"{rng.randint(1, 30)} working days. ")
+
+
+def synthetic_pages(seed: int = 0, sentences_per_page: int = 24):
+    """Endless, deterministic policy pages (~4 KB each, about a dense PDF page)."""
+    rng = random.Random(seed)
+    page = 0
+    while True:
+        text = "".join(_sentence(rng, page * sentences_per_page + s) + (FILLER if s % 6 == 5 else "")
+                       for s in range(sentences_per_page))
+        yield PageRecord(f"policy-{page // 50:05d}.pdf", page % 50 + 1, text)
+        page += 1
+
+
+def synthetic_questions(n: int, seed: int = 1):
+    rng = random.Random(seed)
+    templates = ["How many days of {t} do {r} get?", "Who approves {t} requests?",
+                 "What is the {t} policy for {r}?", "How long does a {t} request take to approve?"]
+    return [rng.choice(templates).format(t=rng.choice(TOPICS), r=rng.choice(ROLES)) + f" (ref {i})"
+            for i in range(n)]
+
+
+def make_hash_embedder(dim: int):
+    """Deterministic hashed bag-of-words vectors: no model, but realistic token work."""
+    buckets = {}
+
+    def encode(texts):
+        out = np.zeros((len(texts), dim), dtype=np.float32)
+        for i, t in enumerate(texts):
+            row = out[i]
+            for w in t.lower().split():
+                b = buckets.get(w)
+                if b is None:
+                    b = buckets[w] = zlib.crc32(w.strip(".,?:()").encode()) % dim
+                row[b] += 1.0
+        return out
+    return encode
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(kb / (1024 * 1024) if sys.platform == "darwin" else kb / 1024, 1)
+
+
+def _stage(items: int, elapsed_s: float, latencies=None, **extra) -> dict:
+    d = {"items": items, "elapsed_s": round(elapsed_s, 4),
+         "per_s": round(items / elapsed_s, 1) if elapsed_s > 0 else None}
+    if latencies:
+        ms = np.asarray(latencies) * 1000
+        d.update({f"p{p}_ms": round(float(np.percentile(ms, p)), 3) for p in (50, 95, 99)})
+    d.update(extra)
+    d["peak_rss_mb"] = peak_rss_mb()
+    return d
+
+
+def _timed_queries(fn, queries):
+    lat = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        lat.append(time.perf_counter() - t0)
+    return lat
+
+
+def _chroma_stages(texts, encode, queries, k):
+    import chromadb
+    from chromadb.utils import embedding_functions
+
+    from app.utils.retriever_utils import ChromaRetriever, sync_collection
+
+    class StubEmbeddingFunction(embedding_functions.EmbeddingFunction):
+        def __init__(self):
+            pass
+
+        def __call__(self, input):
+            return encode(list(input)).tolist()
+
+    client = chromadb.EphemeralClient()
+    name = f"bench_{os.getpid()}"
+    collection = client.create_collection(name=name, embedding_function=StubEmbeddingFunction())
+    t0 = time.perf_counter()
+    sync_collection(client, collection, texts)
+    build = _stage(len(texts), time.perf_counter() - t0)
+    retriever = ChromaRetriever(client, collection, top_k=k)
+    lat = _timed_queries(retriever.query, queries)
+    query = _stage(len(queries), sum(lat), lat)
+    client.delete_collection(name)
+    return build, query
+
+
+def run_size(target: int, args) -> dict:
+    """All stages for one corpus of about ``target`` chunks."""
+    stages = {"start": {"peak_rss_mb": peak_rss_mb()}}
+
+    builder = ChunkStoreBuilder()
+    chunker = make_chunker(args.chunk_size, args.overlap, args.strategy)
+
+    def pages():
+        for p in synthetic_pages(args.seed):
+            if len(builder) >= target:
+                return
+            yield p
+    ingest = chunk_pages(pages(), chunker, builder)
+    store = builder.build()
+    n = len(store)
+    stages["chunk"] = _stage(n, ingest.elapsed_s, pages=ingest.pages, mb=round(ingest.bytes / 1e6, 2),
+                             mb_per_s=round(ingest.bytes / 1e6 / ingest.elapsed_s, 2))
+
+    encode = make_hash_embedder(args.dim) if args.embedder == "hash" else make_embedder(args.embedder)
+    t0 = time.perf_counter()
+    parts = []
+    for lo in range(0, n, args.embed_batch):
+        parts.append(np.asarray(encode([store.text(i) for i in range(lo, min(n, lo + args.embed_batch))]),
+                                dtype=np.float32))
+    xb = np.ascontiguousarray(np.concatenate(parts))
+    del parts
+    stages["embed"] = _stage(n, time.perf_counter() - t0, dim=int(xb.shape[1]))
+
+    t0 = time.perf_counter()
+    faiss.normalize_L2(xb)
+    index = build_vector_index(xb, kind=args.index_kind)
+    stages["index"] = _stage(n, time.perf_counter() - t0, kind=type(index).__name__)
+
+    t0 = time.perf_counter()
+    bm25 = BM25Index.build(store.texts(), lexical_tokenize)
+    stages["bm25"] = _stage(n, time.perf_counter() - t0)
+
+    qcache = get_query_embedding_cache()
+
+    def encode_queries(qs):
+        embs, qstats = qcache.encode(args.embedder, list(qs), encode)
+        mat = np.asarray(embs, dtype=np.float32)
+        return mat, np.ones(len(qs), dtype=bool), qstats
+
+    def retrieve(q):
+        hits, _ = search_chunks([q], args.k, store, index=index, bm25=bm25, encode=encode_queries)
+        return [store.text(i) for i, _s in hits[0]]
+
+    queries = synthetic_questions(args.queries, args.seed + 1)
+    lat = _timed_queries(retrieve, queries)
+    stages["search"] = _stage(len(queries), sum(lat), lat)
+
+    batch_queries = synthetic_questions(args.queries, args.seed + 2)
+    t0 = time.perf_counter()
+    search_chunks(batch_queries, args.k, store, index=index, bm25=bm25, encode=encode_queries)
+    stages["search_batch"] = _stage(len(batch_queries), time.perf_counter() - t0)
+
+    def answer(q):
+        contexts = retrieve(q)
+        if args.llm_ms:
+            time.sleep(args.llm_ms / 1000)
+        return generate_answer(q, contexts)
+    answer_queries = synthetic_questions(args.queries, args.seed + 3)
+    lat = _timed_queries(answer, answer_queries)
+    stages["answer"] = _stage(len(answer_queries), sum(lat), lat, llm_ms=args.llm_ms)
+
+    if 0 < n <= args.chroma_max:
+        try:
+            stages["chroma_build"], stages["chroma_query"] = _chroma_stages(
+                store.texts(), encode, synthetic_questions(args.queries, args.seed + 4), args.k)
+        except Exception as e:
+            stages["chroma_build"] = {"skipped": f"{type(e).__name__}: {e}"}
+    return {"chunks": n, "stages": stages, "peak_rss_mb": peak_rss_mb()}
+
+
+def _child(target: int, args, conn):
+    try:
+        conn.send(run_size(target, args))
+    except BaseException as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def run_isolated(target: int, args) -> dict:
+    """``run_size`` in a forked child so each size starts from the same RSS."""
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return run_size(target, args)
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_child, args=(target, args, child))
+    proc.start()
+    child.close()
+    try:
+        result = parent.recv()
+    except EOFError:
+        result = {"error": "benchmark process died (out of memory?)"}
+    proc.join()
+    return result
+
+
+def settings(args) -> dict:
+    return {k: getattr(args, k) for k in ("embedder", "dim", "index_kind", "chunk_size", "overlap", "strategy",
+                                          "k", "queries", "seed", "llm_ms")}
+
+
+def machine() -> dict:
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "faiss": getattr(faiss, "__version__", None), "numpy": np.__version__}
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_elapsed_s: float = 0.05):
+    """Regressions of ``results`` against ``baseline`` as (size, stage, metric, base, now, change).
+
+    Stages that took less than ``min_elapsed_s`` in the baseline are timer noise and
+    only their memory is compared.
+    """
+    out = []
+    for size, run in results["runs"].items():
+        base_run = baseline.get("runs", {}).get(size)
+        if not base_run or "stages" not in run or "stages" not in base_run:
+            continue
+        for stage, cur in run["stages"].items():
+            base = base_run["stages"].get(stage)
+            if not base or stage not in STAGES:
+                continue
+            checks = [("per_s", -1), ("p95_ms", 1)] if base.get("elapsed_s", 0) >= min_elapsed_s else []
+            checks.append(("peak_rss_mb", 1))
+            for metric, worse in checks:
+                b, c = base.get(metric), cur.get(metric)
+                if not b or c is None:
+                    continue
+                change = (c - b) / b
+                if change * worse > tolerance:
+                    out.append((size, stage, metric, b, c, change))
+    return out
+
+
+def print_run(size: str, run: dict):
+    if "error" in run:
+        print(f"{size}: {run['error']}")
+        return
+    print(f"\n{run['chunks']} chunks (target {size}), peak RSS {run['peak_rss_mb']} MB")
+    print(f"{'stage':<13} {'items':>9} {'unit':>8} {'elapsed_s':>10} {'per_s':>11} {'p50_ms':>8} {'p95_ms':>8} "
+          f"{'p99_ms':>8} {'rss_mb':>8}")
+    for stage, unit in STAGES.items():
+        d = run["stages"].get(stage)
+        if d is None:
+            continue
+        if "skipped" in d:
+            print(f"{stage:<13} skipped: {d['skipped']}")
+            continue
+        lat = "".join(f" {d[m]:>8.2f}" if m in d else f" {'':>8}" for m in ("p50_ms", "p95_ms", "p99_ms"))
+        print(f"{stage:<13} {d['items']:>9} {unit:>8} {d['elapsed_s']:>10.3f} {d['per_s'] or 0:>11.1f}{lat} "
+              f"{d['peak_rss_mb'] or 0:>8.0f}")
+
+
+def _write_json(path: str, data: dict):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="corpus sizes in chunks")
+    ap.add_argument("--embedder", default="hash", help="'hash' (offline stub) or an embedding model name")
+    ap.add_argument("--dim", type=int, default=384, help="vector size of the hash embedder")
+    ap.add_argument("--embed-batch", type=int, default=512)
+    ap.add_argument("--index-kind", default="auto", choices=INDEX_KINDS)
+    ap.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    ap.add_argument("--overlap", type=int, default=DEFAULT_CHUNK_OVERLAP)
+    ap.add_argument("--strategy", default=DEFAULT_CHUNK_STRATEGY)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--queries", type=int, default=200, help="queries per retrieval stage")
+    ap.add_argument("--llm-ms", type=float, default=0.0, help="simulated LLM latency per answer")
+    ap.add_argument("--chroma-max", type=int, default=20000, help="largest corpus also loaded into Chroma (0: never)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=DEFAULT_OUT, help="results JSON")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    ap.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown/growth")
+    ap.add_argument("--min-elapsed", type=float, default=0.05, help="ignore timings of stages faster than this (s)")
+    args = ap.parse_args()
+
+    results = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "machine": machine(), "settings": settings(args),
+               "runs": {}}
+    for size in args.sizes:
+        run = run_isolated(size, args)
+        results["runs"][str(size)] = run
+        print_run(str(size), run)
+    _write_json(args.out, results)
+    print(f"\nresults: {args.out}")
+
+    if args.update_baseline:
+        _write_json(args.baseline, results)
+        print(f"baseline updated: {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline} (create one with --update-baseline)")
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != results["settings"] or baseline.get("machine") != results["machine"]:
+        print("baseline was recorded with different settings or on a different machine; not comparing")
+        return
+    regressions = compare(results, baseline, args.tolerance, args.min_elapsed)
+    if not regressions:
+        print(f"no regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+        return
+    print(f"\n{len(regressions)} regression(s) against {args.baseline} (tolerance {args.tolerance:.0%}):")
+    for size, stage, metric, b, c, change in regressions:
+        print(f"  {size:>8} {stage:<13} {metric:<12} {b:>10.2f} -> {c:<10.2f} ({change:+.0%})")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Load test for the headless API (app/api.py): throughput, latency percentiles and
+overload rejections at increasing client concurrency.
+
+Against a running server:
+
+    python -m app.api --port 8000
+    python benchmarks/load_test_api.py --url http://127.0.0.1:8000 --endpoint search --concurrency 1 8 32 128
+
+Or self-hosted on a synthetic corpus (BM25 only unless sentence-transformers is
+installed), so it runs offline:
+
+    python benchmarks/load_test_api.py --serve --pages 5000 --endpoint mixed
+
+``answer`` requests only reach the LLM when OPENAI_API_KEY is set; without it they
+measure retrieval plus the snippet fallback. 503 responses are the API's concurrency
+limits shedding load, reported separately from errors.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+
+QUESTIONS = [
+    "How many days of annual leave do employees get?",
+    "How long is maternity leave?",
+    "When are travel expenses reimbursed?",
+    "Who does the code of conduct apply to?",
+    "What is the notice period for resignation?",
+    "Can unused leave be carried over?",
+    "How do I claim overtime?",
+    "What is the remote work policy?",
+]
+TOPICS = ["annual leave", "maternity leave", "travel expenses", "code of conduct", "notice period", "overtime",
+          "remote work", "sick leave", "training budget", "performance review"]
+
+
+def synthetic_pages(n: int, seed: int = 0):
+    from app.utils.ingest_pipeline import PageRecord
+
+    rng = random.Random(seed)
+    for i in range(n):
+        topic = rng.choice(TOPICS)
+        days = rng.randint(1, 60)
+        text = (f"Section {i}: {topic.title()}. Employees are entitled to {days} days under the {topic} policy. "
+                f"Requests about {topic} must be approved by a manager within {rng.randint(1, 14)} working days. "
+                + " ".join(rng.choice(TOPICS) for _ in range(20)))
+        yield PageRecord(f"handbook-{i % 20}.pdf", i // 20 + 1, text)
+
+
+def _serve_forever(pages: int, port: int):
+    import uvicorn
+
+    from app.api import create_app
+    from app.utils.engine import RagEngine
+
+    engine = RagEngine()
+    t0 = time.perf_counter()
+    res = engine.build(synthetic_pages(pages))
+    print(f"corpus: {res['chunks']} chunks ({res['mode']}) built in {time.perf_counter() - t0:.1f}s", flush=True)
+    uvicorn.run(create_app(engine, load_saved=False), host="127.0.0.1", port=port, log_level="warning")
+
+
+def serve(pages: int, port: int) -> str:
+    """Start the server in a child process (sharing this process's GIL with the load
+    generator would measure the generator) and wait until it answers."""
+    url = f"http://127.0.0.1:{port}"
+    proc = multiprocessing.Process(target=_serve_forever, args=(pages, port), daemon=True)
+    proc.start()
+    while True:
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return url
+        except httpx.HTTPError:
+            pass
+        if not proc.is_alive():
+            raise SystemExit("server process exited")
+        time.sleep(0.1)
+
+
+def _request(endpoint: str, rng: random.Random):
+    kind = rng.choice(["search", "answer"]) if endpoint == "mixed" else endpoint
+    q = rng.choice(QUESTIONS)
+    if kind == "search":
+        return "/search", {"query": q, "top_k": 5}
+    return "/answer", {"question": q, "top_k": 5}
+
+
+async def run_level(url: str, endpoint: str, concurrency: int, total: int, timeout_s: float):
+    latencies, codes = [], {}
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout_s) as client:
+        async def worker(wid: int):
+            rng = random.Random(wid)
+            for _ in counter:
+                path, body = _request(endpoint, rng)
+                t0 = time.perf_counter()
+                try:
+                    status = (await client.post(path, json=body)).status_code
+                except httpx.HTTPError:
+                    status = "conn_error"
+                if status == 200:
+                    latencies.append(time.perf_counter() - t0)
+                codes[status] = codes.get(status, 0) + 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        wall = time.perf_counter() - t0
+        limits_stats = (await client.get("/stats")).json().get("limits", {})
+    lat = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "ok": len(latencies),
+        "rps": len(latencies) / wall,
+        "p50": float(np.percentile(lat, 50)),
+        "p95": float(np.percentile(lat, 95)),
+        "p99": float(np.percentile(lat, 99)),
+        "shed": codes.get(503, 0),
+        "errors": sum(v for k, v in codes.items() if k not in (200, 503)),
+        "peak": max((s.get("peak_active", 0) for s in limits_stats.values()), default=0),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("--serve", action="store_true", help="start an in-process server on a synthetic corpus")
+    ap.add_argument("--pages", type=int, default=2000, help="synthetic pages with --serve")
+    ap.add_argument("--port", type=int, default=8765, help="port for --serve")
+    ap.add_argument("--endpoint", default="search", choices=["search", "answer", "mixed"])
+    ap.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32, 128])
+    ap.add_argument("--requests", type=int, default=500, help="requests per concurrency level")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    args = ap.parse_args()
+
+    url = serve(args.pages, args.port) if args.serve else args.url
+    print(f"{'clients':>8} {'ok':>6} {'req/s':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'shed':>6} "
+          f"{'errors':>6} {'peak':>5}")
+    for c in args.concurrency:
+        r = asyncio.run(run_level(url, args.endpoint, c, args.requests, args.timeout))
+        print(f"{c:>8} {r['ok']:>6} {r['rps']:>8.1f} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f} "
+              f"{r['shed']:>6} {r['errors']:>6} {r['peak']:>5}")
+
+
+if __name__ == "__main__":
+    main()
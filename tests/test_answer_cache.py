@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+
+from app.utils.answer_cache import AnswerCache, context_key, normalize_question
+
+
+def _ctx(*chunks, model="gpt-4o-mini", prompt="v1"):
+    return context_key(chunks, model, prompt)
+
+
+class TestAnswerCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = AnswerCache(max_entries=3, ttl_s=60, similarity=0.9)
+        self.ctx = _ctx((3, "Employees get 18 days of leave."), (7, "Leave requests go to HR."))
+
+    def test_exact_hit_on_normalized_question(self):
+        self.cache.put("How many leave days?", self.ctx, "18 days [chunk 3]", cost_s=1.5)
+        entry, sim = self.cache.get("  how many LEAVE days ", self.ctx)
+        self.assertEqual((entry.answer, sim), ("18 days [chunk 3]", 1.0))
+        self.assertEqual(normalize_question("How many leave-days?"), "how many leave days")
+        stats = self.cache.stats_dict()
+        self.assertEqual((stats["hits"], stats["misses"], stats["saved_s"]), (1, 0, 1.5))
+
+    def test_key_covers_chunks_model_and_prompt(self):
+        self.cache.put("q", self.ctx, "a")
+        same_set = _ctx((7, "Leave requests go to HR."), (3, "Employees get 18 days of leave."))
+        self.assertIsNotNone(self.cache.get("q", same_set))  # order does not matter
+        for other in [
+            _ctx((3, "Employees get 18 days of leave.")),
+            _ctx((3, "Employees get 20 days of leave."), (7, "Leave requests go to HR.")),  # same IDs, new text
+            _ctx((3, "Employees get 18 days of leave."), (7, "Leave requests go to HR."), model="gpt-4o"),
+            _ctx((3, "Employees get 18 days of leave."), (7, "Leave requests go to HR."), prompt="v2"),
+        ]:
+            self.assertIsNone(self.cache.get("q", other))
+
+    def test_semantic_hit_within_threshold(self):
+        self.cache.put("How many leave days?", self.ctx, "18 days", query_vector=[1.0, 0.0, 0.0])
+        entry, sim = self.cache.get("What is my annual leave allowance?", self.ctx, query_vector=[0.95, 0.2, 0.0])
+        self.assertEqual(entry.answer, "18 days")
+        self.assertGreater(sim, 0.9)
+        self.assertIsNone(self.cache.get("Who approves leave?", self.ctx, query_vector=[0.5, 0.8, 0.0]))
+        other_ctx = _ctx((9, "Maternity leave is 26 weeks."))
+        self.assertIsNone(self.cache.get("What is my leave allowance?", other_ctx, query_vector=[1.0, 0.0, 0.0]))
+        self.assertEqual(self.cache.stats.semantic_hits, 1)
+
+    def test_ttl_expiry(self):
+        self.cache.put("q", self.ctx, "a", query_vector=np.ones(4))
+        next(iter(self.cache._entries.values())).created_at -= 120
+        self.assertIsNone(self.cache.get("q", self.ctx, query_vector=np.ones(4)))
+        self.assertEqual((self.cache.stats.expirations, len(self.cache)), (1, 0))
+
+    def test_lru_eviction_and_invalidate(self):
+        for q in ["a", "b", "c"]:
+            self.cache.put(q, self.ctx, q.upper())
+        self.cache.get("a", self.ctx)  # refresh "a"; "b" is now least recent
+        self.cache.put("d", self.ctx, "D")
+        self.assertIsNone(self.cache.get("b", self.ctx))
+        self.assertIsNotNone(self.cache.get("a", self.ctx))
+        self.assertEqual(self.cache.stats.evictions, 1)
+        self.cache.invalidate("index rebuilt")
+        self.assertIsNone(self.cache.get("a", self.ctx))
+        self.assertEqual(self.cache.stats_dict()["entries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from starlette.testclient import TestClient
+
+from app.api import ConcurrencyLimiter, Overloaded, create_app
+from app.utils.engine import RagEngine
+from app.utils.jobs import JobManager
+
+from test_engine import PAGES, hash_embed
+from test_pdf_utils import _pdf
+
+
+class TestApi(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.jobs = JobManager(workers=1)
+        self.engine = RagEngine(embed_model="hash-64", embed_fn=hash_embed, artifact_dir=self._tmp.name,
+                                jobs=self.jobs)
+        self.client = TestClient(create_app(self.engine))
+
+    def tearDown(self):
+        self.client.close()
+        self.jobs.shutdown()
+        self._tmp.cleanup()
+
+    def test_search_and_answer(self):
+        self.assertEqual(self.client.post("/search", json={"query": "leave"}).status_code, 409)  # nothing ingested
+        self.engine.build(PAGES, chunk_size=200, overlap=0)
+        r = self.client.post("/search", json={"queries": ["maternity leave weeks"], "top_k": 2,
+                                              "sources": ["leave.pdf"]})
+        self.assertEqual(r.status_code, 200)
+        body = r.json()
+        self.assertEqual(body["results"][0][0]["page"], 2)
+        self.assertEqual(body["stats"]["filter"]["rows"], 2)
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": ""}):
+            r = self.client.post("/answer", json={"question": "How long is maternity leave?"})
+        self.assertEqual(r.status_code, 200)
+        self.assertIn("26 weeks", r.json()["answer"])
+        limits = self.client.get("/stats").json()["limits"]
+        self.assertEqual((limits["search"]["served"], limits["answer"]["served"]), (2, 1))
+
+    def test_validation_errors(self):
+        for body in [{}, {"queries": []}, {"query": "x", "top_k": 0}, {"query": "x", "pages": [1]},
+                     {"query": "x", "sources": "a.pdf"}]:
+            self.assertEqual(self.client.post("/search", json=body).status_code, 400, body)
+        self.assertEqual(self.client.post("/search", content=b"not json").status_code, 400)
+        self.assertEqual(self.client.post("/answer", json={"question": " "}).status_code, 400)
+        self.assertEqual(self.client.post("/ingest", data={"chunk_size": "100"}).status_code, 400)
+        self.assertEqual(self.client.get("/jobs/nope").status_code, 404)
+
+    def test_engine_runtime_errors_are_503(self):
+        self.engine.build(PAGES, chunk_size=200, overlap=0)
+        with mock.patch.object(self.engine, "search", side_effect=RuntimeError("index unreadable")):
+            r = self.client.post("/search", json={"query": "leave"})
+            self.assertEqual(r.status_code, 503)
+            self.assertIn("index unreadable", r.json()["error"])
+            self.assertEqual(self.client.post("/answer", json={"question": "leave?"}).status_code, 503)
+
+    def test_ingest_can_be_disabled(self):
+        with TestClient(create_app(self.engine, enable_ingest=False)) as client:
+            pdf = _pdf(["Annual leave is 18 days per year."])
+            r = client.post("/ingest", files=[("files", ("leave.pdf", pdf, "application/pdf"))])
+            self.assertEqual(r.status_code, 403)
+            self.assertIn("python -m app.ingest", r.json()["error"])
+
+    def test_ingest_job_then_search(self):
+        pdf = _pdf(["Annual leave is 18 days per year.", "Sick leave needs a doctor's note."])
+        r = self.client.post("/ingest", files=[("files", ("leave.pdf", pdf, "application/pdf"))],
+                             data={"chunk_size": "200", "overlap": "0"})
+        self.assertEqual(r.status_code, 202)
+        job_id = r.json()["job_id"]
+        self.jobs.wait(job_id, timeout=30)
+        status = self.client.get(f"/jobs/{job_id}").json()
+        self.assertEqual(status["status"], "done", status)
+        self.assertEqual(status["result"]["chunks"], 2)
+        self.assertIsNotNone(status["result"]["version"])
+        hits = self.client.post("/search", json={"query": "doctor note", "top_k": 1}).json()["results"][0]
+        self.assertEqual(hits[0]["page"], 2)
+
+
+class TestConcurrencyLimiter(unittest.TestCase):
+    def test_queue_bound_and_timeout(self):
+        async def scenario():
+            lim = ConcurrencyLimiter("search", limit=1, max_waiting=1, timeout_s=0.05)
+            gate = asyncio.Event()
+
+            async def hold():
+                async with lim.slot():
+                    await gate.wait()
+
+            holder = asyncio.create_task(hold())
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(hold())  # queues behind the holder
+            await asyncio.sleep(0)
+            with self.assertRaises(Overloaded):  # the queue is full
+                async with lim.slot():
+                    pass
+            with self.assertRaises(Overloaded):  # the waiter times out
+                await waiter
+            gate.set()
+            await holder
+            return lim.stats()
+
+        stats = asyncio.run(scenario())
+        self.assertEqual((stats["served"], stats["rejected"], stats["peak_active"], stats["active"]), (1, 2, 1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
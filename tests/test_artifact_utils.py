@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+import faiss
+import numpy as np
+
+from app.utils import artifact_utils
+from app.utils.artifact_utils import current_version, load_artifact, save_artifact
+from app.utils.chunk_store import ChunkStore
+from app.utils.index_utils import build_vector_index
+
+
+class TestArtifactUtils(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+        self.store = ChunkStore.build(["leave policy", "Überstunden", "conduct"], ["a.pdf", "b.pdf", "a.pdf"],
+                                      pages=[1, 2, 3])
+        xb = np.random.default_rng(0).standard_normal((3, 8)).astype("float32")
+        faiss.normalize_L2(xb)
+        self.store.set_embeddings(xb)
+        self.index = build_vector_index(xb, kind="flat")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_round_trip_is_memory_mapped_and_shared(self):
+        version = save_artifact(self.index, self.store, root=self.root, embedding_model="m")
+        self.assertEqual(current_version(self.root), version)
+        index, store, manifest = load_artifact(self.root)
+        self.assertEqual((manifest["n_chunks"], manifest["dim"], manifest["embedding_model"]), (3, 8, "m"))
+        self.assertEqual([c.text for c in store], ["leave policy", "Überstunden", "conduct"])
+        self.assertEqual(store[1].meta, {"page": 2})
+        self.assertIsInstance(store.embeddings, np.memmap)
+        self.assertFalse(faiss.downcast_index(index).codes.is_owned)  # vectors mapped, not copied
+        _, ids = index.search(store.embedding_matrix()[:1].copy(), 1)
+        self.assertEqual(ids[0][0], 0)
+        self.assertIs(load_artifact(self.root)[1], store)
+
+    def test_hnsw_and_ivf_indexes_are_memory_mapped(self):
+        xb = np.random.default_rng(1).standard_normal((400, 8)).astype("float32")
+        faiss.normalize_L2(xb)
+        store = ChunkStore.build([f"chunk {i}" for i in range(400)], ["a.pdf"] * 400)
+        store.set_embeddings(xb)
+        for kind in ("hnsw", "ivf_flat"):
+            with self.subTest(kind=kind):
+                root = os.path.join(self.root, kind)
+                save_artifact(build_vector_index(xb, kind=kind, nlist=4), store, root=root)
+                index = faiss.downcast_index(load_artifact(root)[0])
+                if kind == "hnsw":
+                    self.assertFalse(faiss.downcast_index(index.storage).codes.is_owned)
+                else:
+                    lists = faiss.downcast_InvertedLists(index.invlists)
+                    self.assertTrue(isinstance(lists, faiss.OnDiskInvertedLists) or not lists.codes.at(0).is_owned)
+                _, ids = index.search(xb[:1], 1)
+                self.assertEqual(ids[0][0], 0)
+
+    def test_old_versions_are_pruned(self):
+        for _ in range(4):
+            save_artifact(self.index, self.store, root=self.root)
+        versions = [d for d in os.listdir(self.root) if d.startswith("v")]
+        self.assertEqual(len(versions), artifact_utils.ARTIFACT_KEEP_VERSIONS)
+
+    def test_missing_artifact(self):
+        self.assertIsNone(load_artifact(os.path.join(self.root, "nothing")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import tempfile
+import unittest
+
+from app.utils.artifact_utils import load_artifact, read_manifest
+from app.utils.bulk_ingest import bulk_ingest, discover_pdfs
+
+from test_engine import hash_embed
+from test_pdf_utils import _pdf
+
+
+class TestBulkIngest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        root = self._tmp.name
+        self.src, self.out, self.work = (os.path.join(root, d) for d in ("pdfs", "index", "work"))
+        os.makedirs(os.path.join(self.src, "hr"))
+        self._write("hr/leave.pdf", ["Annual leave is 18 days per year.", "Sick leave needs a note."])
+        self._write("travel.pdf", ["Travel claims are paid within 30 days."])
+        self._write("conduct.pdf", ["The code of conduct applies to everyone."])
+        self._write("notes.txt", None)
+        self.embedded = []
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _write(self, rel, pages):
+        with open(os.path.join(self.src, rel), "wb") as f:
+            f.write(_pdf(pages) if pages else b"not a pdf")
+
+    def _embed(self, texts):
+        self.embedded.extend(texts)
+        return hash_embed(texts)
+
+    def _run(self, **kw):
+        return bulk_ingest(self.src, out_dir=self.out, work_dir=self.work, embed_model="hash-64", embed_fn=self._embed,
+                           chunk_size=200, overlap=0, files_per_shard=2, workers=1, **kw)
+
+    def test_builds_loadable_artifact_with_stage_stats(self):
+        self.assertEqual([f.name for f in discover_pdfs(self.src)], ["conduct.pdf", "hr/leave.pdf", "travel.pdf"])
+        summary = self._run()
+        self.assertEqual((summary["chunks"], summary["shards_written"]), (4, 2))
+        stages = summary["stages"]
+        self.assertEqual((stages["read"]["items"], stages["extract"]["items"], stages["embed"]["items"]), (3, 4, 4))
+        index, store, manifest = load_artifact(self.out, mmap=False)
+        self.assertEqual((index.ntotal, len(store), manifest["embedding_model"]), (4, 4, "hash-64"))
+        self.assertEqual(sorted(set(store.source_names)), ["conduct.pdf", "hr/leave.pdf", "travel.pdf"])
+        self.assertEqual(store.chunk_ids.tolist(), [0, 1, 2, 3])
+        self.assertEqual(read_manifest(self.out)["bulk_ingest"]["chunks"], 4)
+
+    def test_resume_after_interruption_and_incremental_rerun(self):
+        calls = []
+
+        def flaky(texts):
+            calls.append(len(texts))
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return self._embed(texts)
+
+        with self.assertRaises(KeyboardInterrupt):
+            bulk_ingest(self.src, out_dir=self.out, work_dir=self.work, embed_model="hash-64", embed_fn=flaky,
+                        chunk_size=200, overlap=0, files_per_shard=2, workers=1)
+        self.assertIsNone(load_artifact(self.out))
+        self.embedded.clear()
+        summary = self._run()  # only the unfinished group is redone
+        self.assertEqual((summary["files_skipped"], summary["shards_reused"], summary["chunks"]), (2, 1, 4))
+        self.assertEqual(self.embedded, ["Travel claims are paid within 30 days."])
+
+        self.embedded.clear()
+        self.assertEqual(self._run()["shards_written"], 0)
+        self.assertEqual(self.embedded, [])
+        self._write("travel.pdf", ["Travel claims are paid within 14 days."])
+        summary = self._run()
+        self.assertEqual(self.embedded, ["Travel claims are paid within 14 days."])
+        _, store, _ = load_artifact(self.out, mmap=False)
+        self.assertIn("Travel claims are paid within 14 days.", store.texts())
+        self.assertNotIn("Travel claims are paid within 30 days.", store.texts())
+
+    def test_deleting_the_first_copy_of_a_duplicate_keeps_the_other(self):
+        self._write("zz.pdf", ["Annual leave is 18 days per year.", "Zebra crossings are marked."])
+        summary = self._run()  # zz.pdf's first page duplicates hr/leave.pdf in the previous shard
+        self.assertEqual((summary["duplicates"], summary["chunks"]), (1, 5))
+        os.remove(os.path.join(self.src, "hr", "leave.pdf"))
+        self.embedded.clear()
+        summary = self._run()
+        self.assertEqual(summary["files_skipped"], 0)
+        _, store, _ = load_artifact(self.out, mmap=False)
+        self.assertIn("Annual leave is 18 days per year.", store.texts())
+        self.assertEqual(sorted(set(store.source_names)), ["conduct.pdf", "travel.pdf", "zz.pdf"])
+        self.assertEqual(len(store), 4)
+
+    def test_failed_embeddings_are_counted_and_retried(self):
+        def partial(texts):
+            vecs = list(self._embed(texts))
+            return [None if t.startswith("Sick") else v for t, v in zip(texts, vecs)]
+
+        summary = bulk_ingest(self.src, out_dir=self.out, work_dir=self.work, embed_model="hash-64",
+                              embed_fn=partial, chunk_size=200, overlap=0, files_per_shard=2, workers=1)
+        self.assertEqual((summary["failed_chunks"], summary["files_retry"], summary["shards_written"]), (1, 2, 1))
+        self.assertEqual(summary["chunks"], 4)
+        _, store, _ = load_artifact(self.out, mmap=False)
+        self.assertEqual(int(store.valid.sum()), 3)
+
+        self.embedded.clear()
+        summary = self._run()  # the shard with the failed chunk is embedded again
+        self.assertEqual((summary["failed_chunks"], summary["files_skipped"], summary["shards_written"]), (0, 1, 1))
+        self.assertIn("Sick leave needs a note.", self.embedded)
+        self.assertNotIn("Travel claims are paid within 30 days.", self.embedded)
+        _, store, _ = load_artifact(self.out, mmap=False)
+        self.assertEqual((len(store), int(store.valid.sum())), (4, 4))
+
+    def test_changed_settings_need_fresh(self):
+        self._run()
+        with self.assertRaises(ValueError):
+            bulk_ingest(self.src, out_dir=self.out, work_dir=self.work, embed_model="hash-64", embed_fn=self._embed,
+                        chunk_size=300, overlap=0, files_per_shard=2, workers=1)
+        self.assertEqual(self._run(fresh=True)["files_skipped"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
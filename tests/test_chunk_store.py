@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+
+from app.utils.chunk_store import Chunk, ChunkStore
+
+
+class TestChunkStore(unittest.TestCase):
+    def setUp(self):
+        self.store = ChunkStore.build(
+            ["Leave policy", "Überstunden ✈", "Code of conduct"],
+            ["a.pdf", "b.pdf", "a.pdf"],
+            pages=[1, 2, None],
+        )
+
+    def test_row_views(self):
+        self.assertEqual(len(self.store), 3)
+        c = self.store[1]
+        self.assertEqual((c.chunk_id, c.text, c.source, c.meta), (1, "Überstunden ✈", "b.pdf", {"page": 2}))
+        self.assertIsNone(self.store[2].meta)
+        self.assertEqual([c.text for c in self.store[:2]], ["Leave policy", "Überstunden ✈"])
+        self.assertEqual(self.store[-1].text, "Code of conduct")
+        self.assertEqual(self.store.source_names, ["a.pdf", "b.pdf"])
+        self.assertEqual(self.store.rows_for_sources(["a.pdf"]).tolist(), [0, 2])
+
+    def test_row_mask_by_source_and_pages(self):
+        self.assertEqual(self.store.row_mask().tolist(), [True, True, True])
+        self.assertEqual(self.store.row_mask(sources=["a.pdf"]).tolist(), [True, False, True])
+        self.assertEqual(self.store.row_mask(pages=(2, 5)).tolist(), [False, True, False])
+        self.assertEqual(self.store.row_mask(sources=["a.pdf", "missing.pdf"], pages=(1, 1)).tolist(), [True, False, False])
+
+    def test_embeddings_matrix_and_partial_lists(self):
+        self.store.set_embeddings(np.arange(6, dtype=np.float64).reshape(3, 2))
+        self.assertEqual(self.store.embeddings.dtype, np.float32)
+        self.assertEqual(self.store.dim, 2)
+        self.store.set_embeddings([[1.0, 2.0], None, [3.0, 4.0]], dtype="float16")
+        self.assertEqual(self.store.valid.tolist(), [True, False, True])
+        m = self.store.embedding_matrix()
+        self.assertEqual(m.dtype, np.float32)
+        self.assertEqual(m[1].tolist(), [0.0, 0.0])
+        with self.assertRaises(ValueError):
+            self.store.set_embeddings(np.zeros((2, 2)))
+
+    def test_from_chunks_round_trip(self):
+        chunks = [Chunk(chunk_id=7, text="x", source="s", embedding=[0.5], meta={"page": 3, "k": "v"})]
+        store = ChunkStore.from_chunks(chunks)
+        c = store[0]
+        self.assertEqual((c.chunk_id, c.meta), (7, {"k": "v", "page": 3}))
+        self.assertEqual(store.embeddings.tolist(), [[0.5]])
+
+
+if __name__ == "__main__":
+    unittest.main()
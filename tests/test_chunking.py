@@ -0,0 +1,121 @@
+import unittest
+import uuid
+from unittest import mock
+
+import chromadb
+
+from app.utils import chunking
+from app.utils.chunk_store import ChunkStoreBuilder
+from app.utils.chunking import (
+    CHUNK_STRATEGIES, chunk_spans, chunk_text, make_chunker, sentence_units, split_documents, word_token_spans,
+)
+from app.utils.ingest_pipeline import PageRecord, chunk_pages, iter_chunks
+from app.utils.retriever_utils import build_retriever
+
+from test_retriever_utils import _CountingEmbeddingFunction
+
+POLICY = """LEAVE POLICY
+4.1 Annual leave
+Employees accrue 1.5 days of annual leave per month of service. Leave must be approved by the line manager
+before it is taken! Unused leave may be carried over, capped at ten days per calendar year.
+1. Apply through the HR portal at least two weeks in advance.
+4.2 Sick leave
+A medical certificate is required after three consecutive days of absence. Contact HR for details.
+
+SECTION 5 Travel
+Economy class is the default for flights under six hours; business class needs director approval.
+""" * 3
+
+
+def _slice_reference(text, size, overlap, min_chars=20):
+    """Straightforward slicing implementation the offset version must agree with."""
+    out, start = [], 0
+    while start < len(text):
+        piece = text[start:start + size].strip()
+        if len(piece) >= min_chars:
+            out.append(piece)
+        if start + size >= len(text):
+            break
+        start += max(1, size - overlap)
+    return out
+
+
+class TestStrategies(unittest.TestCase):
+    def test_char_matches_slicing_reference(self):
+        for size, overlap in ((100, 0), (100, 20), (37, 36), (400, 50)):
+            self.assertEqual(chunk_text(POLICY, size, overlap, "char"), _slice_reference(POLICY, size, overlap))
+
+    def test_overlap_not_smaller_than_size_terminates(self):
+        self.assertTrue(chunk_text("x" * 1000, 50, 80, "char"))
+
+    def test_spans_are_trimmed_offsets(self):
+        for strategy in CHUNK_STRATEGIES:
+            for lo, hi in chunk_spans(POLICY, 120, 30, strategy, tokenizer=word_token_spans):
+                self.assertFalse(POLICY[lo].isspace() or POLICY[hi - 1].isspace())
+                self.assertGreaterEqual(hi - lo, 20)
+
+    def test_token_windows_respect_token_budget(self):
+        chunks = chunk_text(POLICY, 25, 5, "token", tokenizer=word_token_spans)
+        self.assertTrue(all(len(word_token_spans(c)) <= 25 for c in chunks))
+        joined_tokens = sum(len(word_token_spans(c)) for c in chunks)
+        self.assertGreater(joined_tokens, len(word_token_spans(POLICY)))  # overlap repeats tokens
+
+    def test_sentence_strategy_breaks_at_headings_and_sentences(self):
+        headings = [POLICY[a:b] for a, b, h in sentence_units(POLICY) if h]
+        self.assertIn("4.1 Annual leave", headings)
+        self.assertIn("SECTION 5 Travel", headings)
+        self.assertNotIn("1. Apply through the HR portal at least two weeks in advance.", headings)
+        chunks = chunk_text(POLICY, 300, 60, "sentence")
+        self.assertTrue(any(c.startswith("4.2 Sick leave") for c in chunks))
+        for c in chunks:
+            self.assertTrue(c[-1] in ".!" or c.endswith("Travel"), c)
+
+    def test_token_fallback_is_labelled(self):
+        with mock.patch.object(chunking, "tiktoken", None):
+            self.assertEqual(chunking.token_counter(), "regex words")
+            self.assertIn("tiktoken not installed", chunking.strategy_label("token"))
+            self.assertIs(chunking.default_tokenizer(), word_token_spans)
+            self.assertEqual(chunking.size_unit("token"), "words")
+        with mock.patch.object(chunking, "tiktoken", object()):
+            self.assertEqual(chunking.strategy_label("token"), "Tokens")
+            self.assertEqual(chunking.size_unit("token"), "tokens")
+        self.assertEqual(chunking.strategy_label("char"), "Characters")
+        self.assertEqual((chunking.size_unit("char"), chunking.size_unit("sentence")), ("chars", "chars"))
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            chunk_text(POLICY, 100, 0, "paragraph")
+
+
+class TestSameChunksEverywhere(unittest.TestCase):
+    """Step 2 (FAISS), the Process PDFs flow and the Chroma retriever must agree."""
+
+    docs = [POLICY, POLICY.upper()[:900]]
+
+    def test_pipelines_produce_identical_chunks(self):
+        for strategy in CHUNK_STRATEGIES:
+            with self.subTest(strategy=strategy):
+                pages = [PageRecord(f"doc{i}.pdf", 1, d) for i, d in enumerate(self.docs)]
+                chunker = make_chunker(strategy=strategy)
+
+                builder = ChunkStoreBuilder()  # app_steps Step 2 (FAISS)
+                chunk_pages(iter(pages), chunker, builder)
+                faiss_chunks = builder.build().texts()
+                patch_chunks = [c.text for c in iter_chunks(iter(pages), chunker)]  # app_steps_patch (FAISS)
+                chroma_chunks = split_documents(self.docs, strategy=strategy)  # app.py (Chroma)
+
+                self.assertTrue(faiss_chunks)
+                self.assertEqual(faiss_chunks, patch_chunks)
+                self.assertEqual(faiss_chunks, chroma_chunks)
+
+    def test_chroma_collection_holds_the_same_chunks(self):
+        retriever = build_retriever(self.docs, client=chromadb.EphemeralClient(),
+                                    embedding_fn=_CountingEmbeddingFunction(),
+                                    collection_name=f"test-{uuid.uuid4().hex[:8]}")
+        builder = ChunkStoreBuilder()
+        chunk_pages((PageRecord("doc.pdf", 1, d) for d in self.docs), make_chunker(), builder)
+        self.assertEqual(sorted(retriever.collection.get()["documents"]), sorted(builder.build().texts()))
+
+
+if __name__ == "__main__":
+    unittest.main()
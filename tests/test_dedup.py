@@ -0,0 +1,85 @@
+import unittest
+
+from app.utils.chunk_store import ChunkStoreBuilder
+from app.utils.dedup import Deduplicator, dedup_texts, jaccard_estimate, minhash
+from app.utils.ingest_pipeline import PageRecord, chunk_pages
+
+FOOTER = ("Confidential. This handbook is provided for information only and does not form part of any "
+          "contract of employment. Acme Corp reserves the right to amend these policies at any time, with or "
+          "without notice, subject to applicable law. Questions should be directed to your HR business partner "
+          "through the HR portal. Page {} of 40")
+BODY = [
+    "Employees accrue 1.5 days of annual leave per month of service, up to 18 days per year.",
+    "Remote work requests must be approved by the line manager and reviewed every six months.",
+    "Expense claims are submitted within 30 days with itemized receipts attached to the claim form.",
+]
+
+
+class TestMinHash(unittest.TestCase):
+    def test_signature_agreement_tracks_similarity(self):
+        a = minhash(FOOTER.format(3))
+        self.assertGreaterEqual(jaccard_estimate(a, minhash(FOOTER.format(17))), 0.8)
+        self.assertGreaterEqual(jaccard_estimate(a, minhash(FOOTER.format(3).replace("amend", "change"))), 0.8)
+        self.assertLess(jaccard_estimate(minhash(BODY[0]), minhash(BODY[1])), 0.2)
+
+    def test_deterministic(self):
+        self.assertTrue((minhash(BODY[0]) == minhash(BODY[0])).all())
+
+
+class TestDeduplicator(unittest.TestCase):
+    def test_exact_near_and_unique(self):
+        d = Deduplicator("near", threshold=0.8)
+        self.assertEqual(d.check(FOOTER.format(1)), (None, 0))
+        self.assertEqual(d.check(BODY[0]), (None, 1))
+        self.assertEqual(d.check("  " + FOOTER.format(1).upper() + "\n"), ("exact", 0))
+        self.assertEqual(d.check(FOOTER.format(2)), ("near", 0))
+        self.assertEqual(d.check(BODY[1]), (None, 2))
+        s = d.stats.as_dict()
+        self.assertEqual((s["seen"], s["kept"], s["exact"], s["near"]), (5, 3, 1, 1))
+        self.assertEqual(s["embeddings_saved"], 2)
+        self.assertEqual(s["saved_pct"], 40.0)
+
+    def test_exact_mode_keeps_near_duplicates(self):
+        keep, stats = dedup_texts([FOOTER.format(1), FOOTER.format(2), FOOTER.format(1)], mode="exact")
+        self.assertEqual(keep, [0, 1])
+        self.assertEqual((stats.exact, stats.near), (1, 0))
+
+    def test_off_keeps_everything(self):
+        keep, stats = dedup_texts([BODY[0], BODY[0]], mode="off")
+        self.assertEqual(keep, [0, 1])
+        self.assertEqual(stats.dropped, 0)
+
+    def test_short_chunks_only_deduped_exactly(self):
+        keep, _ = dedup_texts(["Section 4.2 Leave", "Section 4.3 Leave", "Section 4.2 Leave"])
+        self.assertEqual(keep, [0, 1])
+
+    def test_same_template_clauses_with_different_numbers_survive(self):
+        clause = ("{} are entitled to {} days of paid annual leave per calendar year. Leave accrues monthly, "
+                  "must be requested through the HR portal at least two weeks in advance and is approved by the "
+                  "line manager. Unused leave may be carried over into the first quarter of the following year "
+                  "with written approval.")
+        clauses = [clause.format("Employees", 18), clause.format("Contractors", 10), clause.format("Employees", 20)]
+        self.assertGreaterEqual(jaccard_estimate(minhash(clauses[0]), minhash(clauses[2])), 0.85)
+        self.assertEqual(dedup_texts(clauses)[0], [0, 1, 2])
+        self.assertEqual(dedup_texts(clauses, mode="near")[0], [0, 1, 2])
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            Deduplicator("fuzzy")
+
+
+class TestDedupIngest(unittest.TestCase):
+    def test_chunk_pages_drops_repeated_boilerplate(self):
+        pages = [PageRecord("handbook.pdf", i + 1, BODY[i % 3] + "|" + FOOTER.format(i + 1)) for i in range(30)]
+        builder = ChunkStoreBuilder()
+        dedup = Deduplicator("near", threshold=0.8)
+        stats = chunk_pages(pages, lambda t: t.split("|"), builder, dedup=dedup)
+        store = builder.build()
+        self.assertEqual(store.texts(), [BODY[0], FOOTER.format(1), BODY[1], BODY[2]])
+        self.assertEqual(store.pages.tolist(), [1, 1, 2, 3])
+        self.assertEqual((stats.chunks, stats.duplicates), (4, 56))
+        self.assertEqual((dedup.stats.exact, dedup.stats.near), (27, 29))
+
+
+if __name__ == "__main__":
+    unittest.main()
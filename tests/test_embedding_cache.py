@@ -0,0 +1,81 @@
+import multiprocessing
+import tempfile
+import unittest
+
+import numpy as np
+
+from app.utils.embedding_cache import EmbeddingCache, embed_with_cache
+
+
+def _encoder(calls):
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([[float(len(t)), 1.0, 2.0] for t in texts], dtype=np.float32)
+    return encode
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cache = EmbeddingCache(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_only_misses_are_encoded(self):
+        calls = []
+        first, stats = embed_with_cache(["alpha", "beta"], "m", _encoder(calls), self.cache)
+        self.assertEqual((stats.hits, stats.misses), (0, 2))
+        second, stats = embed_with_cache(["beta", "gamma  ", "alpha"], "m", _encoder(calls), self.cache)
+        self.assertEqual(calls[-1], ["gamma  "])
+        self.assertEqual((stats.hits, stats.misses), (2, 1))
+        self.assertEqual(stats.bytes_saved, 2 * 3 * 4)
+        np.testing.assert_array_equal(second[0], first[1])
+        np.testing.assert_array_equal(second[2], first[0])
+
+    def test_whitespace_normalized_and_duplicates_encoded_once(self):
+        calls = []
+        embed_with_cache(["a  b", "a b", "a\nb"], "m", _encoder(calls), self.cache)
+        self.assertEqual(len(calls[0]), 1)
+        _, stats = embed_with_cache([" a b "], "m", _encoder(calls), self.cache)
+        self.assertEqual(stats.hits, 1)
+
+    def test_models_are_separate_namespaces_and_persist(self):
+        calls = []
+        embed_with_cache(["x"], "m1", _encoder(calls), self.cache)
+        embed_with_cache(["x"], "m2", _encoder(calls), self.cache)
+        self.assertEqual(len(calls), 2)
+        reopened = EmbeddingCache(self._tmp.name)
+        _, stats = embed_with_cache(["x"], "m1", _encoder(calls), reopened)
+        self.assertEqual(stats.hits, 1)
+
+
+def _store_worker(root, offset, rounds):
+    cache = EmbeddingCache(root)
+    for r in range(rounds):
+        ids = [offset + r * 10 + j for j in range(10)]
+        cache.store("m", [f"text {i}" for i in ids], np.array([[float(i)] * 4 for i in ids], dtype=np.float32))
+
+
+class TestEmbeddingCacheProcesses(unittest.TestCase):
+    def test_concurrent_writers_keep_keys_on_their_own_rows(self):
+        if "fork" not in multiprocessing.get_all_start_methods():
+            self.skipTest("needs fork")
+        ctx = multiprocessing.get_context("fork")
+        with tempfile.TemporaryDirectory() as root:
+            EmbeddingCache(root)  # create the schema before the writers race
+            procs = [ctx.Process(target=_store_worker, args=(root, w * 10000, 30)) for w in range(3)]
+            for p in procs:
+                p.start()
+            for p in procs:
+                p.join()
+            self.assertTrue(all(p.exitcode == 0 for p in procs))
+            ids = [w * 10000 + i for w in range(3) for i in range(300)]
+            hits, missing = EmbeddingCache(root).lookup("m", [f"text {i}" for i in ids])
+            self.assertEqual(missing, [])
+            for pos, i in enumerate(ids):
+                self.assertEqual(float(hits[pos][0]), float(i))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import threading
+import unittest
+from types import SimpleNamespace
+
+from app.utils.embedding_utils import embed_openai_batched, make_batches
+
+
+class _RateLimit(Exception):
+    status_code = 429
+
+
+class _FakeEmbeddings:
+    def __init__(self, fail_first=0, fail_always_on=None):
+        self.calls = 0
+        self.fail_first = fail_first
+        self.fail_always_on = fail_always_on
+        self._lock = threading.Lock()
+
+    def create(self, input, model):
+        with self._lock:
+            self.calls += 1
+            n = self.calls
+        if n <= self.fail_first:
+            raise _RateLimit("Error code: 429 - rate limit")
+        if self.fail_always_on is not None and self.fail_always_on in input:
+            raise ValueError("bad input")
+        # return out of order to check index-based reassembly
+        data = [SimpleNamespace(index=i, embedding=[float(len(t))]) for i, t in enumerate(input)]
+        return SimpleNamespace(data=list(reversed(data)))
+
+
+class TestEmbeddingUtils(unittest.TestCase):
+    def test_make_batches_respects_item_and_token_budget(self):
+        texts = ["x" * 40] * 10  # ~10 tokens each
+        self.assertEqual([len(b) for b in make_batches(texts, max_items=4, max_tokens=1000)], [4, 4, 2])
+        self.assertEqual([len(b) for b in make_batches(texts, max_items=100, max_tokens=25)], [2, 2, 2, 2, 2])
+        flat = [i for b in make_batches(texts, max_items=3, max_tokens=1000) for i in b]
+        self.assertEqual(flat, list(range(10)))
+
+    def test_batches_and_preserves_order(self):
+        client = SimpleNamespace(embeddings=_FakeEmbeddings())
+        texts = ["a" * (i + 1) for i in range(7)]
+        res = embed_openai_batched(client, texts, max_items=3, max_workers=2)
+        self.assertEqual(res.embeddings, [[float(i + 1)] for i in range(7)])
+        self.assertEqual(res.requests, 3)
+        self.assertTrue(res.ok)
+
+    def test_retries_rate_limited_batches(self):
+        client = SimpleNamespace(embeddings=_FakeEmbeddings(fail_first=2))
+        res = embed_openai_batched(client, ["a", "bb"], max_items=10, max_workers=1, sleep=lambda s: None)
+        self.assertTrue(res.ok)
+        self.assertEqual(res.retries, 2)
+
+    def test_keeps_partial_results_on_failure(self):
+        client = SimpleNamespace(embeddings=_FakeEmbeddings(fail_always_on="bad"))
+        res = embed_openai_batched(client, ["a", "bb", "bad", "cccc"], max_items=2, max_workers=2,
+                                   sleep=lambda s: None)
+        self.assertEqual(res.embeddings, [[1.0], [2.0], None, None])
+        self.assertEqual(res.failed_batches, 1)
+        self.assertEqual(res.failed, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
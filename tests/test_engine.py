@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from app.utils import engine as engine_mod
+from app.utils.chunk_store import ChunkStoreBuilder
+from app.utils.engine import RagEngine, search_chunks
+from app.utils.index_utils import build_vector_index
+from app.utils.ingest_pipeline import PageRecord
+from app.utils.jobs import JobManager
+from app.utils.query_cache import QueryCacheStats
+
+from test_pdf_utils import _pdf
+
+PAGES = [
+    PageRecord("leave.pdf", 1, "Annual leave is 18 days per year for full-time employees."),
+    PageRecord("leave.pdf", 2, "Maternity leave lasts 26 weeks with full pay."),
+    PageRecord("travel.pdf", 1, "Travel expenses are reimbursed within 30 days of the claim."),
+    PageRecord("conduct.pdf", 1, "The code of conduct applies to all contractors and staff."),
+]
+
+
+def hash_embed(texts):
+    """Deterministic bag-of-words vectors, so tests need no embedding model."""
+    out = np.zeros((len(texts), 64), dtype=np.float32)
+    for i, t in enumerate(texts):
+        for w in t.lower().split():
+            out[i, int(hashlib.md5(w.strip(".?,").encode()).hexdigest(), 16) % 64] += 1.0
+    return out
+
+
+class TestRagEngine(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.jobs = JobManager(workers=1)
+        self.engine = RagEngine(embed_model="hash-64", embed_fn=hash_embed, artifact_dir=self._tmp.name,
+                                jobs=self.jobs)
+
+    def tearDown(self):
+        self.jobs.shutdown()
+        self._tmp.cleanup()
+
+    def test_vector_search_with_filters(self):
+        res = self.engine.build(PAGES, chunk_size=200, overlap=0)
+        self.assertEqual((res["chunks"], res["mode"]), (4, "faiss"))
+        results, stats = self.engine.search(["maternity leave weeks", "travel expenses reimbursed"], top_k=2)
+        self.assertEqual(stats["mode"], "faiss")
+        self.assertEqual((results[0][0]["source"], results[0][0]["page"]), ("leave.pdf", 2))
+        self.assertEqual(results[1][0]["source"], "travel.pdf")
+        results, stats = self.engine.search(["leave"], top_k=4, filters={"sources": ["leave.pdf"], "pages": (1, 1)})
+        self.assertEqual([(r["source"], r["page"]) for r in results[0]], [("leave.pdf", 1)])
+        self.assertEqual(stats["filter"]["rows"], 1)
+
+    def test_query_encoder_failure_falls_back_to_bm25(self):
+        self.engine.build(PAGES, chunk_size=200, overlap=0)
+
+        def offline(texts):
+            raise RuntimeError("model offline")
+        self.engine._embed_fn = offline
+        results, stats = self.engine.search(["travel expenses reimbursed (encoder down)"], top_k=1)
+        self.assertEqual(stats["mode"], "lexical")
+        self.assertIn("fallback", stats)
+        self.assertEqual(results[0][0]["source"], "travel.pdf")
+
+    def test_other_engines_reload_a_newer_artifact(self):
+        self.engine.build(PAGES[:2], chunk_size=200, overlap=0, persist=True)
+        reader = RagEngine(embed_model="hash-64", embed_fn=hash_embed, artifact_dir=self._tmp.name, jobs=self.jobs)
+        self.assertTrue(reader.load_saved())
+        self.assertEqual(reader.stats()["chunks"], 2)
+        with mock.patch.object(engine_mod, "ENGINE_RELOAD_CHECK_S", 1e-9):
+            self.assertFalse(reader.reload_if_changed())  # nothing new yet
+            self.engine.build(PAGES, chunk_size=200, overlap=0, persist=True)
+            results, _stats = reader.search(["travel expenses reimbursed"], top_k=1)
+            self.assertEqual(results[0][0]["source"], "travel.pdf")
+            self.assertEqual(reader.stats()["chunks"], 4)
+            # A corpus built after the newest artifact is not replaced by it.
+            self.engine.build(PAGES[3:], chunk_size=200, overlap=0)
+            self.assertFalse(self.engine.reload_if_changed())
+            self.assertEqual(self.engine.stats()["chunks"], 1)
+
+    def test_lexical_only_without_embedder(self):
+        engine = RagEngine(embed_model="missing-model", jobs=self.jobs)
+        engine._encoder = lambda model: None
+        res = engine.build(PAGES, chunk_size=200, overlap=0, persist=True)
+        self.assertEqual((res["mode"], res["version"]), ("lexical", None))
+        results, stats = engine.search(["code of conduct contractors"], top_k=1)
+        self.assertEqual((stats["mode"], results[0][0]["source"]), ("lexical", "conduct.pdf"))
+
+    def test_search_before_ingest(self):
+        with self.assertRaises(LookupError):
+            self.engine.search(["leave"])
+
+    def test_ingest_job_persists_and_reloads(self):
+        files = [("leave.pdf", _pdf(["Annual leave is 18 days per year.", "Sick leave needs a note."]))]
+        job = self.jobs.wait(self.engine.submit_ingest(files, chunk_size=200, overlap=0), timeout=30)
+        self.assertEqual(job.status, "done", job.error)
+        self.assertEqual((job.result["chunks"], job.result["ingest"]["pages"]), (2, 2))
+        fresh = RagEngine(embed_model="hash-64", embed_fn=hash_embed, artifact_dir=self._tmp.name, jobs=self.jobs)
+        self.assertTrue(fresh.load_saved())
+        self.assertEqual(fresh.stats()["version"], job.result["version"])
+        results, _ = fresh.search(["sick note"], top_k=1)
+        self.assertEqual(results[0][0]["page"], 2)
+
+    def test_answer_falls_back_to_snippets_without_llm(self):
+        self.engine.build(PAGES, chunk_size=200, overlap=0)
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": ""}):
+            out = asyncio.run(self.engine.answer("How long is maternity leave?", top_k=2))
+        self.assertIn("26 weeks", out["answer"])
+        self.assertEqual(len(out["sources"]), 2)
+        self.assertGreaterEqual(out["timings"]["total_s"], out["timings"]["retrieve_s"])
+
+
+class TestSearchChunksInvalidRows(unittest.TestCase):
+    def setUp(self):
+        builder = ChunkStoreBuilder()
+        for i in range(4):
+            builder.add(f"chunk {i}", "doc.pdf", page=i + 1)
+        self.store = builder.build()
+        # Row 1 failed to embed: its zero vector outscores every real row for this query.
+        self.store.set_embeddings([[1.0, 0.0], None, [0.6, 0.8], [0.0, 1.0]])
+        self.index = build_vector_index(self.store.embedding_matrix(), kind="flat")
+        query = np.array([[-1.0, -1.0]], dtype=np.float32)
+        self.encode = lambda qs: (np.repeat(query, len(qs), axis=0), np.ones(len(qs), dtype=bool), QueryCacheStats())
+
+    def _rows(self, **kw):
+        hits, _stats = search_chunks(["q"], 4, self.store, index=self.index, encode=self.encode, **kw)
+        return [row for row, _score in hits[0]]
+
+    def test_failed_rows_are_never_returned(self):
+        self.assertEqual(sorted(self._rows()), [0, 2, 3])
+
+    def test_failed_rows_excluded_from_filtered_search(self):
+        mask = np.array([True, True, False, True])
+        self.assertEqual(sorted(self._rows(mask=mask)), [0, 3])
+
+    def test_many_failed_rows_switch_to_a_mask(self):
+        with mock.patch.object(engine_mod, "ENGINE_INVALID_OVERFETCH_MAX", 0):
+            hits, stats = search_chunks(["q"], 4, self.store, index=self.index, encode=self.encode)
+        self.assertEqual(sorted(r for r, _s in hits[0]), [0, 2, 3])
+        self.assertEqual(stats["filter"]["rows"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
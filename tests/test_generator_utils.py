@@ -0,0 +1,101 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+from app.utils.generator_utils import AnswerStream, answer_metrics, stream_chat
+from app.utils.openai_pool import OpenAIClientPool
+
+TOKENS = ["- 18", " days", " per", " year", " [chunk 3]"]
+
+
+class _SSEHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    token_delay_s = 0.02
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        self.server.requests.append(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def event(payload):
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        base = {"id": "chatcmpl-test", "object": "chat.completion.chunk", "created": 0, "model": body["model"]}
+        for tok in TOKENS:
+            time.sleep(self.token_delay_s)
+            event({**base, "choices": [{"index": 0, "delta": {"content": tok}, "finish_reason": None}]})
+        event({**base, "choices": [], "usage": {"prompt_tokens": 12, "completion_tokens": 7, "total_tokens": 19}})
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+def _chunk(content=None, usage=None):
+    choices = [] if content is None else [SimpleNamespace(delta=SimpleNamespace(content=content))]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class TestAnswerStream(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _SSEHandler)
+        cls.server.requests = []
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.pool = OpenAIClientPool()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.pool.close()
+
+    def test_streams_deltas_with_ttft_and_rate(self):
+        client = self.pool.get("sk-test", base_url=f"http://127.0.0.1:{self.server.server_address[1]}/v1")
+        stream = stream_chat(client, model="gpt-4o-mini", messages=[{"role": "user", "content": "leave?"}])
+        arrival = []
+        for delta in stream:
+            arrival.append(time.perf_counter())
+        self.assertEqual(stream.text, "".join(TOKENS))
+        self.assertTrue(self.server.requests[-1]["stream"])
+        m = stream.metrics()
+        self.assertTrue(m["streamed"])
+        self.assertEqual(m["tokens"], 7)  # usage from the final chunk wins over the delta count
+        self.assertLess(m["ttft_s"], m["total_s"])
+        self.assertLess(arrival[0], arrival[-1] - 0.05)  # rendered incrementally, not all at the end
+        self.assertGreater(m["tokens_per_s"], 0)
+
+    def test_error_before_first_token_is_raised(self):
+        def broken():
+            raise ConnectionError("reset")
+            yield  # pragma: no cover
+
+        with self.assertRaises(ConnectionError):
+            list(AnswerStream(broken(), time.perf_counter()))
+
+    def test_error_mid_stream_keeps_partial_answer(self):
+        def flaky():
+            yield _chunk("- 18 days")
+            raise ConnectionError("reset")
+
+        stream = AnswerStream(flaky(), time.perf_counter())
+        self.assertEqual(list(stream), ["- 18 days"])
+        self.assertEqual(stream.text, "- 18 days")
+        self.assertIn("reset", stream.error)
+        self.assertEqual(stream.metrics()["tokens"], 1)
+
+    def test_blocking_metrics(self):
+        m = answer_metrics(2.0, 2.0, 50, streamed=False)
+        self.assertEqual((m["ttft_s"], m["tokens_per_s"], m["streamed"]), (2.0, 25.0, False))
+        self.assertIsNone(answer_metrics(0.5, 0.5, None, streamed=True)["tokens_per_s"])
+
+
+if __name__ == "__main__":
+    unittest.main()
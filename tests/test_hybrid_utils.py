@@ -0,0 +1,80 @@
+import time
+import unittest
+
+from app.utils.hybrid_utils import hybrid_search, reciprocal_rank_fusion, run_stages, weighted_score_fusion
+
+
+class TestFusion(unittest.TestCase):
+    def test_rrf_rewards_agreement(self):
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]], k=60)
+        keys = [k for k, _ in fused]
+        self.assertEqual(keys[0], "a")
+        self.assertEqual(set(keys), {"a", "b", "c", "d"})
+        self.assertAlmostEqual(dict(fused)["a"], 1 / 61 + 1 / 62)
+
+    def test_rrf_weights(self):
+        fused = reciprocal_rank_fusion([["a"], ["b"]], weights=[1.0, 2.0])
+        self.assertEqual(fused[0][0], "b")
+
+    def test_weighted_score_fusion_normalizes(self):
+        # Raw scales differ by orders of magnitude; normalization makes them comparable.
+        vec = [("a", 0.91), ("b", 0.90), ("c", 0.10)]
+        lex = [("c", 40.0), ("b", 35.0), ("d", 1.0)]
+        fused = dict(weighted_score_fusion([vec, lex], weights=[0.5, 0.5]))
+        self.assertEqual(max(fused, key=fused.get), "b")
+        self.assertAlmostEqual(fused["a"], 0.5)
+        self.assertEqual(weighted_score_fusion([[], [("x", 3.0)]]), [("x", 1.0)])
+
+
+class TestRunStages(unittest.TestCase):
+    def test_stages_run_concurrently(self):
+        def slow(v):
+            def fn():
+                time.sleep(0.2)
+                return [v]
+            return fn
+
+        t0 = time.perf_counter()
+        results, timings = run_stages({"vector": slow(1), "lexical": slow(2)})
+        elapsed = time.perf_counter() - t0
+        self.assertEqual(results, {"vector": [1], "lexical": [2]})
+        self.assertLess(elapsed, 0.35)
+        self.assertIn("vector_ms", timings)
+        self.assertIn("lexical_ms", timings)
+
+    def test_failed_stage_yields_empty_result(self):
+        def boom():
+            raise RuntimeError("index missing")
+
+        results, timings = run_stages({"vector": boom, "lexical": lambda: ["x"]})
+        self.assertEqual(results["vector"], [])
+        self.assertEqual(results["lexical"], ["x"])
+        self.assertIn("index missing", timings["vector_error"])
+
+
+def _rrf_fuse(vector_pairs, lexical_pairs, k):
+    fused = reciprocal_rank_fusion([[c for _s, c in vector_pairs], [c for _s, c in lexical_pairs]])
+    return fused[:k]
+
+
+class TestHybridSearch(unittest.TestCase):
+    def test_vector_failure_falls_back_to_lexical_only(self):
+        def vector():
+            raise RuntimeError("query encoder unavailable")
+        pairs, qstats, timings = hybrid_search(vector, lambda: [(3.0, "a"), (1.0, "b")], _rrf_fuse, 5)
+        self.assertEqual([c for c, _s in pairs], ["a", "b"])
+        self.assertIsNone(qstats)
+        self.assertIn("vector_error", timings)
+        self.assertIn("fusion_ms", timings)
+
+    def test_both_stages_are_fused(self):
+        pairs, qstats, timings = hybrid_search(lambda: ([(0.9, "b"), (0.8, "c")], "stats"),
+                                               lambda: [(3.0, "a"), (1.0, "b")], _rrf_fuse, 2)
+        self.assertEqual(pairs[0][0], "b")
+        self.assertEqual(len(pairs), 2)
+        self.assertEqual(qstats, "stats")
+        self.assertNotIn("vector_error", timings)
+
+
+if __name__ == "__main__":
+    unittest.main()
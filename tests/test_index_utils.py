@@ -0,0 +1,110 @@
+import unittest
+
+import numpy as np
+import faiss
+
+from app.utils.index_utils import (
+    build_vector_index, choose_index_kind, index_kind, recall_report, search_batch, search_filtered, search_params,
+    set_search_params,
+)
+
+
+def _data(n=3000, dim=32, seed=0):
+    xb = np.random.default_rng(seed).standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(xb)
+    return xb
+
+
+class TestIndexUtils(unittest.TestCase):
+    def test_auto_choice_by_corpus_size(self):
+        self.assertEqual(choose_index_kind(1000), "flat")
+        self.assertEqual(choose_index_kind(100000), "hnsw")
+        self.assertEqual(choose_index_kind(5000000), "ivf_pq")
+
+    def test_each_kind_builds_and_searches(self):
+        xb = _data()
+        for kind in ("flat", "ivf_flat", "ivf_pq", "hnsw"):
+            index = build_vector_index(xb, kind=kind, train_size=2000)
+            self.assertEqual(index_kind(index), kind)
+            self.assertEqual(index.ntotal, len(xb))
+            _, ids = index.search(xb[:5], 3)
+            self.assertEqual(ids.shape, (5, 3))
+
+    def test_recall_report_and_knobs(self):
+        xb = _data()
+        index = build_vector_index(xb, kind="ivf_flat", nlist=32)
+        set_search_params(index, nprobe=32)
+        self.assertEqual(index.nprobe, 32)
+        report = recall_report(xb, index, xb[:50].copy(), k=5)
+        self.assertEqual(report["recall@5"], 1.0)  # nprobe == nlist is exhaustive
+        set_search_params(index, nprobe=1)
+        self.assertLessEqual(recall_report(xb, index, xb[:50].copy(), k=5)["recall@5"], 1.0)
+
+    def test_per_search_knobs_leave_the_shared_index_untouched(self):
+        xb = _data()
+        for kind, attr in (("ivf_flat", lambda ix: ix.nprobe), ("hnsw", lambda ix: ix.hnsw.efSearch)):
+            index = build_vector_index(xb, kind=kind, nlist=32)
+            before = attr(index)
+            exhaustive = recall_report(xb, index, xb[:50].copy(), k=5, nprobe=32, ef_search=512)
+            self.assertEqual(attr(index), before, kind)
+            if kind == "ivf_flat":
+                self.assertEqual(exhaustive["recall@5"], 1.0)
+                narrow = recall_report(xb, index, xb[:50].copy(), k=5, nprobe=1)
+                self.assertLess(narrow["recall@5"], 1.0)
+                _, I = search_batch(index, xb[:50], 5, nprobe=32)
+                np.testing.assert_array_equal(I[:, 0], np.arange(50))
+                self.assertEqual(search_params(index, nprobe=10 ** 6).nprobe, 32)  # capped at nlist
+            _, I, _used = search_filtered(index, xb[:3], 5, np.arange(0, 3000, 3), exact_max_rows=0,
+                                          nprobe=32, ef_search=512)
+            self.assertEqual(attr(index), before, kind)
+            self.assertTrue(np.isin(I, np.arange(0, 3000, 3)).all())
+        self.assertIsNone(search_params(build_vector_index(xb[:100], kind="flat")))
+
+    def test_search_batch_matches_per_query_search(self):
+        xb = _data()
+        index = build_vector_index(xb, kind="flat")
+        queries = np.random.default_rng(1).standard_normal((40, xb.shape[1])).astype("float32")
+        D, I = search_batch(index, queries, 5, batch_size=16)
+        self.assertFalse(np.allclose(np.linalg.norm(queries, axis=1), 1.0))  # caller's array untouched
+        for qi in range(len(queries)):
+            q = queries[qi:qi + 1].copy()
+            faiss.normalize_L2(q)
+            d, i = index.search(q, 5)
+            np.testing.assert_array_equal(I[qi], i[0])
+            np.testing.assert_allclose(D[qi], d[0], rtol=1e-5)
+
+    def test_filtered_search_only_returns_subset_rows(self):
+        xb = _data()
+        rows = np.arange(5, len(xb), 10)
+        queries = xb[[5, 6, 15]].copy()
+        exact_I = np.argsort(-(queries @ xb[rows].T), axis=1)[:, :5]
+        expected = rows[exact_I]
+        for kind in ["flat", "hnsw", "ivf_flat"]:
+            index = build_vector_index(xb, kind=kind, nlist=32)
+            set_search_params(index, nprobe=32, ef_search=256)
+            for max_rows, strategy in [(10 ** 6, "subset_exact"), (0, "id_selector")]:
+                D, I, used = search_filtered(index, queries, 5, rows, vectors=xb, exact_max_rows=max_rows)
+                self.assertEqual(used, strategy)
+                self.assertTrue(np.isin(I, rows).all(), (kind, strategy))
+                self.assertEqual(I[0, 0], 5)  # a subset row queried with itself
+                hits = sum(len(set(a) & set(e)) for a, e in zip(I, expected))
+                self.assertGreaterEqual(hits / expected.size, 0.8, (kind, strategy))
+        np.testing.assert_array_equal(search_filtered(index, queries, 5, rows, vectors=xb)[1], expected)
+
+    def test_filtered_search_small_and_empty_subsets(self):
+        xb = _data(100)
+        index = build_vector_index(xb, kind="flat")
+        D, I, _ = search_filtered(index, xb[:1], 5, np.array([3, 7]), vectors=xb.astype("float16"))
+        self.assertEqual(set(I[0, :2].tolist()), {3, 7})
+        self.assertEqual(I[0, 2:].tolist(), [-1, -1, -1])
+        self.assertTrue(np.isneginf(D[0, 2:]).all())
+        D, I, strategy = search_filtered(index, xb[:1], 5, np.array([], dtype=np.int64), vectors=xb)
+        self.assertEqual((strategy, I[0].tolist()), ("empty", [-1] * 5))
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            build_vector_index(_data(100), kind="lsh")
+
+
+if __name__ == "__main__":
+    unittest.main()
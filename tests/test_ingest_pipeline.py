@@ -0,0 +1,94 @@
+import threading
+import time
+import unittest
+
+from app.utils.chunk_store import ChunkStoreBuilder
+from app.utils.ingest_pipeline import PageRecord, buffered, chunk_pages, ingest, iter_store_pages, normalize_text
+
+from test_pdf_utils import _pdf
+
+
+def _chunker(text):
+    return [w for w in text.split("|") if w.strip()]
+
+
+class TestIngestPipeline(unittest.TestCase):
+    def test_chunks_keep_source_and_page_in_order(self):
+        files = [
+            ("a.pdf", _pdf(["a1 x|a1 y", "a2 x"])),
+            ("b.pdf", _pdf(["b1 x"])),
+        ]
+        builder = ChunkStoreBuilder()
+        embedded, stats = ingest(iter(files), _chunker, builder, embed_fn=len, batch_size=2, workers=1)
+        store = builder.build()
+        self.assertEqual([t.strip() for t in store.texts()], ["a1 x", "a1 y", "a2 x", "b1 x"])
+        self.assertEqual([store.source(i) for i in range(len(store))], ["a.pdf", "a.pdf", "a.pdf", "b.pdf"])
+        self.assertEqual(store.pages.tolist(), [1, 1, 2, 1])
+        self.assertEqual(embedded, [2, 2])
+        self.assertEqual((stats.files, stats.pages, stats.chunks, stats.batches), (2, 3, 4, 2))
+        self.assertEqual([f["file"] for f in stats.per_file], ["a.pdf", "b.pdf"])
+
+        pages = list(iter_store_pages(store))
+        self.assertEqual((pages[2].source, pages[2].page), ("a.pdf", 2))
+
+    def test_chunk_pages_handles_input_past_old_ceiling(self):
+        # 3M characters: above the former 2M hard limit.
+        pages = (PageRecord("big.pdf", i + 1, "é" + "x" * 29_999) for i in range(100))
+        builder = ChunkStoreBuilder()
+        seen = []
+        stats = chunk_pages(pages, lambda t: [t[i:i + 1000] for i in range(0, len(t), 1000)], builder,
+                            on_page=lambda s: seen.append(s.pages))
+        store = builder.build()
+        self.assertEqual(len(store), 3000)
+        self.assertEqual(stats.chars, 3_000_000)
+        self.assertEqual(stats.bytes, 3_000_100)
+        self.assertEqual(store.text_nbytes(), 3_000_100)
+        self.assertEqual(store.pages[-1], 100)
+        self.assertEqual(seen, list(range(1, 101)))
+        self.assertGreater(stats.as_dict()["mb_per_s"], 0)
+
+    def test_normalize_text(self):
+        self.assertEqual(normalize_text("  a\t\tb\x00\n\n\n\nc ﬁ "), "a b\n\nc fi")
+
+
+class TestBuffered(unittest.TestCase):
+    def test_backpressure_bounds_read_ahead(self):
+        produced = []
+
+        def gen():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        it = buffered(gen(), maxsize=3)
+        self.assertEqual(next(it), 0)
+        time.sleep(0.2)
+        # consumed 1, queue holds 3, producer blocked holding 1 more
+        self.assertLessEqual(len(produced), 5)
+        self.assertEqual(list(it), list(range(1, 100)))
+
+    def test_producer_errors_propagate(self):
+        def gen():
+            yield 1
+            raise ValueError("bad page")
+
+        with self.assertRaises(ValueError):
+            list(buffered(gen(), maxsize=2))
+
+    def test_abandoned_iterator_stops_producer(self):
+        def gen():
+            i = 0
+            while True:
+                yield i
+                i += 1
+
+        before = threading.active_count()
+        it = buffered(gen(), maxsize=2)
+        next(it)
+        it.close()
+        time.sleep(0.3)
+        self.assertLessEqual(threading.active_count(), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import threading
+import time
+import unittest
+
+from app.utils.jobs import JobManager
+
+
+class TestJobManager(unittest.TestCase):
+    def setUp(self):
+        self.mgr = JobManager(workers=1, history=3)
+
+    def tearDown(self):
+        self.mgr.shutdown(wait=True)
+
+    def test_progress_result_and_eta(self):
+        seen = []
+        gate = threading.Event()
+
+        def work(ctx, n):
+            for i in range(n):
+                ctx.progress(i, n, f"item {i}")
+                if i == n // 2:
+                    gate.wait(2)
+            return n * 2
+
+        job_id = self.mgr.submit("chunk", work, 10, label="Chunking")
+        for _ in range(200):
+            job = self.mgr.get(job_id)
+            if job.status == "running" and job.done == 5:
+                seen.append(job.as_dict())
+                break
+            time.sleep(0.01)
+        gate.set()
+        job = self.mgr.wait(job_id, timeout=5)
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.result, 20)
+        self.assertEqual(job.progress, 1.0)
+        self.assertEqual(seen[0]["progress"], 0.5)
+        self.assertEqual(seen[0]["message"], "item 5")
+        self.assertIsNotNone(seen[0]["eta_s"])
+
+    def test_errors_are_captured(self):
+        def boom(ctx):
+            raise ValueError("no pages")
+
+        job = self.mgr.wait(self.mgr.submit("embed", boom), timeout=5)
+        self.assertEqual(job.status, "failed")
+        self.assertIn("no pages", job.error)
+        self.assertIn("ValueError", job.traceback)
+
+    def test_cancel_running_and_queued(self):
+        started = threading.Event()
+
+        def loop(ctx):
+            started.set()
+            while True:
+                ctx.progress(0, 1)
+                time.sleep(0.01)
+
+        running = self.mgr.submit("index", loop)
+        queued = self.mgr.submit("index", lambda ctx: "never")
+        started.wait(2)
+        self.assertTrue(self.mgr.cancel(queued))
+        self.assertEqual(self.mgr.get(queued).status, "cancelled")
+        self.assertTrue(self.mgr.cancel(running))
+        self.assertEqual(self.mgr.wait(running, timeout=5).status, "cancelled")
+        self.assertFalse(self.mgr.cancel(running))
+
+    def test_result_after_cancel_is_discarded(self):
+        gate = threading.Event()
+
+        def uninterruptible(ctx):
+            gate.wait(2)
+            return "index"
+
+        job_id = self.mgr.submit("index", uninterruptible)
+        time.sleep(0.05)
+        self.mgr.cancel(job_id)
+        gate.set()
+        job = self.mgr.wait(job_id, timeout=5)
+        self.assertEqual(job.status, "cancelled")
+        self.assertIsNone(job.result)
+
+    def test_pool_is_bounded_and_history_pruned(self):
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def work(ctx):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+        ids = [self.mgr.submit("embed", work) for _ in range(6)]
+        for job_id in ids:
+            self.mgr.wait(job_id, timeout=5)
+        self.mgr.submit("embed", work)
+        self.assertEqual(peak[0], 1)
+        self.assertLessEqual(len([j for j in self.mgr.list() if j.finished]), 3)
+        self.assertIsNone(self.mgr.get(ids[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
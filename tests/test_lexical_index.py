@@ -0,0 +1,78 @@
+import math
+import unittest
+
+from app.utils.lexical_index import BM25Index, phrase_search, regex_tokenize
+
+DOCS = [
+    "Annual leave accrues at 1.5 days per month of service.",
+    "Maternity leave is 26 weeks; apply through the HR portal.",
+    "The code of conduct applies to all employees and contractors.",
+    "",
+    "Leave leave leave: carry-over of annual leave is capped at 10 days.",
+]
+
+
+def _brute_force(docs, query, k1=1.5, b=0.75):
+    toks = [regex_tokenize(d) for d in docs]
+    n = len(docs)
+    avgdl = sum(len(t) for t in toks) / n
+    scores = []
+    for t in toks:
+        s = 0.0
+        for q in set(regex_tokenize(query)):
+            df = sum(1 for d in toks if q in d)
+            if not df:
+                continue
+            tf = t.count(q)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            s += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(t) / avgdl))
+        scores.append(s)
+    return scores
+
+
+class TestBM25Index(unittest.TestCase):
+    def setUp(self):
+        self.index = BM25Index.build(DOCS)
+
+    def test_scores_match_reference_formula(self):
+        for query in ("annual leave", "maternity leave portal", "conduct"):
+            expected = _brute_force(DOCS, query)
+            got = dict(self.index.search(query, k=len(DOCS)))
+            for d, score in enumerate(expected):
+                if score > 0:
+                    self.assertAlmostEqual(got[d], score, places=4)
+                else:
+                    self.assertNotIn(d, got)
+
+    def test_top_k_order_and_min_match(self):
+        hits = self.index.search("annual leave days", k=2)
+        self.assertEqual([d for d, _ in hits], [4, 0])
+        self.assertEqual([d for d, _ in self.index.search("annual leave days", k=5, min_match=3)], [4, 0])
+        self.assertEqual(self.index.search("nothing matches", k=3), [])
+
+    def test_mask_restricts_candidates(self):
+        import numpy as np
+        mask = np.array([True, True, False, False, False])
+        self.assertEqual([d for d, _ in self.index.search("annual leave days", k=5, mask=mask)], [0, 1])
+
+    def test_whole_corpus_is_searched(self):
+        docs = ["filler text"] * 1200 + ["clause 7.3 overtime"]
+        self.assertEqual(BM25Index.build(docs).search("overtime", k=1)[0][0], 1200)
+
+
+    def test_phrase_match_beyond_bm25_top_20(self):
+        # 25 short docs hold both terms but not the phrase; the phrase doc is long, so it ranks last on BM25.
+        docs = ["leave leave annual annual"] * 25 + [
+            "the annual leave entitlement is described in section four together with carry over rules "
+            "approval steps payroll cut off dates and the contacts for each regional office"]
+        index = BM25Index.build(docs)
+        bm25_rank = [d for d, _ in index.search("annual leave", k=len(docs))]
+        self.assertEqual(bm25_rank.index(25), 25)
+        hits = phrase_search(index, "annual leave", docs.__getitem__, k=3, min_match=3, phrase_bonus=6.0)
+        self.assertEqual([d for d, _ in hits], [25])  # two-term query: only the phrase match qualifies
+        hits = phrase_search(index, "annual leave", docs.__getitem__, k=3, min_match=2, phrase_bonus=6.0)
+        self.assertEqual(hits[0][0], 25)
+
+
+if __name__ == "__main__":
+    unittest.main()
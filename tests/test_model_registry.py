@@ -0,0 +1,58 @@
+import threading
+import time
+import unittest
+
+from app.utils.model_registry import ModelRegistry
+
+
+class _FakeModel:
+    def __init__(self, name):
+        self.name = name
+
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.loads = []
+
+        def _loader(name):
+            self.loads.append(name)
+            time.sleep(0.01)
+            return _FakeModel(name)
+
+        self.loader = _loader
+
+    def test_loads_once_across_threads(self):
+        reg = ModelRegistry(loaders={"fake": self.loader})
+        got = []
+        threads = [threading.Thread(target=lambda: got.append(reg.get("m1", kind="fake"))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.loads, ["m1"])
+        self.assertTrue(all(m is got[0] for m in got))
+        self.assertEqual(reg.stats()[0]["hits"], 8)
+
+    def test_lru_eviction_by_count(self):
+        reg = ModelRegistry(max_models=2, loaders={"fake": self.loader})
+        reg.get("a", kind="fake")
+        reg.get("b", kind="fake")
+        reg.get("a", kind="fake")  # a is now most recently used
+        reg.get("c", kind="fake")
+        self.assertEqual(sorted(s["model"] for s in reg.stats()), ["a", "c"])
+
+    def test_idle_eviction(self):
+        reg = ModelRegistry(idle_ttl_s=0.01, loaders={"fake": self.loader})
+        reg.get("a", kind="fake")
+        time.sleep(0.03)
+        reg.get("b", kind="fake")
+        self.assertEqual([s["model"] for s in reg.stats()], ["b"])
+
+    def test_unknown_kind(self):
+        reg = ModelRegistry(loaders={})
+        with self.assertRaises(ValueError):
+            reg.get("a", kind="nope")
+
+
+if __name__ == "__main__":
+    unittest.main()
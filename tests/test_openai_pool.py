@@ -0,0 +1,32 @@
+import asyncio
+import unittest
+
+from app.utils.openai_pool import OpenAIClientPool
+
+
+class TestOpenAIClientPool(unittest.TestCase):
+    def test_sync_clients_shared_per_key(self):
+        pool = OpenAIClientPool(max_clients=2)
+        a = pool.get("sk-a")
+        self.assertIs(pool.get("sk-a"), a)
+        self.assertIsNot(pool.get("sk-b"), a)
+        self.assertIsNot(pool.get("sk-a", max_retries=0), a)
+        self.assertEqual(pool.stats()["sync_clients"], 2)  # LRU evicted the oldest
+        self.assertNotIn("sk-a", repr(pool._sync.keys()))
+        pool.close()
+
+    def test_async_clients_bound_to_event_loop(self):
+        pool = OpenAIClientPool()
+
+        async def twice():
+            return pool.get_async("sk-a"), pool.get_async("sk-a")
+
+        a1, a2 = asyncio.run(twice())
+        self.assertIs(a1, a2)
+        b1, _ = asyncio.run(twice())
+        self.assertIsNot(a1, b1)
+        self.assertEqual(pool.stats()["async_clients"], 1)  # the first loop's client was dropped
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import io
+import unittest
+
+from app.utils.pdf_utils import extract_pdfs, load_pdfs
+
+
+def _pdf(pages):
+    """Tiny uncompressed PDF with one line of Helvetica text per page."""
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = b"BT /F1 12 Tf 72 720 Td (%s) Tj ET" % text.encode("latin-1")
+        objs.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objs.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                    b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objs))
+        kids.append(len(objs))
+    objs[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    return bytes(out)
+
+
+class TestExtractPdfs(unittest.TestCase):
+    def setUp(self):
+        self.files = [
+            ("a.pdf", _pdf([f"alpha page {i}" for i in range(7)])),
+            ("b.pdf", _pdf([f"beta page {i}" for i in range(3)])),
+        ]
+
+    def _check(self, results):
+        self.assertEqual([r.name for r in results], ["a.pdf", "b.pdf"])
+        self.assertEqual([p.strip() for p in results[0].pages], [f"alpha page {i}" for i in range(7)])
+        self.assertEqual([p.strip() for p in results[1].pages], [f"beta page {i}" for i in range(3)])
+        self.assertTrue(all(r.pages_per_s > 0 for r in results))
+
+    def test_in_process_keeps_page_order(self):
+        self._check(extract_pdfs(self.files, workers=1, pages_per_task=2))
+
+    def test_process_pool_keeps_page_order(self):
+        self._check(extract_pdfs(self.files, workers=2, pages_per_task=2))
+
+    def test_pdfplumber_engine(self):
+        self._check(extract_pdfs(self.files, engine="pdfplumber", workers=1, pages_per_task=3))
+
+    def test_unreadable_file_is_reported(self):
+        results = extract_pdfs([("bad.pdf", b"not a pdf")] + self.files, workers=1)
+        self.assertEqual(results[0].pages, [])
+        self.assertIsNotNone(results[0].error)
+        self.assertEqual(len(results[1].pages), 7)
+
+    def test_load_pdfs(self):
+        f = io.BytesIO(self.files[1][1])
+        f.name = "b.pdf"
+        self.assertEqual(load_pdfs([f])[0].split("\n")[0].strip(), "beta page 0")
+
+
+if __name__ == "__main__":
+    unittest.main()
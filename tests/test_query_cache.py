@@ -0,0 +1,70 @@
+import threading
+import unittest
+
+import numpy as np
+
+from app.utils.query_cache import QueryEmbeddingCache
+
+
+def _encoder(calls):
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+    return encode
+
+
+class TestQueryEmbeddingCache(unittest.TestCase):
+    def test_hits_skip_the_encoder(self):
+        cache, calls = QueryEmbeddingCache(max_entries=8), []
+        first, stats = cache.encode("m", ["leave days?", "maternity"], _encoder(calls))
+        self.assertEqual((stats.hits, stats.misses), (0, 2))
+        second, stats = cache.encode("m", ["  leave   days? ", "sick pay", "sick pay"], _encoder(calls))
+        self.assertEqual(calls[-1], ["sick pay"])  # repeats in one call are encoded once
+        self.assertEqual((stats.hits, stats.misses), (2, 1))
+        np.testing.assert_array_equal(second[0], first[0])
+        self.assertIs(second[1], second[2])
+        self.assertGreaterEqual(stats.saved_s, 0.0)
+        self.assertEqual(cache.stats_dict()["hit_ratio"], 0.4)
+
+    def test_keyed_by_model_and_bounded(self):
+        cache, calls = QueryEmbeddingCache(max_entries=2), []
+        cache.encode("a", ["q1"], _encoder(calls))
+        cache.encode("b", ["q1"], _encoder(calls))
+        self.assertEqual(len(calls), 2)
+        cache.encode("a", ["q2"], _encoder(calls))  # evicts ("a", "q1")
+        cache.encode("a", ["q1"], _encoder(calls))
+        self.assertEqual(calls[-1], ["q1"])
+        self.assertEqual(len(cache), 2)
+
+    def test_failed_embeddings_are_not_cached(self):
+        cache = QueryEmbeddingCache()
+        vecs, _ = cache.encode("openai", ["q"], lambda texts: [None for _ in texts])
+        self.assertIsNone(vecs[0])
+        vecs, stats = cache.encode("openai", ["q"], lambda texts: [[0.5, 0.5] for _ in texts])
+        self.assertEqual((stats.misses, vecs[0].tolist()), (1, [0.5, 0.5]))
+
+    def test_shared_vectors_are_read_only(self):
+        cache = QueryEmbeddingCache()
+        vecs, _ = cache.encode("m", ["q"], _encoder([]))
+        with self.assertRaises(ValueError):
+            vecs[0][0] = 0.0
+
+    def test_concurrent_sessions(self):
+        cache, calls = QueryEmbeddingCache(), []
+        cache.encode("m", ["shared"], _encoder(calls))
+
+        def session():
+            for _ in range(50):
+                cache.encode("m", ["shared"], _encoder(calls))
+
+        threads = [threading.Thread(target=session) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats.hits, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import time
+import unittest
+
+from app.utils.model_registry import ModelRegistry
+from app.utils.rerank import approx_tokens, rerank
+
+TEXTS = ["travel policy", "leave is 18 days", "expense claims", "annual leave accrual", "dress code"]
+
+
+def _scorer(calls, delay_s=0.0):
+    def score(pairs):
+        calls.append(len(pairs))
+        time.sleep(delay_s)
+        return [float(t.count("leave")) + (0.5 if "18" in t else 0.0) for _q, t in pairs]
+    return score
+
+
+class TestRerank(unittest.TestCase):
+    def test_reorders_and_keeps_top_k_in_batches(self):
+        calls = []
+        res = rerank("how much leave?", TEXTS, top_k=2, score_fn=_scorer(calls), batch_size=2, budget_ms=0)
+        self.assertEqual(res.order, [1, 3])
+        self.assertEqual(res.scores, [1.5, 1.0])
+        self.assertEqual(calls, [2, 2, 1])
+        self.assertEqual((res.scored, res.truncated), (5, False))
+
+    def test_budget_truncates_and_keeps_retrieval_order_for_the_rest(self):
+        calls = []
+        res = rerank("leave", TEXTS, top_k=5, score_fn=_scorer(calls, delay_s=0.03), batch_size=2, budget_ms=50)
+        self.assertTrue(res.truncated)
+        self.assertEqual(calls, [2])  # a second 30 ms batch would overrun 50 ms
+        self.assertEqual(res.order, [1, 0, 2, 3, 4])
+        self.assertEqual(res.scores[2:], [None, None, None])
+        self.assertEqual(res.as_dict()["scored"], 2)
+
+    def test_first_batch_respects_budget_once_model_cost_is_known(self):
+        calls = []
+        score = _scorer(calls, delay_s=0.08)
+        score.cost_key = "slow-test-model"
+        first = rerank("leave", TEXTS, top_k=3, score_fn=score, batch_size=2, budget_ms=50)
+        self.assertEqual((calls, first.scored), ([2], 2))  # nothing measured yet
+        res = rerank("leave", TEXTS, top_k=3, score_fn=score, batch_size=2, budget_ms=50)
+        self.assertEqual(calls, [2])  # an 80 ms batch cannot fit a 50 ms budget
+        self.assertEqual((res.scored, res.truncated, res.order), (0, True, [0, 1, 2]))
+        self.assertLess(res.elapsed_s, 0.05)
+        rerank("leave", TEXTS, top_k=3, score_fn=score, batch_size=2, budget_ms=50)
+        self.assertEqual(calls, [2, 2])  # the skipped query halved the estimate, so this one probes again
+
+    def test_ties_keep_retrieval_order(self):
+        res = rerank("q", ["a", "b", "c"], top_k=3, score_fn=lambda pairs: [0.0] * len(pairs))
+        self.assertEqual(res.order, [0, 1, 2])
+
+    def test_cross_encoder_kind_is_registry_managed(self):
+        loads = []
+        reg = ModelRegistry(loaders={"cross-encoder": lambda name: loads.append(name) or object()})
+        self.assertIs(reg.get("ce", kind="cross-encoder"), reg.get("ce", kind="cross-encoder"))
+        self.assertEqual(loads, ["ce"])
+
+    def test_approx_tokens(self):
+        self.assertEqual(approx_tokens(["abcd" * 10, "abcd"]), 11)
+
+
+if __name__ == "__main__":
+    unittest.main()
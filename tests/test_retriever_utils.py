@@ -0,0 +1,61 @@
+import unittest
+import uuid
+
+import chromadb
+
+from app.utils.retriever_utils import (
+    RegistryEmbeddingFunction, _ensure_collection, build_retriever, chunk_ids, sync_collection,
+)
+
+
+class _CountingEmbeddingFunction(RegistryEmbeddingFunction):
+    def __init__(self, model_name: str = "fake"):
+        super().__init__(model_name)
+        self.embedded = 0
+
+    def __call__(self, input):
+        self.embedded += len(input)
+        return [[float(len(t)), 1.0] for t in input]
+
+
+class TestIncrementalChroma(unittest.TestCase):
+    def setUp(self):
+        self.client = chromadb.EphemeralClient()
+        self.fn = _CountingEmbeddingFunction()
+        self.collection = _ensure_collection(self.client, f"test-{uuid.uuid4().hex[:8]}", self.fn)
+
+    def test_chunk_ids_are_content_derived_and_stable(self):
+        a = chunk_ids(["one", "two", "one"])
+        self.assertEqual(len(set(a)), 3)
+        self.assertEqual(chunk_ids(["zero", "one", "two"])[1:], a[:2])
+
+    def test_only_new_chunks_are_embedded(self):
+        stats = sync_collection(self.client, self.collection, ["alpha", "beta", "gamma"])
+        self.assertEqual((stats["added"], stats["removed"], stats["unchanged"]), (3, 0, 0))
+        stats = sync_collection(self.client, self.collection, ["alpha", "gamma", "delta"])
+        self.assertEqual((stats["added"], stats["removed"], stats["unchanged"]), (1, 1, 2))
+        self.assertEqual(self.fn.embedded, 4)
+        self.assertEqual(sorted(self.collection.get()["documents"]), ["alpha", "delta", "gamma"])
+
+    def test_rebuild_with_same_chunks_is_a_no_op(self):
+        sync_collection(self.client, self.collection, ["alpha", "beta"])
+        stats = sync_collection(self.client, self.collection, ["alpha", "beta"])
+        self.assertEqual((stats["added"], stats["removed"], stats["unchanged"]), (0, 0, 2))
+
+    def test_changing_the_embedding_model_reembeds_everything(self):
+        docs = ["Employees accrue annual leave monthly.", "Travel expenses are reimbursed within 30 days."]
+        name = f"test-{uuid.uuid4().hex[:8]}"
+        first = build_retriever(docs, client=self.client, embedding_fn=_CountingEmbeddingFunction("model-a"),
+                                collection_name=name)
+        fn_b = _CountingEmbeddingFunction("model-b")
+        second = build_retriever(docs, client=self.client, embedding_fn=fn_b, collection_name=name)
+        self.assertNotEqual(first.collection.name, second.collection.name)
+        self.assertEqual(second.build_stats["added"], 2)
+        self.assertEqual(fn_b.embedded, 2)
+        again = build_retriever(docs, client=self.client, embedding_fn=_CountingEmbeddingFunction("model-a"),
+                                collection_name=name)
+        self.assertEqual(again.build_stats["unchanged"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()